@@ -2,67 +2,2237 @@
 This file contains the main API code for the Bill of Materials App
 """
 
+import os
 import json
+import asyncio
+import contextlib
+import contextvars
+import functools
 import logging
-import copy
+import shutil
+import time
+import urllib.parse
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
-from anytree import AnyNode
-from anytree.exporter import JsonExporter
+from storage import BaseStore, create_store
+from storage.journal import Journal, JournaledStore
+from utilities.metrics import MeteredStore, Metrics, format_labels
+
+try:
+    # Optional fast JSON encoder for the /v2 endpoints
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class PartModel(BaseModel):
     """
-    Data model for POST part API
-        part_name : str
-            Name of part to create
+    Data model for POST part API
+        part_name : str
+            Name of part to create
+    """
+
+    part_name: str
+
+
+class PartBatchModel(BaseModel):
+    """
+    Data model for POST part batch API
+        part_names : list
+            Names of parts to create
+    """
+
+    part_names: list
+
+
+class AssemblyModel(BaseModel):
+    """
+    Data model for POST assembly API
+        assembly_name : str
+            Name of assembly to create
+        part_names : list
+            Names of parts to add to assembly
+        subassembly_names : list, optional
+            Names of subassemblies to add to assembly
+        shared_subassembly_names : list, optional
+            Names of assemblies to share with assembly, keeping their own parents
+        quantities : dict, optional
+            Number of each part or subassembly the assembly needs by name, 1 when
+            missing
+    """
+
+    assembly_name: str
+    part_names: list
+    subassembly_names: list | None = None
+    shared_subassembly_names: list | None = None
+    quantities: dict | None = None
+
+
+class AssemblyImportModel(BaseModel):
+    """
+    Data model for POST assembly import API
+        assembly : dict
+            Nested assembly tree in the shape JsonExporter emits, where every node has
+            an id and assemblies have a list of children. Nodes may have a quantity,
+            the number of them their parent needs
+    """
+
+    assembly: dict
+
+
+class ReadWriteLock:
+    """
+    Lock letting any number of readers, or a single writer, use the store at a time
+
+    Writers are preferred: once a writer waits, new readers wait behind it, so a steady
+    stream of reads can't hold off a mutation. Waiting requests wait on futures of the
+    running event loop, which are only made when the lock is taken.
+    """
+
+    def __init__(self):
+        # Number of readers holding the lock
+        self.readers = 0
+        # Whether a writer holds the lock
+        self.writing = False
+        # Number of writers waiting for the lock
+        self.waiting_writers = 0
+        # Futures of the requests waiting for the lock
+        self.waiters = []
+
+    async def wait(self):
+        """
+        Waits until the lock is released or a waiting writer gives up
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        await future
+
+    def notify(self):
+        """
+        Wakes every waiting request to check the lock again
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        for future in self.waiters:
+            if not future.done():
+                future.set_result(None)
+        self.waiters = []
+
+    @contextlib.asynccontextmanager
+    async def read(self):
+        """
+        Holds the lock as a reader
+
+        Parameters
+        ----------
+        None
+
+        Yields
+        ------
+        None
+        """
+
+        while self.writing or self.waiting_writers:
+            await self.wait()
+        self.readers += 1
+        try:
+            yield
+        finally:
+            self.readers -= 1
+            if not self.readers:
+                self.notify()
+
+    @contextlib.asynccontextmanager
+    async def write(self):
+        """
+        Holds the lock as the only writer, once every reader has released it
+
+        Parameters
+        ----------
+        None
+
+        Yields
+        ------
+        None
+        """
+
+        self.waiting_writers += 1
+        try:
+            while self.writing or self.readers:
+                await self.wait()
+        except BaseException:
+            # Readers held back by this writer can go ahead
+            self.waiting_writers -= 1
+            self.notify()
+            raise
+        self.waiting_writers -= 1
+        self.writing = True
+        try:
+            yield
+        finally:
+            self.writing = False
+            self.notify()
+
+
+class LiveProject:
+    """
+    Project served by the /project/{project_name} routes, with its own store, lock and
+    journal, so requests to different projects never wait on each other
+    """
+
+    def __init__(self, store: BaseStore, journal: Journal | None = None):
+        # Storage backend holding the project
+        self.store = store
+        # Lock of the store
+        self.lock = ReadWriteLock()
+        # Journal of the store's mutations, if the working project is journaled
+        self.journal = journal
+
+
+class MeteredRoute(APIRoute):
+    """
+    Route recording how long its requests take and how many are in flight, labeled
+    with its path template so every request to it is counted together
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        # Labels of the route's requests by method, rendered once
+        self.labels = {
+            method: format_labels(("method", method), ("route", self.path))
+            for method in self.methods
+        }
+
+    async def handle(self, scope, receive, send):
+        labels = self.labels.get(scope["method"])
+        if labels is None:
+            # Rejected as not allowed without running the endpoint
+            return await super().handle(scope, receive, send)
+        gMetrics.add("bom_requests_in_flight", labels, 1)
+        start = time.perf_counter()
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            gMetrics.observe(
+                "bom_request_duration_seconds", labels, time.perf_counter() - start
+            )
+            gMetrics.add("bom_requests_in_flight", labels, -1)
+
+
+# Storage backend holding the working assembly project and all saved projects. The
+# backend is selected with BOM_STORE (memory, compact or sqlite), and the SQLite
+# database file with BOM_SQLITE_PATH
+gStore = (
+    create_store("sqlite", path=os.environ.get("BOM_SQLITE_PATH", "bom.sqlite3"))
+    if os.environ.get("BOM_STORE") == "sqlite"
+    else create_store(os.environ.get("BOM_STORE", "memory"))
+)
+
+# Journal of in-memory store mutations for crash recovery, kept in BOM_JOURNAL_DIR and
+# compacted into a snapshot every BOM_JOURNAL_COMPACT_SECONDS. BOM_JOURNAL_FSYNC=1
+# forces every record to disk. The SQLite backend is durable on its own
+gJournal = (
+    Journal(
+        os.environ["BOM_JOURNAL_DIR"],
+        fsync=os.environ.get("BOM_JOURNAL_FSYNC") == "1",
+    )
+    if os.environ.get("BOM_JOURNAL_DIR") and gStore.name != "sqlite"
+    else None
+)
+
+# Lock held by mutating endpoints as writers and by read endpoints as readers, so no
+# read sees a mutation half applied
+gLock = ReadWriteLock()
+
+# Thread running the store writes and the reads that export subtrees or walk trees, so
+# the event loop keeps answering other requests meanwhile. One thread, since the
+# in-memory backends fill their caches as they read, and a store is only ever used
+# from one thread
+gExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
+
+# Live projects by name, opened the first time they are addressed
+gProjects = {}
+
+# Name of the live project a request is scoped to by the /project/{project_name}
+# routes, or None for the working project
+gProjectName = contextvars.ContextVar("gProjectName", default=None)
+
+# Request latencies, exports and project copies recorded since startup, served at
+# /metrics
+gMetrics = Metrics()
+
+# Logging to file
+logging.basicConfig(
+    filename="logs/app.log",
+    filemode="w",
+    format="%(name)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+
+async def unscope_project():
+    """
+    Dependency scoping every request to the working project, until a
+    /project/{project_name} route scopes it to a live project
+
+    A request's context isn't always fresh: uvicorn resumes reading a connection it
+    paused during a large request body from that request's context, so the next
+    request on the connection would start scoped to the same live project.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+
+    gProjectName.set(None)
+
+
+# App-wide dependencies run before those of the /project/{project_name} routes
+app = FastAPI(dependencies=[Depends(unscope_project)])
+app.router.route_class = MeteredRoute
+
+
+# Number of items rendered per chunk of a streamed listing
+STREAM_CHUNK_SIZE = 1000
+
+
+async def select_project(project_name: str):
+    """
+    Dependency scoping a request to a live project, for the /project/{project_name}
+    routes
+
+    Parameters
+    ----------
+    project_name : str
+        Name of live project
+
+    Returns
+    -------
+    None
+    """
+
+    gProjectName.set(project_name)
+
+
+def open_project(project_name: str, create: bool) -> LiveProject:
+    """
+    Gets a live project, opening its store the first time it is addressed
+
+    Live projects are kept in stores of the working project's backend. On SQLite they
+    are rows of the same database, under a name no saved project can have, so every
+    worker serves them, and journaled in-memory projects get a journal directory of
+    their own. A live project neither loads nor shadows a saved project of the same
+    name, so a saved project's name is rejected for a new live project.
+
+    Parameters
+    ----------
+    project_name : str
+        Name of live project
+    create : bool
+        Whether to create the project if nothing was written to it yet
+
+    Returns
+    -------
+    LiveProject
+        Live project
+    """
+
+    if project_name in gProjects:
+        return gProjects[project_name]
+    if create and gStore.has_project(project_name):
+        raise HTTPException(status_code=403, detail="Project name is saved")
+    journal = None
+    if gStore.name == "sqlite":
+        # Checked before a connection is opened for the project, so probing a project
+        # nothing was written to doesn't open one
+        if not create and not gStore.holds_project("/" + project_name):
+            raise HTTPException(status_code=404, detail="Project name does not exist")
+        store = create_store("sqlite", path=gStore.path, project="/" + project_name)
+    else:
+        store = create_store(gStore.name)
+        if gJournal is not None:
+            # Hex-encoded, so no project name can escape the journal directory
+            directory = os.path.join(
+                gJournal.directory, "projects", project_name.encode().hex()
+            )
+            if create or os.path.isdir(directory):
+                journal = Journal(directory, fsync=gJournal.fsync)
+                journal.recover(store)
+                store = JournaledStore(store, journal)
+    if not create and not (store.part_count() or store.assembly_count()):
+        if journal is not None:
+            journal.close()
+        if gStore.name == "sqlite":
+            store.connection.close()
+        raise HTTPException(status_code=404, detail="Project name does not exist")
+    gProjects[project_name] = LiveProject(store, journal)
+    return gProjects[project_name]
+
+
+def is_live(project_name: str) -> bool:
+    """
+    Checks whether anything was written to a live project
+
+    On SQLite the rows of the project are looked up on the working project's
+    connection, since opening another connection would wait on a transaction the
+    caller may hold on it.
+
+    Parameters
+    ----------
+    project_name : str
+        Name of live project
+
+    Returns
+    -------
+    bool
+        True if the live project exists
+    """
+
+    if project_name in gProjects:
+        return True
+    if gStore.name == "sqlite":
+        return gStore.holds_project("/" + project_name)
+    try:
+        open_project(project_name, create=False)
+    except HTTPException:
+        return False
+    return True
+
+
+def discard_empty_project():
+    """
+    Drops the live project a request is scoped to if nothing is left in it, so a
+    write that failed or removed everything doesn't leave an empty project behind
+
+    Called as the writer of the project's lock. The project is kept while other
+    writers wait on its lock, since they already hold it.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+
+    project_name = gProjectName.get()
+    project = gProjects.get(project_name)
+    if project is None or project.lock.waiting_writers:
+        return
+    if project.store.part_count() or project.store.assembly_count():
+        return
+    del gProjects[project_name]
+    if project.journal is not None:
+        project.journal.close()
+        shutil.rmtree(project.journal.directory, ignore_errors=True)
+
+
+def scoped_project(create: bool = False) -> tuple:
+    """
+    Gets the store and lock a request works on, those of the live project it is
+    scoped to or of the working project
+
+    Parameters
+    ----------
+    create : bool, optional
+        Whether to create the live project if nothing was written to it yet
+
+    Returns
+    -------
+    tuple
+        Store, recording its exports and project copies in gMetrics, and
+        ReadWriteLock
+    """
+
+    project_name = gProjectName.get()
+    if project_name is None:
+        return MeteredStore(gStore, gMetrics), gLock
+    project = open_project(project_name, create)
+    return MeteredStore(project.store, gMetrics), project.lock
+
+
+def current_store() -> BaseStore:
+    """
+    Gets the store a request works on
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    BaseStore
+        Store of the live project the request is scoped to, or of the working project
+    """
+
+    return scoped_project()[0]
+
+
+async def stream_items(iterate: Callable, limit: int | None, after: str | None):
+    """
+    Streams a listing as NDJSON, one item per line
+
+    Each chunk is rendered in the store thread under the read lock, so a mutation can
+    only land between chunks. One store iterator serves the whole stream, and store
+    iterators carry on past mutations, so the stream never resumes by name. A failure
+    mid-stream is raised, aborting the response rather than ending it cleanly.
+
+    Parameters
+    ----------
+    iterate : callable
+        Function taking a cursor and returning the store iterator of the listing
+    limit : int, optional
+        Maximum number of items to stream
+    after : str, optional
+        Cursor to start after
+
+    Yields
+    ------
+    str
+        Chunk of NDJSON lines
+    """
+
+    lock = scoped_project()[1]
+    items = iterate(after)
+    sent = 0
+
+    def read_chunk() -> tuple:
+        nonlocal sent
+        lines = []
+        for _, item in items:
+            lines.append(item + "\n")
+            sent += 1
+            if len(lines) == STREAM_CHUNK_SIZE or sent == limit:
+                return lines, False
+        return lines, True
+
+    try:
+        while True:
+            async with lock.read():
+                lines, finished = await offload(read_chunk)
+            if lines:
+                yield "".join(lines)
+            if finished or sent == limit:
+                return
+    except Exception as ex:
+        logging.exception(ex)
+        raise
+
+
+async def offload(function: Callable, *args):
+    """
+    Runs a store read or write in the store thread, so the event loop keeps serving
+    other requests while it runs
+
+    Callers hold the read or write lock, so no other mutation is applied until it
+    returns. It runs in a copy of the request's context, so it works on the same
+    project.
+
+    Parameters
+    ----------
+    function : callable
+        Function reading the store
+    *args
+        Arguments to call it with
+
+    Returns
+    -------
+    Any
+        Result of the function
+    """
+
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        gExecutor, context.run, function, *args
+    )
+
+
+def is_quantity(value) -> bool:
+    """
+    Function to check if a value is a valid number of a child an assembly needs
+
+    Parameters
+    ----------
+    value : Any
+        Value to check
+
+    Returns
+    -------
+    bool
+        True for positive integers
+    """
+
+    # bool is a subclass of int, but true isn't a quantity
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def is_descendant(assembly_name: str, cursor: str) -> bool:
+    """
+    Checks if the cursor of a subtree listing is a part or assembly inside an existing
+    assembly
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of an existing assembly
+    cursor : str
+        Kind and name of part or assembly, as kind:name
+
+    Returns
+    -------
+    bool
+        True if the cursor is a descendant of the assembly
+    """
+
+    store = current_store()
+    kind, _, name = cursor.partition(":")
+    if kind == "part":
+        exists = store.has_part(name)
+    elif kind == "assembly":
+        exists = store.has_assembly(name)
+    else:
+        return False
+    return exists and store.assembly_contains(assembly_name, kind, name)
+
+
+def subtree_listing(iterate_subtree: Callable, assembly_name: str) -> Callable:
+    """
+    Adapts a store iterator of an assembly's descendants to the cursors of a listing
+
+    A part and an assembly can share a name, so subtree cursors are kind:name.
+
+    Parameters
+    ----------
+    iterate_subtree : callable
+        Store method lazily exporting descendants keyed by kind and name
+    assembly_name : str
+        Name of an existing assembly
+
+    Returns
+    -------
+    callable
+        Function taking a cursor and returning an iterator of cursors and JSON
+        representations of the descendants
+    """
+
+    def iterate(cursor: str | None):
+        after = None if cursor is None else tuple(cursor.split(":", 1))
+        return (
+            (f"{kind}:{name}", item)
+            for (kind, name), item in iterate_subtree(assembly_name, after)
+        )
+
+    return iterate
+
+
+def list_items(iterate: Callable, limit: int | None, after: str | None, stream: bool):
+    """
+    Builds the response of a paginated or streamed listing
+
+    Parameters
+    ----------
+    iterate : callable
+        Function taking a cursor and returning the store iterator of the listing
+    limit : int, optional
+        Maximum number of items to return
+    after : str, optional
+        Cursor to start after, as returned in next by the previous page
+    stream : bool
+        Whether to stream every item as NDJSON instead of returning a page
+
+    Returns
+    -------
+    Response
+        StreamingResponse of NDJSON lines, or HTTP response object:
+            status : str
+                Status of request
+            data : JSON
+                JSON representation of list of items in the page
+            next : str, optional
+                Cursor of the next page, or None on the last page
+    """
+
+    if stream:
+        if limit is not None and limit < 1:
+            raise HTTPException(status_code=403, detail="Invalid limit")
+        return StreamingResponse(
+            stream_items(iterate, limit, after), media_type="application/x-ndjson"
+        )
+    items, cursor = read_page(iterate, limit, after)
+    return {"status": "Success", "data": json.dumps(items), "next": cursor}
+
+
+def read_page(iterate: Callable, limit: int | None, after: str | None) -> tuple:
+    """
+    Reads one page of a listing
+
+    Parameters
+    ----------
+    iterate : callable
+        Function taking a cursor and returning the store iterator of the listing
+    limit : int, optional
+        Maximum number of items to return
+    after : str, optional
+        Cursor to start after
+
+    Returns
+    -------
+    tuple
+        JSON representations of the items in the page, and the cursor of the next
+        page or None on the last page
+    """
+
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=403, detail="Invalid limit")
+    # Reading one item past the page to know if there is a next page
+    page = list(islice(iterate(after), None if limit is None else limit + 1))
+    cursor = None
+    if limit is not None and len(page) > limit:
+        page = page[:limit]
+        cursor = page[-1][0]
+    return [item for _, item in page], cursor
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    assembly_name: str,
+    build: Callable,
+    page: tuple = (None, None),
+    stream: bool = False,
+):
+    """
+    Serves a read of an assembly's subtree as a conditional GET
+
+    The ETag is the assembly's version, which the store stamps up the ancestor chain
+    of every change, so a client polling an unchanged assembly gets a 304 without the
+    subtree being exported. The response is built in the store thread. A page is a
+    representation of its own, so its limit and cursor are part of its ETag, and
+    streams get none, since they release the lock between chunks.
+
+    Parameters
+    ----------
+    request : Request
+        Incoming request, checked for If-None-Match
+    response : Response
+        Outgoing response, given the ETag when build returns a dict
+    assembly_name : str
+        Name of an existing assembly
+    build : callable
+        Function building the response when the client's copy is stale
+    page : tuple, optional
+        Limit and cursor of a paginated read
+    stream : bool, optional
+        Whether build streams the response
+
+    Returns
+    -------
+    Response
+        Empty 304 response, or the response of build with the ETag
+    """
+
+    if stream:
+        return await offload(build)
+    version = current_store().assembly_version(assembly_name)
+    if page == (None, None):
+        etag = f'"{version}"'
+    else:
+        limit, after = page
+        etag = f'"{version}-{limit}-{urllib.parse.quote(after or "", safe="")}"'
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=304, headers={"ETag": etag})
+    result = await offload(build)
+    (result if isinstance(result, Response) else response).headers["ETag"] = etag
+    return result
+
+
+def transactional(endpoint: Callable) -> Callable:
+    """
+    Runs a mutating endpoint as the writer of the store lock and in a store
+    transaction, so the checks it makes hold until its mutation is applied, even with
+    other worker processes writing to the same data
+
+    The endpoint is a plain function, run with its transaction in the store thread,
+    so a large import or a project load or save doesn't stall the event loop, and a
+    database transaction is never held across an await. A live project is created
+    for the write, and dropped again if the write leaves it empty, as it does when the
+    write fails.
+
+    An endpoint returning a subtree leaves its export as a function in the data of its
+    response. It is called in the store thread once the transaction commits, still as
+    the writer of the lock, so exporting a large subtree doesn't hold the database's
+    write lock.
+
+    Parameters
+    ----------
+    endpoint : callable
+        Endpoint to wrap
+
+    Returns
+    -------
+    callable
+        Endpoint running in a transaction of the store
+    """
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        store, lock = scoped_project(create=True)
+
+        def write():
+            with store.transaction():
+                result = endpoint(*args, **kwargs)
+            if isinstance(result, dict) and callable(result.get("data")):
+                try:
+                    result["data"] = result["data"]()
+                except Exception as ex:
+                    logging.exception(ex)
+                    raise HTTPException(status_code=500, detail=str(ex)) from ex
+            return result
+
+        async with lock.write():
+            try:
+                return await offload(write)
+            finally:
+                discard_empty_project()
+
+    return wrapper
+
+
+def read_only(endpoint: Callable) -> Callable:
+    """
+    Runs a read endpoint as a reader of the store lock, so no mutation is applied
+    between the checks it makes and the reads it offloads
+
+    Parameters
+    ----------
+    endpoint : callable
+        Endpoint to wrap
+
+    Returns
+    -------
+    callable
+        Endpoint holding the read lock
+    """
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        async with scoped_project()[1].read():
+            return await endpoint(*args, **kwargs)
+
+    return wrapper
+
+
+async def compact_journals():
+    """
+    Compacts the journals of the working and live projects into snapshots of their
+    stores
+
+    Each store is dumped and its journal rotated as the writer of its lock, so the
+    snapshot matches the start of the new segment exactly. Only writing the snapshot
+    runs off the event loop.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+
+    stores = [(gStore, gLock, gJournal)] + [
+        (project.store, project.lock, project.journal)
+        for project in gProjects.values()
+    ]
+    for store, lock, journal in stores:
+        try:
+            if journal is not None and journal.pending:
+                async with lock.write():
+                    # Live projects left empty are dropped along with their journal
+                    if journal.file.closed:
+                        continue
+                    state = store.dump()
+                    segment = journal.rotate()
+                await asyncio.to_thread(journal.write_snapshot, state, segment)
+        except Exception as ex:
+            logging.exception(ex)
+
+
+async def compact_journal():
+    """
+    Compacts the journals every BOM_JOURNAL_COMPACT_SECONDS
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+
+    interval = float(os.environ.get("BOM_JOURNAL_COMPACT_SECONDS", "60"))
+    while True:
+        await asyncio.sleep(interval)
+        await compact_journals()
+
+
+@app.on_event("startup")
+async def start_journal():
+    """
+    Recovers the store from the journal and starts journaling mutations
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+
+    global gStore
+    if gJournal is None:
+        return
+    gJournal.recover(gStore)
+    gStore = JournaledStore(gStore, gJournal)
+    asyncio.create_task(compact_journal())
+
+
+@app.on_event("shutdown")
+async def stop_journal():
+    """
+    Closes the journals of the working and live projects
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    """
+
+    if gJournal is not None:
+        gJournal.close()
+    for project in gProjects.values():
+        if project.journal is not None:
+            project.journal.close()
+
+
+@app.get("/")
+async def hello_world():
+    """
+    GET endpoint that returns hello world
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            data : str
+                Hello World
+    """
+
+    return {"data": "Hello, World"}
+
+
+@app.get("/health")
+async def get_health():
+    """
+    GET endpoint that returns health
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                status of app
+    """
+
+    return {"status": "Running"}
+
+
+@app.get("/journal", status_code=200)
+async def get_journal():
+    """
+    GET endpoint that returns crash recovery journal statistics
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : dict
+                segment : int
+                    Number of the current log segment
+                pending : int
+                    Records appended since the last snapshot
+                recovery : dict
+                    Snapshot restored, records replayed and seconds taken at startup
+                compactions : int
+                    Snapshots written since startup
+                last_compaction : dict
+                    Segment and seconds taken of the last snapshot
+    """
+
+    if gJournal is None:
+        raise HTTPException(status_code=404, detail="Journal not enabled")
+    try:
+        return {
+            "status": "Success",
+            "data": {
+                "segment": gJournal.segment,
+                "pending": gJournal.pending,
+                **gJournal.stats,
+            },
+        }
+    except Exception as ex:
+        logging.exception(ex)
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/metrics", status_code=200)
+async def get_metrics():
+    """
+    GET endpoint that returns metrics of the API in the Prometheus text format
+
+    Request latencies and requests in flight by route, and the time taken and size of
+    store exports and project copies, are recorded as requests are served. The parts,
+    assemblies and tree depth of the working and every live project are counted for
+    each scrape, in the store thread under each project's read lock. Every worker
+    process keeps metrics of its own.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    Response
+        text/plain response of every metric
+    """
+
+    def count(store: BaseStore) -> tuple:
+        return store.part_count(), store.assembly_count(), store.tree_depth()
+
+    try:
+        projects = [("", gStore, gLock)] + [
+            (project_name, project.store, project.lock)
+            for project_name, project in list(gProjects.items())
+        ]
+        async with gLock.read():
+            saved = await offload(gStore.project_names)
+        gauges = [
+            ("bom_live_projects", "", len(gProjects)),
+            ("bom_saved_projects", "", len(saved)),
+        ]
+        for project_name, store, lock in projects:
+            labels = format_labels(("project", project_name))
+            async with lock.read():
+                parts, assemblies, depth = await offload(count, store)
+            gauges += [
+                ("bom_parts", labels, parts),
+                ("bom_assemblies", labels, assemblies),
+                ("bom_tree_depth", labels, depth),
+            ]
+        return Response(gMetrics.render(gauges), media_type="text/plain; version=0.0.4")
+    except Exception as ex:
+        logging.exception(ex)
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/part", status_code=200)
+@read_only
+async def get_part(
+    limit: int | None = None, after: str | None = None, stream: bool = False
+):
+    """
+    GET endpoint that returns all created parts, optionally a page at a time or
+    streamed
+
+    Parameters
+    ----------
+    limit : int, optional
+        Maximum number of items per page
+    after : str, optional
+        Cursor to start after, the next value of the previous page
+    stream : bool, optional
+        Whether to stream all items as NDJSON, one per line
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : JSON
+                JSON representation of list of parts
+            next : str, optional
+                Cursor of the next page, only returned with limit, after or stream
+    """
+
+    try:
+        store = current_store()
+        if limit is None and after is None and not stream:
+            return {
+                "status": "Success",
+                "data": json.dumps(await offload(store.export_parts)),
+            }
+        # Checking if the cursor is a part
+        if after is not None and not store.has_part(after):
+            raise HTTPException(status_code=403, detail="Invalid cursor")
+        return await offload(list_items, store.iter_parts, limit, after, stream)
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/part/{part_name}", status_code=200)
+@read_only
+async def get_part_by_name(part_name: str):
+    """
+    GET endpoint that returns a specific part based on part_name
+
+    Parameters
+    ----------
+    part_name : str
+        Name of part to get
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : JSON
+                JSON representation of part
+    """
+
+    try:
+        store = current_store()
+        if not store.has_part(part_name):
+            return {"status": "Success", "data": None}
+        return {
+            "status": "Success",
+            "data": await offload(store.export_part, part_name),
+        }
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.post("/part", status_code=201)
+@transactional
+def post_part(part: PartModel):
+    """
+    POST endpoint that creates a new part
+
+    Parameters
+    ----------
+    part : PartModel
+        part_name: str
+            Name of part to create
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            message : str
+                Response message
+            data : JSON
+                JSON representation of created part
+    """
+
+    try:
+        store = current_store()
+        if not part.part_name:
+            raise HTTPException(status_code=403, detail="Empty string for part name")
+        if not store.has_part(part.part_name):
+            # Creates a new node for the part
+            store.create_parts([part.part_name])
+            return {
+                "status": "Success",
+                "message": "Part Created",
+                "data": store.export_part(part.part_name),
+            }
+        raise HTTPException(status_code=403, detail="Part exists")
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.post("/part/batch", status_code=201)
+@transactional
+def post_part_batch(parts: PartBatchModel):
+    """
+    POST endpoint that creates many parts in a single request
+
+    Every name is validated in one pass. Valid names are created, while empty names,
+    existing parts and names repeated within the batch are reported per item. Only
+    rejected items are listed in the response to keep large catalog loads small.
+
+    Parameters
+    ----------
+    parts : PartBatchModel
+        part_names: list
+            Names of parts to create
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            message : str
+                Response message
+            data : dict
+                created : int
+                    Number of parts created
+                errors : list
+                    Index, part_name and detail of every rejected item
+    """
+
+    try:
+        store = current_store()
+        if not parts.part_names:
+            raise HTTPException(status_code=403, detail="Invalid input")
+        part_names = []
+        seen = set()
+        errors = []
+        for index, part_name in enumerate(parts.part_names):
+            if not part_name:
+                errors.append(
+                    {
+                        "index": index,
+                        "part_name": part_name,
+                        "detail": "Empty string for part name",
+                    }
+                )
+            elif part_name in seen or store.has_part(part_name):
+                # Covers both existing parts and repeats within this batch
+                errors.append(
+                    {"index": index, "part_name": part_name, "detail": "Part exists"}
+                )
+            else:
+                seen.add(part_name)
+                part_names.append(part_name)
+        store.create_parts(part_names)
+        return {
+            "status": "Success",
+            "message": f"{len(part_names)} of {len(parts.part_names)} parts created",
+            "data": {"created": len(part_names), "errors": errors},
+        }
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.delete("/part/{part_name}", status_code=200)
+@transactional
+def delete_part(part_name: str):
+    """
+    DELETE endpoint that deletes a part by part_name
+
+    Parameters
+    ----------
+    part_name : str
+        Name of part to create
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            message : str
+                Response message
+    """
+
+    try:
+        store = current_store()
+        # Checking if no parts created or part_name provided not created
+        if not store.part_count() or not store.has_part(part_name):
+            raise HTTPException(status_code=403, detail="Part not created")
+        # Detaching part from parent before deleting
+        store.delete_part(part_name)
+        return {"status": "Success", "message": "Part deleted"}
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/part/{part_name}/parents", status_code=200)
+@read_only
+async def get_part_ancestors(part_name: str):
+    """
+    GET endpoint that returns all assemblies that contain a specific child part
+
+    Parameters
+    ----------
+    part_name : str
+        Name of part to get ancestors of
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : JSON
+                JSON representation of list of ancestors of part
+    """
+
+    try:
+        store = current_store()
+        if not store.has_part(part_name):
+            raise HTTPException(status_code=403, detail="Part not created")
+        # Getting all ancestors (assemblies) of specified child part
+        result = await offload(store.export_part_ancestors, part_name)
+        return {"status": "Success", "data": json.dumps(result)}
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/part/{part_name}/where_used", status_code=200)
+@read_only
+async def get_part_where_used(part_name: str):
+    """
+    GET endpoint that returns the names of all assemblies that contain a specific
+    child part, without exporting them
+
+    Parameters
+    ----------
+    part_name : str
+        Name of part to get ancestors of
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : list
+                Names of ancestors of part, in the same order as
+                /part/{part_name}/parents
+    """
+
+    try:
+        store = current_store()
+        if not store.has_part(part_name):
+            raise HTTPException(status_code=403, detail="Part not created")
+        data = await offload(store.part_where_used, part_name)
+        return {"status": "Success", "data": data}
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.post("/part/where_used", status_code=200)
+@read_only
+async def post_part_where_used(parts: PartBatchModel):
+    """
+    POST endpoint that returns the names of all assemblies that contain each of many
+    parts in a single request
+
+    Parameters
+    ----------
+    parts : PartBatchModel
+        part_names: list
+            Names of parts to get ancestors of
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : dict
+                parents : dict
+                    Names of ancestors by part name, in the same order as
+                    /part/{part_name}/parents
+                errors : list
+                    Index, part_name and detail of every part not created
+    """
+
+    try:
+        store = current_store()
+        if not parts.part_names:
+            raise HTTPException(status_code=403, detail="Invalid input")
+        parents = {}
+        errors = []
+        for index, part_name in enumerate(parts.part_names):
+            if not isinstance(part_name, str) or not store.has_part(part_name):
+                errors.append(
+                    {
+                        "index": index,
+                        "part_name": part_name,
+                        "detail": "Part not created",
+                    }
+                )
+            elif part_name not in parents:
+                parents[part_name] = await offload(store.part_where_used, part_name)
+        return {"status": "Success", "data": {"parents": parents, "errors": errors}}
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/assembly", status_code=200)
+@read_only
+async def get_assembly(
+    limit: int | None = None, after: str | None = None, stream: bool = False
+):
+    """
+    GET endpoint that returns all assemblies, optionally a page at a time or streamed
+
+    Parameters
+    ----------
+    limit : int, optional
+        Maximum number of items per page
+    after : str, optional
+        Cursor to start after, the next value of the previous page
+    stream : bool, optional
+        Whether to stream all items as NDJSON, one per line
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : JSON
+                JSON representation of list of all assemblies
+            next : str, optional
+                Cursor of the next page, only returned with limit, after or stream
+    """
+
+    try:
+        store = current_store()
+        if limit is None and after is None and not stream:
+            result = await offload(store.export_assemblies)
+            return {"status": "Success", "data": json.dumps(result)}
+        # Checking if the cursor is an assembly
+        if after is not None and not store.has_assembly(after):
+            raise HTTPException(status_code=403, detail="Invalid cursor")
+        return await offload(list_items, store.iter_assemblies, limit, after, stream)
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/assembly/{assembly_name}", status_code=200)
+@read_only
+async def get_assembly_by_name(
+    assembly_name: str, request: Request, response: Response
+):
+    """
+    GET endpoint that gets a specific assembly based on assembly_name
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly to get
+    request : Request
+        Incoming request, checked for If-None-Match
+    response : Response
+        Outgoing response, given the assembly's version as its ETag
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : JSON
+                JSON representation of assembly
+    """
+
+    try:
+        store = current_store()
+        # Checking if no assemblies created or if assembly_name provided not created
+        if not store.assembly_count() or not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly not created")
+
+        def build():
+            return {
+                "status": "Success",
+                "data": store.export_assembly(assembly_name),
+            }
+
+        return await conditional_get(request, response, assembly_name, build)
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.post("/assembly", status_code=201)
+@transactional
+def post_assembly(assembly: AssemblyModel):
+    """
+    POST endpoint that creates a new assembly
+
+    Parameters
+    ----------
+    part : AssemblyModel
+        assembly_name: str
+            Name of assembly to create
+        part_names : list
+            List of parts to assemble
+        subassembly_names : list, optional
+            List of assemblies to assemble
+        shared_subassembly_names : list, optional
+            List of assemblies to share, which may already have parents
+        quantities : dict, optional
+            Number of each part or subassembly needed by name, 1 when missing
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            message : str
+                Response message
+            data : JSON
+                JSON representation of created assembly
+    """
+
+    try:
+        store = current_store()
+        # Checking if input is valid
+        if not assembly.assembly_name or not assembly.part_names:
+            raise HTTPException(
+                status_code=403, detail="Invalid input"
+            )
+        # Checking if any parts created
+        if not store.part_count():
+            raise HTTPException(status_code=403, detail="No parts created")
+        # Checking if the assembly is already created
+        if store.has_assembly(assembly.assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly exists")
+        for part_name in assembly.part_names:
+            # Checking if the child part is created
+            if not store.has_part(part_name):
+                raise HTTPException(
+                    status_code=404, detail=f"Part name {part_name} doesn't exist"
+                )
+            # Checking if the child part already has a parent
+            if store.part_parent(part_name):
+                raise HTTPException(
+                    status_code=403,
+                    detail=f"Part name {part_name} already has a parent",
+                )
+
+        if assembly.subassembly_names:
+            # Checking if any assemblies created
+            if not store.assembly_count():
+                raise HTTPException(status_code=403, detail="No assemblies created")
+            for subassembly_name in assembly.subassembly_names:
+                # Checking if child subassembly is created
+                if not store.has_assembly(subassembly_name):
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"Assembly name {subassembly_name} doesn't exist",
+                    )
+                # Checking if child subassembly already has a parent
+                if store.assembly_parent(subassembly_name):
+                    raise HTTPException(
+                        status_code=403,
+                        detail=f"Assembly name {subassembly_name} already has a parent",
+                    )
+
+        # Shared subassemblies may already have parents, and a new assembly can't be
+        # below any of them, so sharing can't make a loop
+        shared_names = assembly.shared_subassembly_names or []
+        for subassembly_name in shared_names:
+            if not store.has_assembly(subassembly_name):
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Assembly name {subassembly_name} doesn't exist",
+                )
+        children = set(assembly.subassembly_names or [])
+        if len(set(shared_names)) != len(shared_names) or children & set(shared_names):
+            raise HTTPException(status_code=403, detail="Invalid input")
+
+        # Checking quantities are positive and only given for children of the assembly
+        children |= set(assembly.part_names) | set(shared_names)
+        for name, quantity in (assembly.quantities or {}).items():
+            if name not in children or not is_quantity(quantity):
+                raise HTTPException(status_code=403, detail="Invalid quantity")
+
+        # All inputs are validated before attaching anything, so a rejected request
+        # leaves the store untouched
+        store.create_assembly(
+            assembly.assembly_name,
+            assembly.part_names,
+            assembly.subassembly_names or [],
+            assembly.quantities or {},
+        )
+        for subassembly_name in shared_names:
+            store.share_assembly(
+                assembly.assembly_name,
+                subassembly_name,
+                (assembly.quantities or {}).get(subassembly_name, 1),
+            )
+        return {
+            "status": "Success",
+            "message": "Assembly Created",
+            "data": functools.partial(store.export_assembly, assembly.assembly_name),
+        }
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.post("/assembly/import", status_code=201)
+@transactional
+def import_assembly(assembly_import: AssemblyImportModel):
+    """
+    POST endpoint that imports a whole nested assembly tree in a single request
+
+    Nodes with children become assemblies and leaves become parts. Leaves may name
+    existing orphan parts, which are attached instead of created. The whole tree is
+    validated before anything is created, so a rejected import changes nothing.
+
+    Parameters
+    ----------
+    assembly_import : AssemblyImportModel
+        assembly: dict
+            Nested assembly tree in the shape JsonExporter emits
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            message : str
+                Response message
+            data : dict
+                assembly_name : str
+                    Name of the imported top-level assembly
+                assemblies : int
+                    Number of assemblies created
+                parts : int
+                    Number of parts in the imported tree
+                created_parts : int
+                    Number of parts created
+    """
+
+    try:
+        store = current_store()
+        root = assembly_import.assembly
+        if not isinstance(root, dict) or not root.get("children"):
+            raise HTTPException(status_code=403, detail="Invalid input")
+
+        # Validating the whole tree before creating anything
+        seen = set()
+        stack = [root]
+        while stack:
+            item = stack.pop()
+            if not isinstance(item, dict) or not item.get("id"):
+                raise HTTPException(status_code=403, detail="Invalid input")
+            name = item["id"]
+            children = item.get("children") or []
+            if not isinstance(children, list):
+                raise HTTPException(status_code=403, detail="Invalid input")
+            if "quantity" in item and not is_quantity(item["quantity"]):
+                raise HTTPException(status_code=403, detail="Invalid quantity")
+            if name in seen:
+                raise HTTPException(
+                    status_code=403, detail=f"Name {name} appears more than once"
+                )
+            seen.add(name)
+            if store.has_assembly(name):
+                raise HTTPException(
+                    status_code=403, detail=f"Assembly name {name} already exists"
+                )
+            if children:
+                if store.has_part(name):
+                    raise HTTPException(
+                        status_code=403, detail=f"Part name {name} already exists"
+                    )
+                stack.extend(children)
+            elif store.has_part(name) and store.part_parent(name):
+                raise HTTPException(
+                    status_code=403,
+                    detail=f"Part name {name} already has a parent",
+                )
+
+        # Nothing is exported until the whole tree exists
+        summary = store.import_assembly(root)
+        return {
+            "status": "Success",
+            "message": "Assembly Imported",
+            "data": {"assembly_name": root["id"], **summary},
+        }
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.put("/assembly/{assembly_name}/child/{part_name}", status_code=200)
+@transactional
+def detach_part_assembly(assembly_name: str, part_name: str):
+    """
+    PUT endpoint that detaches part_names from assembly
+
+    Parameters
+    ----------
+    assembly_name: str
+        Name of assembly to detach from
+    part_name: str
+        Name of part to detach
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            message : str
+                Response message
+            data : JSON
+                JSON representation of assembly with detached part
+    """
+
+    try:
+        store = current_store()
+        if not store.part_count():
+            raise HTTPException(status_code=403, detail="No parts created")
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name doesn't exist")
+        # Checking if part_name exists and its parent is assembly_name
+        if store.has_part(part_name) and store.part_parent(part_name) == assembly_name:
+            # Detaching part_name from parent assembly
+            store.detach_part(part_name)
+        else:
+            raise HTTPException(
+                status_code=403, detail="Part name provided not in assembly"
+            )
+        return {
+            "status": "Success",
+            "message": "Assembly parts removed",
+            "data": functools.partial(store.export_assembly, assembly_name),
+        }
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.post("/assembly/{assembly_name}/child/{part_name}", status_code=200)
+@transactional
+def attach_part_assembly(assembly_name: str, part_name: str, quantity: int = 1):
+    """
+    POST endpoint that attaches part_names to assembly
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly to attach to
+    part_name : str
+        Name of part to attach
+    quantity : int, optional
+        Number of the part the assembly needs
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            message : str
+                Response message
+            data : JSON
+                JSON representation of assembly with attached part
+    """
+
+    try:
+        store = current_store()
+        if not store.part_count():
+            raise HTTPException(status_code=403, detail="No parts created")
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name doesn't exist")
+        if not is_quantity(quantity):
+            raise HTTPException(status_code=403, detail="Invalid quantity")
+        # Checking if part_name exists and is an orphan
+        if store.has_part(part_name) and not store.part_parent(part_name):
+            # Attaching part_name to parent assembly
+            store.attach_part(assembly_name, part_name, quantity)
+        else:
+            raise HTTPException(status_code=403, detail="Part name provided has parent")
+        return {
+            "status": "Success",
+            "message": "Assembly parts attached",
+            "data": functools.partial(store.export_assembly, assembly_name),
+        }
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.post("/assembly/{assembly_name}/shared/{subassembly_name}", status_code=200)
+@transactional
+def share_assembly(assembly_name: str, subassembly_name: str, quantity: int = 1):
+    """
+    POST endpoint that shares an assembly with another, keeping its own parent
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly to share with
+    subassembly_name : str
+        Name of assembly to share
+    quantity : int, optional
+        Number of the shared assembly the assembly needs
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            message : str
+                Response message
+            data : JSON
+                JSON representation of assembly with shared assembly
+    """
+
+    try:
+        store = current_store()
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name doesn't exist")
+        if not store.has_assembly(subassembly_name):
+            raise HTTPException(
+                status_code=403, detail="Subassembly name doesn't exist"
+            )
+        if not is_quantity(quantity):
+            raise HTTPException(status_code=403, detail="Invalid quantity")
+        # Checking if the subassembly is already a child of the assembly
+        if (
+            subassembly_name in store.shared_subassemblies(assembly_name)
+            or store.assembly_parent(subassembly_name) == assembly_name
+        ):
+            raise HTTPException(
+                status_code=403, detail="Subassembly name provided in assembly"
+            )
+        # Checking the assembly isn't below the shared assembly, which would make a loop
+        if assembly_name == subassembly_name or store.assembly_contains(
+            subassembly_name, "assembly", assembly_name
+        ):
+            raise HTTPException(
+                status_code=403, detail="Subassembly name provided contains assembly"
+            )
+        store.share_assembly(assembly_name, subassembly_name, quantity)
+        return {
+            "status": "Success",
+            "message": "Assembly shared",
+            "data": functools.partial(store.export_assembly, assembly_name),
+        }
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.put("/assembly/{assembly_name}/shared/{subassembly_name}", status_code=200)
+@transactional
+def unshare_assembly(assembly_name: str, subassembly_name: str):
+    """
+    PUT endpoint that stops sharing an assembly with another
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly sharing it
+    subassembly_name : str
+        Name of shared assembly
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            message : str
+                Response message
+            data : JSON
+                JSON representation of assembly without shared assembly
+    """
+
+    try:
+        store = current_store()
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name doesn't exist")
+        if subassembly_name not in store.shared_subassemblies(assembly_name):
+            raise HTTPException(
+                status_code=403, detail="Subassembly name provided not shared"
+            )
+        store.unshare_assembly(assembly_name, subassembly_name)
+        return {
+            "status": "Success",
+            "message": "Assembly unshared",
+            "data": functools.partial(store.export_assembly, assembly_name),
+        }
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/assembly/{assembly_name}/first", status_code=200)
+@read_only
+async def get_assembly_first_children(
+    assembly_name: str, request: Request, response: Response
+):
+    """
+    GET endpoint that returns first level children of specific assembly
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly to get first level children from
+    request : Request
+        Incoming request, checked for If-None-Match
+    response : Response
+        Outgoing response, given the assembly's version as its ETag
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : JSON
+                JSON representation of a list of first level children
+    """
+
+    try:
+        store = current_store()
+        # Checking if specified assembly exists
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name not created")
+
+        def build():
+            # Getting first level children of specified assembly
+            result = store.export_first_children(assembly_name)
+            return {"status": "Success", "data": json.dumps(result)}
+
+        return await conditional_get(request, response, assembly_name, build)
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/assembly/{assembly_name}/children", status_code=200)
+@read_only
+async def get_assembly_children(
+    assembly_name: str,
+    request: Request,
+    response: Response,
+    limit: int | None = None,
+    after: str | None = None,
+    stream: bool = False,
+):
+    """
+    GET endpoint that returns all children of specific assembly
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly to detach from
+    request : Request
+        Incoming request, checked for If-None-Match
+    response : Response
+        Outgoing response, given the assembly's version as its ETag
+    limit : int, optional
+        Maximum number of items per page
+    after : str, optional
+        Cursor to start after, the next value of the previous page
+    stream : bool, optional
+        Whether to stream all items as NDJSON, one per line
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : JSON
+                JSON representation of list of a list of assembly children
+            next : str, optional
+                Cursor of the next page, only returned with limit, after or stream
     """
 
-    part_name: str
+    try:
+        store = current_store()
+        # Checking if specified assembly exists
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name not created")
+        # Checking if the cursor is a descendant of the assembly
+        if after is not None and not await offload(is_descendant, assembly_name, after):
+            raise HTTPException(status_code=403, detail="Invalid cursor")
 
+        iterate = subtree_listing(store.iter_descendants, assembly_name)
 
-class AssemblyModel(BaseModel):
+        def build():
+            if limit is None and after is None and not stream:
+                # Getting all descendants (children) of specified assembly
+                result = store.export_descendants(assembly_name)
+                return {"status": "Success", "data": json.dumps(result)}
+            return list_items(iterate, limit, after, stream)
+
+        return await conditional_get(
+            request, response, assembly_name, build, (limit, after), stream
+        )
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/assembly/{assembly_name}/leaves", status_code=200)
+@read_only
+async def get_assembly_leaves(
+    assembly_name: str,
+    request: Request,
+    response: Response,
+    limit: int | None = None,
+    after: str | None = None,
+    stream: bool = False,
+):
     """
-    Data model for POST assembly API
-        assembly_name : str
-            Name of assembly to create
-        part_names : list
-            Names of parts to add to assembly
-        subassembly_names : list, optional
-            Names of subassemblies to add to assembly
+    GET endpoint that returns all parts in a specific assembly that are not subassemblies
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly to detach from
+    request : Request
+        Incoming request, checked for If-None-Match
+    response : Response
+        Outgoing response, given the assembly's version as its ETag
+    limit : int, optional
+        Maximum number of items per page
+    after : str, optional
+        Cursor to start after, the next value of the previous page
+    stream : bool, optional
+        Whether to stream all items as NDJSON, one per line
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : JSON
+                JSON representation of list of a list of assembly leaves
+            next : str, optional
+                Cursor of the next page, only returned with limit, after or stream
     """
 
-    assembly_name: str
-    part_names: list
-    subassembly_names: list | None = None
+    try:
+        store = current_store()
+        # Checking if specified assembly exists
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name not created")
+        # Checking if the cursor is a descendant of the assembly
+        if after is not None and not await offload(is_descendant, assembly_name, after):
+            raise HTTPException(status_code=403, detail="Invalid cursor")
 
+        iterate = subtree_listing(store.iter_leaves, assembly_name)
 
-# Key-Value pairs of all part names with their corresponding AnyTree nodes
-gParts = {}
-# Key-Value pairs of all assembly names with their corresponding AnyTree nodes
-gAssemblies = {}
-# Dictionary to store assembly projects
-gProjects = {}
+        def build():
+            if limit is None and after is None and not stream:
+                # Getting all leaves (parts with no children) for specified assembly
+                result = store.export_leaves(assembly_name)
+                return {"status": "Success", "data": json.dumps(result)}
+            return list_items(iterate, limit, after, stream)
 
-# To export AnyTree node to JSON
-exporter = JsonExporter(sort_keys=True)
-# Logging to file
-logging.basicConfig(
-    filename="logs/app.log",
-    filemode="w",
-    format="%(name)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+        return await conditional_get(
+            request, response, assembly_name, build, (limit, after), stream
+        )
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-app = FastAPI()
+@app.get("/assembly/{assembly_name}/contains/{name}", status_code=200)
+@read_only
+async def get_assembly_contains(assembly_name: str, name: str):
+    """
+    GET endpoint that checks if a part or assembly is anywhere inside an assembly
 
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly to search
+    name : str
+        Name of part, or of assembly if no part has the name
 
-@app.get("/")
-async def hello_world():
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : bool
+                True if the part or assembly is a descendant of the assembly
     """
-    GET endpoint that returns hello world
+
+    try:
+        store = current_store()
+        # Checking if specified assembly exists
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name not created")
+        # Checking if specified part or assembly exists
+        if store.has_part(name):
+            kind = "part"
+        elif store.has_assembly(name):
+            kind = "assembly"
+        else:
+            raise HTTPException(status_code=403, detail="Part not created")
+        result = await offload(store.assembly_contains, assembly_name, kind, name)
+        return {"status": "Success", "data": result}
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/assembly/{assembly_name}/explode", status_code=200)
+@read_only
+async def get_assembly_explode(
+    assembly_name: str, request: Request, response: Response
+):
+    """
+    GET endpoint that gets the total quantity of every part needed to build an
+    assembly, multiplying quantities down through its subassemblies
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly to explode
+    request : Request
+        Incoming request, checked for If-None-Match
+    response : Response
+        Outgoing response, given the assembly's version as its ETag
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : dict
+                Total quantity by part name
+    """
+
+    try:
+        store = current_store()
+        # Checking if specified assembly exists
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name not created")
+
+        def build():
+            return {"status": "Success", "data": store.explode_assembly(assembly_name)}
+
+        return await conditional_get(request, response, assembly_name, build)
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/top_assembly", status_code=200)
+@read_only
+async def top_assembly():
+    """
+    GET endpoint that returns all top level assemblies
 
     Parameters
     ----------
@@ -72,17 +2242,25 @@ async def hello_world():
     -------
     Response
         HTTP response object:
-            data : str
-                Hello World
+            status : str
+                Status of request
+            data : JSON
+                JSON representation of a list of top-level assemblies
     """
 
-    return {"data": "Hello, World"}
+    try:
+        result = await offload(current_store().export_top_assemblies)
+        return {"status": "Success", "data": json.dumps(result)}
+    except Exception as ex:
+        logging.exception(ex)
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/health")
-async def get_health():
+@app.get("/subassembly", status_code=200)
+@read_only
+async def get_subassembly():
     """
-    GET endpoint that returns health
+    GET endpoint that returns all subassemblies
 
     Parameters
     ----------
@@ -93,16 +2271,25 @@ async def get_health():
     Response
         HTTP response object:
             status : str
-                status of app
+                Status of request
+            data : JSON
+                JSON representation of a list of subassemblies
     """
 
-    return {"status": "Running"}
+    try:
+        # Getting all assemblies with parents
+        result = await offload(current_store().export_subassemblies)
+        return {"status": "Success", "data": json.dumps(result)}
+    except Exception as ex:
+        logging.exception(ex)
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/part", status_code=200)
-async def get_part():
+@app.get("/component", status_code=200)
+@read_only
+async def get_component_part():
     """
-    GET endpoint that returns all created parts
+    GET endpoint that returns component parts
 
     Parameters
     ----------
@@ -115,28 +2302,27 @@ async def get_part():
             status : str
                 Status of request
             data : JSON
-                JSON representation of list of parts
+                JSON representation of a list of component parts
     """
 
     try:
-        result = []
-        for item in gParts.values():
-            result.append(exporter.export(item))
+        # Getting all parts with parents
+        result = await offload(current_store().export_components)
         return {"status": "Success", "data": json.dumps(result)}
     except Exception as ex:
         logging.exception(ex)
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/part/{part_name}", status_code=200)
-async def get_part_by_name(part_name: str):
+@app.get("/orphan", status_code=200)
+@read_only
+async def get_orphan_part():
     """
-    GET endpoint that returns a specific part based on part_name
+    GET endpoint that returns parts that have no parents or children
 
     Parameters
     ----------
-    part_name : str
-        Name of part to get
+    None
 
     Returns
     -------
@@ -145,29 +2331,28 @@ async def get_part_by_name(part_name: str):
             status : str
                 Status of request
             data : JSON
-                JSON representation of part
+                JSON representation of list of orphan parts
     """
 
     try:
-        return {
-            "status": "Success",
-            "data": exporter.export(gParts[part_name]) if part_name in gParts else None,
-        }
+        # Getting all parts that don't have any parents or children
+        result = await offload(current_store().export_orphans)
+        return {"status": "Success", "data": json.dumps(result)}
     except Exception as ex:
         logging.exception(ex)
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.post("/part", status_code=201)
-async def post_part(part: PartModel):
+@app.get("/project/{project_name}", status_code=200)
+@transactional
+def get_project(project_name: str):
     """
-    POST endpoint that creates a new part
+    GET endpoint that copies saved assembly projects
 
     Parameters
     ----------
-    part : PartModel
-        part_name: str
-            Name of part to create
+    project_name : str
+        Name of project to copy
 
     Returns
     -------
@@ -177,22 +2362,16 @@ async def post_part(part: PartModel):
                 Status of request
             message : str
                 Response message
-            data : JSON
-                JSON representation of created part
     """
 
     try:
-        if not part.part_name:
-            raise HTTPException(status_code=403, detail="Empty string for part name")
-        if part.part_name not in gParts:
-            # Creates a new node for the part
-            gParts[part.part_name] = AnyNode(id=part.part_name)
-            return {
-                "status": "Success",
-                "message": "Part Created",
-                "data": exporter.export(gParts[part.part_name]),
-            }
-        raise HTTPException(status_code=403, detail="Part exists")
+        store = current_store()
+        if not store.has_project(project_name):
+            raise HTTPException(status_code=404, detail="Project name does not exist")
+
+        # Getting a copy of saved assembly projects
+        store.load_project(project_name)
+        return {"status": "Success", "message": "Project copied"}
     except Exception as ex:
         logging.exception(ex)
         if isinstance(ex, HTTPException):
@@ -200,15 +2379,19 @@ async def post_part(part: PartModel):
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.delete("/part/{part_name}", status_code=200)
-async def delete_part(part_name: str):
+@app.post("/project/{project_name}", status_code=201)
+@transactional
+def post_project(project_name: str, variant: bool = False):
     """
-    DELETE endpoint that deletes a part by part_name
+    POST endpoint that saves an assembly project and clears current project
 
     Parameters
     ----------
-    part_name : str
-        Name of part to create
+    project_name : str
+        Name of project to save
+    variant : bool, optional
+        Whether to save only the differences from the project the current project was
+        copied from, so variants of a large project cost as much as their changes
 
     Returns
     -------
@@ -221,13 +2404,75 @@ async def delete_part(part_name: str):
     """
 
     try:
-        # Checking if no parts created or part_name provided not created
-        if not gParts or part_name not in gParts:
-            raise HTTPException(status_code=403, detail="Part not created")
-        # Detaching part from parent before deleting
-        gParts[part_name].parent = None
-        del gParts[part_name]
-        return {"status": "Success", "message": "Part deleted"}
+        store = current_store()
+        # Live projects are kept apart from saved ones, so a name can't be both
+        if is_live(project_name):
+            raise HTTPException(status_code=403, detail="Project name is live")
+
+        # Variants are replayed on their base project, so it can't be replaced
+        if store.has_variants(project_name):
+            raise HTTPException(status_code=403, detail="Project has variants")
+
+        if variant:
+            base_name = store.working_base()
+            if base_name is None:
+                raise HTTPException(status_code=403, detail="No project copied")
+            if base_name == project_name:
+                raise HTTPException(
+                    status_code=403, detail="Variant can't replace its base"
+                )
+
+            # Saving the changes made since the base project was copied
+            store.save_variant(project_name)
+            return {"status": "Success", "message": "Variant saved"}
+
+        # Saving assembly project
+        store.save_project(project_name)
+        return {"status": "Success", "message": "Project saved"}
+    except Exception as ex:
+        logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
+        raise HTTPException(status_code=500, detail=str(ex)) from ex
+
+
+@app.get("/project/{project_name}/diff/{other_name}", status_code=200)
+@read_only
+async def get_project_diff(project_name: str, other_name: str):
+    """
+    GET endpoint that returns what changed between two saved assembly projects
+
+    Only subassemblies whose content hashes differ are compared, so the cost grows
+    with the changes rather than the size of the projects.
+
+    Parameters
+    ----------
+    project_name : str
+        Name of project to compare from
+    other_name : str
+        Name of project to compare to
+
+    Returns
+    -------
+    Response
+        HTTP response object:
+            status : str
+                Status of request
+            data : dict
+                Nodes added, removed and changed, and assemblies shared and unshared
+    """
+
+    try:
+        store = current_store()
+        for name in (project_name, other_name):
+            if not store.has_project(name):
+                raise HTTPException(
+                    status_code=404, detail="Project name does not exist"
+                )
+
+        # Comparing the projects, skipping identical subtrees
+        result = await offload(store.diff_projects, project_name, other_name)
+        return {"status": "Success", "data": result}
     except Exception as ex:
         logging.exception(ex)
         if isinstance(ex, HTTPException):
@@ -235,118 +2480,92 @@ async def delete_part(part_name: str):
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/part/{part_name}/parents", status_code=200)
-async def get_part_ancestors(part_name: str):
+# Version 2 of the read endpoints, returning nested JSON instead of JSON strings
+v2 = APIRouter(prefix="/v2", route_class=MeteredRoute)
+
+
+def encode_json(value) -> bytes:
     """
-    GET endpoint that returns all assemblies that contain a specific child part
+    Function to encode a value as JSON, through orjson when it is installed
 
     Parameters
     ----------
-    part_name : str
-        Name of part to get ancestors of
+    value : Any
+        JSON-serializable value
 
     Returns
     -------
-    Response
-        HTTP response object:
-            status : str
-                Status of request
-            data : JSON
-                JSON representation of list of ancestors of part
+    bytes
+        UTF-8 encoded JSON
     """
 
-    try:
-        result = []
-        # Getting all ancestors (assemblies) of specified child part
-        part_ancestors = gParts[part_name].ancestors
-        for item in part_ancestors:
-            result.append(exporter.export(item))
-        return {"status": "Success", "data": json.dumps(result)}
-    except Exception as ex:
-        logging.exception(ex)
-        raise HTTPException(status_code=500, detail=str(ex)) from ex
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
 
 
-@app.get("/assembly", status_code=200)
-async def get_assembly():
+def native_response(data: str, **fields) -> Response:
     """
-    GET endpoint that returns all assemblies
+    Builds a response embedding already serialized JSON as its data
+
+    Stores export subtrees as JSON strings, cached across requests, so they are
+    spliced into the response body as is rather than decoded and encoded again.
 
     Parameters
     ----------
-    None
+    data : str
+        JSON representation of the data
+    **fields
+        Other fields of the response, encoded with encode_json
 
     Returns
     -------
     Response
-        HTTP response object:
+        application/json response object:
             status : str
                 Status of request
             data : JSON
-                JSON representation of list of all assemblies
+                Data
     """
 
-    try:
-        result = []
-        for item in gAssemblies.values():
-            result.append(exporter.export(item))
-        return {"status": "Success", "data": json.dumps(result)}
-    except Exception as ex:
-        logging.exception(ex)
-        raise HTTPException(status_code=500, detail=str(ex)) from ex
+    body = [b'{"status":"Success","data":', data.encode()]
+    for key, value in fields.items():
+        body += [b',"', key.encode(), b'":', encode_json(value)]
+    body.append(b"}")
+    return Response(b"".join(body), media_type="application/json")
 
 
-@app.get("/assembly/{assembly_name}", status_code=200)
-async def get_assembly_by_name(assembly_name: str):
+def native_list(items: list) -> str:
     """
-    GET endpoint that gets a specific assembly based on assembly_name
+    Joins the JSON representations of items into a JSON list
 
     Parameters
     ----------
-    assembly_name : str
-        Name of assembly to get
+    items : list
+        JSON representations of items
 
     Returns
     -------
-    Response
-        HTTP response object:
-            status : str
-                Status of request
-            data : JSON
-                JSON representation of assembly
+    str
+        JSON representation of the list
     """
 
-    try:
-        # Checking if no assemblies created or if assembly_name provided not created
-        if not gAssemblies or assembly_name not in gAssemblies:
-            raise HTTPException(status_code=403, detail="Assembly not created")
-        return {
-            "status": "Success",
-            "data": exporter.export(gAssemblies[assembly_name])
-            if assembly_name in gAssemblies
-            else None,
-        }
-    except Exception as ex:
-        logging.exception(ex)
-        if isinstance(ex, HTTPException):
-            raise ex
-        raise HTTPException(status_code=500, detail=str(ex)) from ex
+    return "[" + ", ".join(items) + "]"
 
 
-@app.post("/assembly", status_code=201)
-async def post_assembly(assembly: AssemblyModel):
+@v2.get("/part", status_code=200)
+@read_only
+async def get_part_v2(limit: int | None = None, after: str | None = None):
     """
-    POST endpoint that creates a new assembly
+    GET endpoint that returns all created parts as nested JSON, optionally a page at
+    a time
 
     Parameters
     ----------
-    part : AssemblyModel
-        assembly_name: str
-            Name of assembly to create
-        part_names : list
-            List of parts to assemble
-        subassembly_names : list, optional
-            List of assemblies to assemble
+    limit : int, optional
+        Maximum number of items per page
+    after : str, optional
+        Cursor to start after, the next value of the previous page
 
     Returns
     -------
@@ -354,67 +2573,19 @@ async def post_assembly(assembly: AssemblyModel):
         HTTP response object:
             status : str
                 Status of request
-            message : str
-                Response message
-            data : JSON
-                JSON representation of created assembly
+            data : list
+                Parts
+            next : str, optional
+                Cursor of the next page, or None on the last page
     """
 
     try:
-        # Checking if input is valid
-        if not assembly.assembly_name or not assembly.part_names:
-            raise HTTPException(
-                status_code=403, detail="Invalid input"
-            )
-        # Checking if any parts created
-        if not gParts:
-            raise HTTPException(status_code=403, detail="No parts created")
-        for part_name in assembly.part_names:
-            # Checking if the child part is created
-            if part_name not in gParts:
-                raise HTTPException(
-                    status_code=404, detail=f"Part name {part_name} doesn't exist"
-                )
-            # Checking if the child part already has a parent
-            if gParts[part_name].parent:
-                raise HTTPException(
-                    status_code=403,
-                    detail=f"Part name {part_name} already has a parent",
-                )
-
-        new_assembly = AnyNode(id=assembly.assembly_name)
-        # Attaching child parts to new assembly
-        for part_name in assembly.part_names:
-            gParts[part_name].parent = new_assembly
-
-        if assembly.subassembly_names:
-            # Checking if any assemblies created
-            if not gAssemblies:
-                raise HTTPException(status_code=403, detail="No assemblies created")
-            for subassembly_name in assembly.subassembly_names:
-                # Checking if child subassembly is created
-                if subassembly_name not in gAssemblies:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Assembly name {subassembly_name} doesn't exist",
-                    )
-                # Checking if child subassembly already has a parent
-                if gAssemblies[subassembly_name].parent:
-                    raise HTTPException(
-                        status_code=403,
-                        detail=f"Assembly name {subassembly_name} already has a parent",
-                    )
-            # Attaching child assemblies to new assembly
-            for subassembly_name in assembly.subassembly_names:
-                gAssemblies[subassembly_name].parent = new_assembly
-
-        # Adding new assembly to top-level assembly and assembly data stores
-        gAssemblies[assembly.assembly_name] = new_assembly
-        return {
-            "status": "Success",
-            "message": "Assembly Created",
-            "data": exporter.export(new_assembly),
-        }
+        store = current_store()
+        # Checking if the cursor is a part
+        if after is not None and not store.has_part(after):
+            raise HTTPException(status_code=403, detail="Invalid cursor")
+        items, cursor = await offload(read_page, store.iter_parts, limit, after)
+        return native_response(native_list(items), next=cursor)
     except Exception as ex:
         logging.exception(ex)
         if isinstance(ex, HTTPException):
@@ -422,17 +2593,16 @@ async def post_assembly(assembly: AssemblyModel):
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.put("/assembly/{assembly_name}/child/{part_name}", status_code=200)
-async def detach_part_assembly(assembly_name: str, part_name: str):
+@v2.get("/part/{part_name}", status_code=200)
+@read_only
+async def get_part_by_name_v2(part_name: str):
     """
-    PUT endpoint that detaches part_names from assembly
+    GET endpoint that returns a specific part as nested JSON
 
     Parameters
     ----------
-    assembly_name: str
-        Name of assembly to detach from
-    part_name: str
-        Name of part to detach
+    part_name : str
+        Name of part to get
 
     Returns
     -------
@@ -440,30 +2610,15 @@ async def detach_part_assembly(assembly_name: str, part_name: str):
         HTTP response object:
             status : str
                 Status of request
-            message : str
-                Response message
-            data : JSON
-                JSON representation of assembly with detached part
+            data : dict
+                Part, or None if not created
     """
 
     try:
-        if not gParts:
-            raise HTTPException(status_code=403, detail="No parts created")
-        if assembly_name not in gAssemblies:
-            raise HTTPException(status_code=403, detail="Assembly name doesn't exist")
-        # Checking if part_name exists and its parent is assembly_name
-        if part_name in gParts and gParts[part_name].parent.id == assembly_name:
-            # Detaching part_name from parent assembly
-            gParts[part_name].parent = None
-        else:
-            raise HTTPException(
-                status_code=403, detail="Part name provided not in assembly"
-            )
-        return {
-            "status": "Success",
-            "message": "Assembly parts removed",
-            "data": exporter.export(gAssemblies[assembly_name]),
-        }
+        store = current_store()
+        if not store.has_part(part_name):
+            return native_response("null")
+        return native_response(await offload(store.export_part, part_name))
     except Exception as ex:
         logging.exception(ex)
         if isinstance(ex, HTTPException):
@@ -471,17 +2626,17 @@ async def detach_part_assembly(assembly_name: str, part_name: str):
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.post("/assembly/{assembly_name}/child/{part_name}", status_code=200)
-async def attach_part_assembly(assembly_name: str, part_name: str):
+@v2.get("/part/{part_name}/parents", status_code=200)
+@read_only
+async def get_part_ancestors_v2(part_name: str):
     """
-    POST endpoint that attaches part_names to assembly
+    GET endpoint that returns all assemblies that contain a specific child part as
+    nested JSON
 
     Parameters
     ----------
-    assembly_name : str
-        Name of assembly to attach to
     part_name : str
-        Name of part to attach
+        Name of part to get ancestors of
 
     Returns
     -------
@@ -489,28 +2644,16 @@ async def attach_part_assembly(assembly_name: str, part_name: str):
         HTTP response object:
             status : str
                 Status of request
-            message : str
-                Response message
-            data : JSON
-                JSON representation of assembly with attached part
+            data : list
+                Ancestors of part, from the top-level assembly down
     """
 
     try:
-        if not gParts:
-            raise HTTPException(status_code=403, detail="No parts created")
-        if assembly_name not in gAssemblies:
-            raise HTTPException(status_code=403, detail="Assembly name doesn't exist")
-        # Checking if part_name exists and is an orphan
-        if part_name in gParts and not gParts[part_name].parent:
-            # Attaching part_name to parent assembly
-            gParts[part_name].parent = gAssemblies[assembly_name]
-        else:
-            raise HTTPException(status_code=403, detail="Part name provided has parent")
-        return {
-            "status": "Success",
-            "message": "Assembly parts attached",
-            "data": exporter.export(gAssemblies[assembly_name]),
-        }
+        store = current_store()
+        if not store.has_part(part_name):
+            raise HTTPException(status_code=403, detail="Part not created")
+        result = await offload(store.export_part_ancestors, part_name)
+        return native_response(native_list(result))
     except Exception as ex:
         logging.exception(ex)
         if isinstance(ex, HTTPException):
@@ -518,15 +2661,19 @@ async def attach_part_assembly(assembly_name: str, part_name: str):
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/assembly/{assembly_name}/first", status_code=200)
-async def get_assembly_first_children(assembly_name: str):
+@v2.get("/assembly", status_code=200)
+@read_only
+async def get_assembly_v2(limit: int | None = None, after: str | None = None):
     """
-    GET endpoint that returns first level children of specific assembly
+    GET endpoint that returns all assemblies as nested JSON, optionally a page at a
+    time
 
     Parameters
     ----------
-    assembly_name : str
-        Name of assembly to get first level children from
+    limit : int, optional
+        Maximum number of items per page
+    after : str, optional
+        Cursor to start after, the next value of the previous page
 
     Returns
     -------
@@ -534,20 +2681,19 @@ async def get_assembly_first_children(assembly_name: str):
         HTTP response object:
             status : str
                 Status of request
-            data : JSON
-                JSON representation of a list of first level children
+            data : list
+                Assemblies with their subtrees
+            next : str, optional
+                Cursor of the next page, or None on the last page
     """
 
     try:
-        result = []
-        # Checking if specified assembly exists
-        if assembly_name not in gAssemblies:
-            raise HTTPException(status_code=403, detail="Assembly name not created")
-        # Getting first level children of specified assembly
-        assembly_children = gAssemblies[assembly_name].children
-        for item in assembly_children:
-            result.append(exporter.export(item))
-        return {"status": "Success", "data": json.dumps(result)}
+        store = current_store()
+        # Checking if the cursor is an assembly
+        if after is not None and not store.has_assembly(after):
+            raise HTTPException(status_code=403, detail="Invalid cursor")
+        items, cursor = await offload(read_page, store.iter_assemblies, limit, after)
+        return native_response(native_list(items), next=cursor)
     except Exception as ex:
         logging.exception(ex)
         if isinstance(ex, HTTPException):
@@ -555,15 +2701,22 @@ async def get_assembly_first_children(assembly_name: str):
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/assembly/{assembly_name}/children", status_code=200)
-async def get_assembly_children(assembly_name: str):
+@v2.get("/assembly/{assembly_name}", status_code=200)
+@read_only
+async def get_assembly_by_name_v2(
+    assembly_name: str, request: Request, response: Response
+):
     """
-    GET endpoint that returns all children of specific assembly
+    GET endpoint that returns a specific assembly with its subtree as nested JSON
 
     Parameters
     ----------
     assembly_name : str
-        Name of assembly to detach from
+        Name of assembly to get
+    request : Request
+        Incoming request, checked for If-None-Match
+    response : Response
+        Outgoing response, given the assembly's version as its ETag
 
     Returns
     -------
@@ -571,20 +2724,19 @@ async def get_assembly_children(assembly_name: str):
         HTTP response object:
             status : str
                 Status of request
-            data : JSON
-                JSON representation of a list of assembly children
+            data : dict
+                Assembly with its subtree
     """
 
     try:
-        result = []
-        # Checking if specified assembly exists
-        if assembly_name not in gAssemblies:
-            raise HTTPException(status_code=403, detail="Assembly name not created")
-        # Getting all descendants (children) of specified assembly
-        assembly_children = gAssemblies[assembly_name].descendants
-        for item in assembly_children:
-            result.append(exporter.export(item))
-        return {"status": "Success", "data": json.dumps(result)}
+        store = current_store()
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly not created")
+
+        def build():
+            return native_response(store.export_assembly(assembly_name))
+
+        return await conditional_get(request, response, assembly_name, build)
     except Exception as ex:
         logging.exception(ex)
         if isinstance(ex, HTTPException):
@@ -592,15 +2744,23 @@ async def get_assembly_children(assembly_name: str):
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/assembly/{assembly_name}/leaves", status_code=200)
-async def get_assembly_leaves(assembly_name: str):
+@v2.get("/assembly/{assembly_name}/first", status_code=200)
+@read_only
+async def get_assembly_first_children_v2(
+    assembly_name: str, request: Request, response: Response
+):
     """
-    GET endpoint that returns all parts in a specific assembly that are not subassemblies
+    GET endpoint that returns first level children of specific assembly as nested
+    JSON
 
     Parameters
     ----------
     assembly_name : str
-        Name of assembly to detach from
+        Name of assembly to get first level children from
+    request : Request
+        Incoming request, checked for If-None-Match
+    response : Response
+        Outgoing response, given the assembly's version as its ETag
 
     Returns
     -------
@@ -608,20 +2768,21 @@ async def get_assembly_leaves(assembly_name: str):
         HTTP response object:
             status : str
                 Status of request
-            data : JSON
-                JSON representation of a list of assembly leaves
+            data : list
+                First level children
     """
 
     try:
-        result = []
+        store = current_store()
         # Checking if specified assembly exists
-        if assembly_name not in gAssemblies:
+        if not store.has_assembly(assembly_name):
             raise HTTPException(status_code=403, detail="Assembly name not created")
-        # Getting all leaves (parts with no children) for specified assembly
-        assembly_children = gAssemblies[assembly_name].leaves
-        for item in assembly_children:
-            result.append(exporter.export(item))
-        return {"status": "Success", "data": json.dumps(result)}
+
+        def build():
+            result = store.export_first_children(assembly_name)
+            return native_response(native_list(result))
+
+        return await conditional_get(request, response, assembly_name, build)
     except Exception as ex:
         logging.exception(ex)
         if isinstance(ex, HTTPException):
@@ -629,14 +2790,31 @@ async def get_assembly_leaves(assembly_name: str):
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/top_assembly", status_code=200)
-async def top_assembly():
+@v2.get("/assembly/{assembly_name}/children", status_code=200)
+@read_only
+async def get_assembly_children_v2(
+    assembly_name: str,
+    request: Request,
+    response: Response,
+    limit: int | None = None,
+    after: str | None = None,
+):
     """
-    GET endpoint that returns all top level assemblies
+    GET endpoint that returns all children of specific assembly as nested JSON,
+    optionally a page at a time
 
     Parameters
     ----------
-    None
+    assembly_name : str
+        Name of assembly to get all children from
+    request : Request
+        Incoming request, checked for If-None-Match
+    response : Response
+        Outgoing response, given the assembly's version as its ETag
+    limit : int, optional
+        Maximum number of items per page
+    after : str, optional
+        Cursor to start after, the next value of the previous page
 
     Returns
     -------
@@ -644,29 +2822,62 @@ async def top_assembly():
         HTTP response object:
             status : str
                 Status of request
-            data : JSON
-                JSON representation of a list of top-level assemblies
+            data : list
+                Descendants in pre-order
+            next : str, optional
+                Cursor of the next page, or None on the last page
     """
 
     try:
-        result = []
-        for item in gAssemblies.values():
-            if not item.parent:
-                result.append(exporter.export(item))
-        return {"status": "Success", "data": json.dumps(result)}
+        store = current_store()
+        # Checking if specified assembly exists
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name not created")
+        # Checking if the cursor is a descendant of the assembly
+        if after is not None and not await offload(is_descendant, assembly_name, after):
+            raise HTTPException(status_code=403, detail="Invalid cursor")
+
+        iterate = subtree_listing(store.iter_descendants, assembly_name)
+
+        def build():
+            items, cursor = read_page(iterate, limit, after)
+            return native_response(native_list(items), next=cursor)
+
+        return await conditional_get(
+            request, response, assembly_name, build, (limit, after)
+        )
     except Exception as ex:
         logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/subassembly", status_code=200)
-async def get_subassembly():
+@v2.get("/assembly/{assembly_name}/leaves", status_code=200)
+@read_only
+async def get_assembly_leaves_v2(
+    assembly_name: str,
+    request: Request,
+    response: Response,
+    limit: int | None = None,
+    after: str | None = None,
+):
     """
-    GET endpoint that returns all subassemblies
+    GET endpoint that returns all parts in a specific assembly that are not
+    subassemblies as nested JSON, optionally a page at a time
 
     Parameters
     ----------
-    None
+    assembly_name : str
+        Name of assembly to get all leaves from
+    request : Request
+        Incoming request, checked for If-None-Match
+    response : Response
+        Outgoing response, given the assembly's version as its ETag
+    limit : int, optional
+        Maximum number of items per page
+    after : str, optional
+        Cursor to start after, the next value of the previous page
 
     Returns
     -------
@@ -674,26 +2885,42 @@ async def get_subassembly():
         HTTP response object:
             status : str
                 Status of request
-            data : JSON
-                JSON representation of a list of subassemblies
+            data : list
+                Leaves in pre-order
+            next : str, optional
+                Cursor of the next page, or None on the last page
     """
 
     try:
-        result = []
-        # Getting all assemblies with parents
-        for item in gAssemblies.values():
-            if item.parent:
-                result.append(exporter.export(item))
-        return {"status": "Success", "data": json.dumps(result)}
+        store = current_store()
+        # Checking if specified assembly exists
+        if not store.has_assembly(assembly_name):
+            raise HTTPException(status_code=403, detail="Assembly name not created")
+        # Checking if the cursor is a descendant of the assembly
+        if after is not None and not await offload(is_descendant, assembly_name, after):
+            raise HTTPException(status_code=403, detail="Invalid cursor")
+
+        iterate = subtree_listing(store.iter_leaves, assembly_name)
+
+        def build():
+            items, cursor = read_page(iterate, limit, after)
+            return native_response(native_list(items), next=cursor)
+
+        return await conditional_get(
+            request, response, assembly_name, build, (limit, after)
+        )
     except Exception as ex:
         logging.exception(ex)
+        if isinstance(ex, HTTPException):
+            raise ex
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/component", status_code=200)
-async def get_component_part():
+@v2.get("/top_assembly", status_code=200)
+@read_only
+async def top_assembly_v2():
     """
-    GET endpoint that returns component parts
+    GET endpoint that returns all top level assemblies as nested JSON
 
     Parameters
     ----------
@@ -705,26 +2932,24 @@ async def get_component_part():
         HTTP response object:
             status : str
                 Status of request
-            data : JSON
-                JSON representation of a list of component parts
+            data : list
+                Top-level assemblies with their subtrees
     """
 
     try:
-        result = []
-        # Getting all parts with parents
-        for item in gParts.values():
-            if item.parent:
-                result.append(exporter.export(item))
-        return {"status": "Success", "data": json.dumps(result)}
+        return native_response(
+            native_list(await offload(current_store().export_top_assemblies))
+        )
     except Exception as ex:
         logging.exception(ex)
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/orphan", status_code=200)
-async def get_orphan_part():
+@v2.get("/subassembly", status_code=200)
+@read_only
+async def get_subassembly_v2():
     """
-    GET endpoint that returns parts that have no parents or children
+    GET endpoint that returns all subassemblies as nested JSON
 
     Parameters
     ----------
@@ -736,31 +2961,28 @@ async def get_orphan_part():
         HTTP response object:
             status : str
                 Status of request
-            data : JSON
-                JSON representation of list of orphan parts
+            data : list
+                Subassemblies with their subtrees
     """
 
     try:
-        result = []
-        # Getting all parts that don't have any parents or children
-        for item in gParts.values():
-            if not item.parent and not item.children:
-                result.append(exporter.export(item))
-        return {"status": "Success", "data": json.dumps(result)}
+        return native_response(
+            native_list(await offload(current_store().export_subassemblies))
+        )
     except Exception as ex:
         logging.exception(ex)
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.get("/project/{project_name}", status_code=200)
-async def get_project(project_name: str):
+@v2.get("/component", status_code=200)
+@read_only
+async def get_component_part_v2():
     """
-    GET endpoint that copies saved assembly projects
+    GET endpoint that returns all parts included in assemblies as nested JSON
 
     Parameters
     ----------
-    project_name : str
-        Name of project to copy
+    None
 
     Returns
     -------
@@ -768,38 +2990,28 @@ async def get_project(project_name: str):
         HTTP response object:
             status : str
                 Status of request
-            message : str
-                Response message
+            data : list
+                Component parts
     """
 
     try:
-        if project_name not in gProjects:
-            raise HTTPException(status_code=404, detail="Project name does not exist")
-
-        global gParts, gAssemblies
-
-        # Getting a copy of saved assembly projects
-        gParts, gAssemblies = (
-            copy.deepcopy(gProjects[project_name]["gParts"]),
-            copy.deepcopy(gProjects[project_name]["gAssemblies"]),
+        return native_response(
+            native_list(await offload(current_store().export_components))
         )
-        return {"status": "Success", "message": "Project copied"}
     except Exception as ex:
         logging.exception(ex)
-        if isinstance(ex, HTTPException):
-            raise ex
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
-@app.post("/project/{project_name}", status_code=201)
-async def post_project(project_name: str):
+@v2.get("/orphan", status_code=200)
+@read_only
+async def get_orphan_part_v2():
     """
-    POST endpoint that saves an assembly project and clears current project
+    GET endpoint that returns all parts without parents or children as nested JSON
 
     Parameters
     ----------
-    project_name : str
-        Name of project to save
+    None
 
     Returns
     -------
@@ -807,24 +3019,60 @@ async def post_project(project_name: str):
         HTTP response object:
             status : str
                 Status of request
-            message : str
-                Response message
+            data : list
+                Orphan parts
     """
 
     try:
-        global gParts, gAssemblies
-
-        # Saving assembly project
-        gProjects[project_name] = {
-            "gParts": gParts,
-            "gAssemblies": gAssemblies,
-        }
-        gParts, gAssemblies = {}, {}
-        return {"status": "Success", "message": "Project saved"}
+        return native_response(
+            native_list(await offload(current_store().export_orphans))
+        )
     except Exception as ex:
         logging.exception(ex)
         raise HTTPException(status_code=500, detail=str(ex)) from ex
 
 
+app.include_router(v2)
+
+
+# Every part and assembly route, in both versions, again under
+# /project/{project_name}, working directly on that live project's store
+scoped = APIRouter(
+    prefix="/project/{project_name}",
+    dependencies=[Depends(select_project)],
+    route_class=MeteredRoute,
+)
+for route in list(app.routes):
+    if isinstance(route, APIRoute) and route.path.startswith(
+        (
+            "/part",
+            "/assembly",
+            "/top_assembly",
+            "/subassembly",
+            "/component",
+            "/orphan",
+            "/v2/",
+        )
+    ):
+        scoped.add_api_route(
+            route.path,
+            route.endpoint,
+            methods=route.methods,
+            status_code=route.status_code,
+            name=f"{route.name}_scoped",
+        )
+app.include_router(scoped)
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0")
+    # Number of worker processes serving the API, set with BOM_WORKERS. Each worker
+    # has its own store, so several workers only serve the same data from the SQLite
+    # backend, sharing its database file
+    workers = int(os.environ.get("BOM_WORKERS", "1"))
+    if workers > 1 and gStore.name != "sqlite":
+        raise SystemExit("BOM_WORKERS above 1 needs BOM_STORE=sqlite")
+    if workers > 1:
+        # Workers import the app themselves, so it is passed by name
+        uvicorn.run("app:app", host="0.0.0.0", workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0")
@@ -0,0 +1,355 @@
+"""
+Benchmark timing every API route on large synthetic Bills of Materials, with the peak
+memory each one allocates, to compare between releases
+
+Memory is measured with tracemalloc, so it covers Python allocations and leaves out
+SQLite's own page cache.
+
+Usage, from the web directory:
+    python -m benchmarks.endpoint_benchmark --depth 4 --fanout 10 --variants 10
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from fastapi.testclient import TestClient
+import app as bom_app
+from storage import STORES, create_store
+from benchmarks.synthetic_bom import (
+    count_nodes,
+    deepest_part,
+    generate_bom,
+    generate_sized_bom,
+)
+
+
+def round_requests(bom: dict, fanout: int, index: int) -> list:
+    """
+    Function to list one round of requests covering every route, ordered so each round
+    leaves the tree as it found it, apart from the parts, assemblies and projects it
+    adds under names of its own
+
+    Parameters
+    ----------
+    bom : dict
+        Nested assembly tree the store holds
+    fanout : int
+        Number of parts in each created assembly
+    index : int
+        Number of round, making the names it creates unique
+
+    Returns
+    -------
+    list
+        Route, method, path and JSON body of every request
+    """
+
+    top = bom["id"]
+    subassembly = bom["children"][0]["id"]
+    part = deepest_part(bom)
+    parent = part.rsplit(".", 1)[0]
+    part_names = [f"batch-{index}-{number}" for number in range(fanout)]
+    listings = ["/part", "/assembly", "/top_assembly", "/subassembly", "/component"]
+    reads = [
+        ("/part/{part_name}", f"/part/{part}"),
+        ("/part/{part_name}/parents", f"/part/{part}/parents"),
+        ("/assembly/{assembly_name}", f"/assembly/{top}"),
+        ("/assembly/{assembly_name}/first", f"/assembly/{subassembly}/first"),
+        ("/assembly/{assembly_name}/children", f"/assembly/{subassembly}/children"),
+        ("/assembly/{assembly_name}/leaves", f"/assembly/{subassembly}/leaves"),
+        *((path, path) for path in [*listings, "/orphan"]),
+    ]
+    requests = [
+        ("GET /", "GET", "/", None),
+        ("GET /health", "GET", "/health", None),
+        ("GET /journal", "GET", "/journal", None),
+        *((f"GET {route}", "GET", path, None) for route, path in reads),
+        *((f"GET /v2{route}", "GET", f"/v2{path}", None) for route, path in reads),
+        ("GET /part/{part_name}/where_used", "GET", f"/part/{part}/where_used", None),
+        ("POST /part/where_used", "POST", "/part/where_used", {"part_names": [part]}),
+        (
+            "GET /assembly/{assembly_name}/contains/{name}",
+            "GET",
+            f"/assembly/{top}/contains/{part}",
+            None,
+        ),
+        (
+            "GET /assembly/{assembly_name}/explode",
+            "GET",
+            f"/assembly/{top}/explode",
+            None,
+        ),
+        ("POST /part", "POST", "/part", {"part_name": f"new-{index}"}),
+        ("DELETE /part/{part_name}", "DELETE", f"/part/new-{index}", None),
+        ("POST /part/batch", "POST", "/part/batch", {"part_names": part_names}),
+        (
+            "POST /assembly",
+            "POST",
+            "/assembly",
+            {"assembly_name": f"assembly-{index}", "part_names": part_names},
+        ),
+        (
+            "POST /assembly/import",
+            "POST",
+            "/assembly/import",
+            {"assembly": generate_bom(f"import-{index}", 2, fanout)},
+        ),
+        (
+            "PUT /assembly/{assembly_name}/child/{part_name}",
+            "PUT",
+            f"/assembly/{parent}/child/{part}",
+            None,
+        ),
+        (
+            "POST /assembly/{assembly_name}/child/{part_name}",
+            "POST",
+            f"/assembly/{parent}/child/{part}",
+            None,
+        ),
+        (
+            "POST /assembly/{assembly_name}/shared/{subassembly_name}",
+            "POST",
+            f"/assembly/assembly-{index}/shared/import-{index}",
+            None,
+        ),
+        (
+            "PUT /assembly/{assembly_name}/shared/{subassembly_name}",
+            "PUT",
+            f"/assembly/assembly-{index}/shared/import-{index}",
+            None,
+        ),
+        (
+            "POST /project/{project_name}/part",
+            "POST",
+            "/project/bench-live/part",
+            {"part_name": f"live-{index}"},
+        ),
+        ("GET /project/{project_name}/part", "GET", "/project/bench-live/part", None),
+        ("POST /project/{project_name}", "POST", f"/project/round-{index}", None),
+        ("GET /project/{project_name}", "GET", f"/project/round-{index}", None),
+    ]
+    return requests
+
+
+def time_request(client: TestClient, method: str, path: str, body) -> tuple:
+    """
+    Function to time a single request
+
+    Parameters
+    ----------
+    client : TestClient
+        Client of the app
+    method : str
+        HTTP method
+    path : str
+        Endpoint path
+    body : Any
+        JSON body, or None
+
+    Returns
+    -------
+    tuple
+        Elapsed seconds and status code
+    """
+
+    start = time.perf_counter()
+    response = client.request(method, path, json=body)
+    return time.perf_counter() - start, response.status_code
+
+
+def trace_request(client: TestClient, method: str, path: str, body) -> int:
+    """
+    Function to measure the peak Python memory a single request allocates, while
+    tracemalloc is tracing
+
+    Parameters
+    ----------
+    client : TestClient
+        Client of the app
+    method : str
+        HTTP method
+    path : str
+        Endpoint path
+    body : Any
+        JSON body, or None
+
+    Returns
+    -------
+    int
+        Bytes allocated at the peak of the request over those held before it
+    """
+
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    client.request(method, path, json=body)
+    return tracemalloc.get_traced_memory()[1] - before
+
+
+def benchmark_variants(client: TestClient, bom: dict, variants: int) -> dict:
+    """
+    Function to time saving, loading and diffing variants of a base project, each
+    attaching a part of its own to the deepest assembly
+
+    Parameters
+    ----------
+    client : TestClient
+        Client of the app
+    bom : dict
+        Nested assembly tree the store holds
+    variants : int
+        Number of variants to save
+
+    Returns
+    -------
+    dict
+        Median milliseconds keyed by operation, and Python memory held per variant
+    """
+
+    parent = deepest_part(bom).rsplit(".", 1)[0]
+    timings = {"save_variant": [], "load_variant": [], "diff_variant": []}
+    part_names = [f"variant-{number}" for number in range(2 * variants)]
+    client.post("/part/batch", json={"part_names": part_names})
+    client.post("/project/base")
+    for number in range(variants):
+        client.get("/project/base")
+        client.post(f"/assembly/{parent}/child/variant-{number}")
+        path = f"/project/variant-{number}?variant=true"
+        timings["save_variant"].append(time_request(client, "POST", path, None)[0])
+    for number in range(variants):
+        path = f"/project/variant-{number}"
+        timings["load_variant"].append(time_request(client, "GET", path, None)[0])
+        path = f"/project/base/diff/variant-{number}"
+        timings["diff_variant"].append(time_request(client, "GET", path, None)[0])
+
+    # As many variants again, saved while tracemalloc traces what they hold
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for number in range(variants, 2 * variants):
+        client.get("/project/base")
+        client.post(f"/assembly/{parent}/child/variant-{number}")
+        client.post(f"/project/variant-{number}?variant=true")
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    client.get("/project/base")
+    results = {
+        operation: statistics.median(seconds) * 1000
+        for operation, seconds in timings.items()
+        if seconds
+    }
+    results["bytes_per_variant"] = held / variants if variants else 0
+    return results
+
+
+def benchmark_endpoints(backend: str, bom: dict, args: argparse.Namespace) -> dict:
+    """
+    Function to time every route on one backend, then measure the peak memory of each
+    in one more round with tracemalloc tracing
+
+    Parameters
+    ----------
+    backend : str
+        Name of storage backend
+    bom : dict
+        Nested assembly tree to import
+    args : argparse.Namespace
+        Benchmark options
+
+    Returns
+    -------
+    dict
+        Python memory held by the imported tree, status, median and slowest
+        milliseconds and peak bytes keyed by route, and variant timings
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        options = {"path": os.path.join(directory, "bom.sqlite3")}
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        store = create_store(backend, **(options if backend == "sqlite" else {}))
+        store.import_assembly(bom)
+        held = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        bom_app.gStore, bom_app.gProjects = store, {}
+        client = TestClient(bom_app.app)
+
+        routes = {}
+        for index in range(args.repeat):
+            for route, method, path, body in round_requests(bom, args.fanout, index):
+                seconds, status = time_request(client, method, path, body)
+                timing = routes.setdefault(route, {"seconds": []})
+                timing["status"] = status
+                timing["seconds"].append(seconds)
+        tracemalloc.start()
+        for route, method, path, body in round_requests(bom, args.fanout, args.repeat):
+            routes[route]["peak_bytes"] = trace_request(client, method, path, body)
+        tracemalloc.stop()
+        for timing in routes.values():
+            seconds = timing.pop("seconds")
+            timing["median_ms"] = statistics.median(seconds) * 1000
+            timing["max_ms"] = max(seconds) * 1000
+
+        variants = benchmark_variants(client, bom, args.variants)
+        if backend == "sqlite":
+            store.connection.close()
+    return {"store_bytes": held, "routes": routes, "variants": variants}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depth", type=int, default=4, help="assembly levels")
+    parser.add_argument("--fanout", type=int, default=10, help="children per assembly")
+    parser.add_argument(
+        "--nodes", type=int, help="node count, filling levels instead of --depth"
+    )
+    parser.add_argument("--variants", type=int, default=10, help="variants to save")
+    parser.add_argument("--repeat", type=int, default=5, help="requests per route")
+    parser.add_argument(
+        "--backends", nargs="+", default=list(STORES), choices=list(STORES)
+    )
+    parser.add_argument("--json", help="file to write results to as JSON")
+    args = parser.parse_args()
+
+    if args.nodes:
+        bom = generate_sized_bom("bench", args.nodes, args.fanout)
+    else:
+        bom = generate_bom("bench", args.depth, args.fanout)
+    results = {
+        "nodes": count_nodes(bom),
+        "fanout": args.fanout,
+        "variants": args.variants,
+        "repeat": args.repeat,
+        "backends": {},
+    }
+    for backend in args.backends:
+        results["backends"][backend] = benchmark_endpoints(backend, bom, args)
+
+    backends = results["backends"]
+    print(f"{results['nodes']} nodes (fanout {args.fanout}), median of {args.repeat}\n")
+    print(f"{'route':<60}" + "".join(f"{b:>12}" for b in backends))
+    print(
+        f"{'memory held by the tree':<60}"
+        + "".join(f"{r['store_bytes'] / 2 ** 20:>10.1f}MB" for r in backends.values())
+    )
+    for route in next(iter(backends.values()))["routes"]:
+        print(
+            f"{route:<60}"
+            + "".join(
+                f"{r['routes'][route]['median_ms']:>10.1f}ms" for r in backends.values()
+            )
+        )
+    for operation in next(iter(backends.values()))["variants"]:
+        print(
+            f"{operation:<60}"
+            + "".join(f"{r['variants'][operation]:>12.1f}" for r in backends.values())
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
@@ -0,0 +1,119 @@
+"""
+Benchmark comparing the memory use and latency of the in-memory tree engines
+
+Usage, from the web directory:
+    python -m benchmarks.engine_benchmark --depth 6 --fanout 10
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from storage import create_store
+from benchmarks.synthetic_bom import count_nodes, deepest_part, generate_bom
+from benchmarks.store_benchmark import time_call
+
+
+# In-memory backends to compare, AnyTree nodes against compact arrays
+ENGINES = ["memory", "compact"]
+
+
+def measure_engine(backend: str, bom: dict) -> dict:
+    """
+    Function to measure the memory held by a backend after importing a tree, and the
+    latency of the operations behind the traversal endpoints
+
+    The tree is imported twice, once with tracemalloc tracing allocations and once
+    without, so tracing doesn't slow down the timed import.
+
+    Parameters
+    ----------
+    backend : str
+        Name of storage backend
+    bom : dict
+        Nested assembly tree to import
+
+    Returns
+    -------
+    dict
+        Bytes held and bytes per node, and elapsed seconds keyed by operation
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = create_store(backend)
+    store.import_assembly(bom)
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del store
+    gc.collect()
+
+    store = create_store(backend)
+    assembly_name = bom["id"]
+    subassembly_name = bom["children"][0]["id"]
+    part_name = deepest_part(bom)
+    parent_name = part_name.rsplit(".", 1)[0]
+    timings = {
+        "import": time_call(store.import_assembly, bom),
+        "export_assembly": time_call(store.export_assembly, assembly_name),
+        "export_assembly_again": time_call(store.export_assembly, assembly_name),
+        "descendants": time_call(store.export_descendants, subassembly_name),
+        "descendants_again": time_call(store.export_descendants, subassembly_name),
+        "leaves": time_call(store.export_leaves, subassembly_name),
+        "part_ancestors": time_call(store.export_part_ancestors, part_name),
+        "where_used": time_call(store.part_where_used, part_name),
+        "where_used_again": time_call(store.part_where_used, part_name),
+        "contains": time_call(
+            store.assembly_contains, assembly_name, "part", part_name
+        ),
+        "explode": time_call(store.explode_assembly, assembly_name),
+        "explode_again": time_call(store.explode_assembly, assembly_name),
+        "detach_part": time_call(store.detach_part, part_name),
+        "attach_part": time_call(store.attach_part, parent_name, part_name),
+        "explode_after_attach": time_call(store.explode_assembly, assembly_name),
+        "save_project": time_call(store.save_project, "benchmark"),
+        "load_project": time_call(store.load_project, "benchmark"),
+    }
+    return {
+        "bytes": held,
+        "bytes_per_node": held / count_nodes(bom),
+        "seconds": timings,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depth", type=int, default=6, help="assembly levels")
+    parser.add_argument("--fanout", type=int, default=10, help="children per assembly")
+    parser.add_argument("--engines", nargs="+", default=ENGINES, choices=ENGINES)
+    parser.add_argument("--json", help="file to write results to as JSON")
+    args = parser.parse_args()
+
+    bom = generate_bom("bench", args.depth, args.fanout)
+    results = {"nodes": count_nodes(bom), "engines": {}}
+    for engine in args.engines:
+        results["engines"][engine] = measure_engine(engine, bom)
+
+    engines = results["engines"]
+    print(f"{results['nodes']} nodes (depth {args.depth}, fanout {args.fanout})\n")
+    print(f"{'':<24}" + "".join(f"{engine:>12}" for engine in engines))
+    print(
+        f"{'memory':<24}"
+        + "".join(f"{r['bytes'] / 2 ** 20:>10.1f}MB" for r in engines.values())
+    )
+    print(
+        f"{'bytes per node':<24}"
+        + "".join(f"{r['bytes_per_node']:>12.0f}" for r in engines.values())
+    )
+    for operation in next(iter(engines.values()))["seconds"]:
+        print(
+            f"{operation:<24}"
+            + "".join(
+                f"{r['seconds'][operation] * 1000:>10.1f}ms" for r in engines.values()
+            )
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
@@ -0,0 +1,486 @@
+"""
+Load test replaying a mix of reads, writes and pen_builder-style variant workflows
+against the API at a target rate, reporting throughput, error rate and latency
+percentiles per endpoint
+
+Reads and writes go to a live project holding a synthetic BOM, and variant workflows
+load, change and save variants of the same BOM saved as the working project's base.
+Requests start on a fixed schedule whether or not earlier ones have finished, and
+each one's latency counts from when it was due, so a slow server shows up as latency
+instead of as a lower request rate.
+
+Usage, from the web directory:
+    python -m benchmarks.load_test --rate 100 --mix read=70 write=20 variant=10
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import httpx
+from fastapi import HTTPException
+from utilities import request_handler
+from storage import STORES
+from benchmarks.synthetic_bom import count_nodes, deepest_part, generate_bom
+from benchmarks.worker_benchmark import start_server
+
+
+# Workflows a load test mixes, each a sequence of requests
+WORKFLOWS = ("read", "write", "variant")
+# Live project reads and writes are sent to
+LIVE_PROJECT = "load"
+# Saved project variant workflows start from
+BASE_PROJECT = "base"
+# Latency percentiles reported per endpoint
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(items: list) -> dict:
+    """
+    Function to parse a workflow mix given as name=weight items
+
+    Parameters
+    ----------
+    items : list
+        Items such as read=70
+
+    Returns
+    -------
+    dict
+        Weight of every workflow by name
+    """
+
+    mix = dict.fromkeys(WORKFLOWS, 0.0)
+    for item in items:
+        name, _, weight = item.partition("=")
+        if name not in mix:
+            raise argparse.ArgumentTypeError(f"Unknown workflow {name}")
+        mix[name] = float(weight)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("Mix has no workflow")
+    return mix
+
+
+def bom_names(bom: dict) -> tuple:
+    """
+    Function to list the assemblies and parts of a nested assembly tree
+
+    Parameters
+    ----------
+    bom : dict
+        Nested assembly tree
+
+    Returns
+    -------
+    tuple
+        Names of assemblies, and names of parts
+    """
+
+    assemblies, parts = [], []
+    stack = [bom]
+    while stack:
+        node = stack.pop()
+        (assemblies if node.get("children") else parts).append(node["id"])
+        stack.extend(node.get("children", []))
+    return assemblies, parts
+
+
+def percentile(latencies: list, rank: float) -> float:
+    """
+    Function to get a nearest-rank percentile
+
+    Parameters
+    ----------
+    latencies : list
+        Sorted latencies
+    rank : float
+        Percentile, from 0 to 100
+
+    Returns
+    -------
+    float
+        Latency at the percentile
+    """
+
+    return latencies[max(math.ceil(rank / 100 * len(latencies)) - 1, 0)]
+
+
+class LoadTest:
+    """
+    Sends workflows of requests through request_handler.AsyncClient and records every
+    request's latency and outcome by endpoint
+    """
+
+    def __init__(self, client: request_handler.AsyncClient, bom: dict, seed: int):
+        # Client with a connection per request in flight
+        self.client = client
+        # Assemblies and parts of the BOM reads pick from
+        self.assemblies, self.parts = bom_names(bom)
+        # Assemblies variant workflows attach to, as pen_builder attaches barrels to
+        # its pen and inks to the ink cartridge inside it
+        self.pen = bom["children"][0]["id"]
+        self.cartridge = deepest_part(bom).rsplit(".", 1)[0]
+        self.random = random.Random(seed)
+        # Unique suffix of every part, assembly and variant the load test creates
+        self.counter = itertools.count()
+        # Variant workflows load and save the working project, so run one at a time
+        self.variant_lock = asyncio.Lock()
+        # Latencies and failures by endpoint
+        self.latencies, self.errors = {}, {}
+
+    async def send(
+        self, endpoint: str, method: str, path: str, data: dict | None, due: float
+    ) -> float:
+        """
+        Sends a request and records its outcome under an endpoint
+
+        Parameters
+        ----------
+        endpoint : str
+            Route the request is recorded under
+        method : str
+            HTTP method
+        path : str
+            Endpoint path
+        data : dict, optional
+            Data to send as JSON
+        due : float
+            perf_counter time the request was due to be sent
+
+        Returns
+        -------
+        float
+            perf_counter time the response came back, when the next request of the
+            workflow is due
+        """
+
+        status = None
+        try:
+            await self.client.request(method, path, data)
+        except HTTPException as ex:
+            status = ex.status_code
+        except httpx.HTTPError as ex:
+            status = type(ex).__name__
+        done = time.perf_counter()
+        self.latencies.setdefault(endpoint, []).append(done - due)
+        if status is not None:
+            errors = self.errors.setdefault(endpoint, {})
+            errors[status] = errors.get(status, 0) + 1
+        return done
+
+    async def read(self, due: float):
+        """
+        Reads a random assembly or part of the live project
+
+        Parameters
+        ----------
+        due : float
+            perf_counter time the workflow is due to start
+
+        Returns
+        -------
+        None
+        """
+
+        prefix, scope = f"/project/{LIVE_PROJECT}", "/project/{project_name}"
+        assembly = self.random.choice(self.assemblies)
+        part = self.random.choice(self.parts)
+        endpoint, path = self.random.choice(
+            [
+                ("/assembly/{assembly_name}", f"/assembly/{assembly}"),
+                ("/v2/assembly/{assembly_name}", f"/v2/assembly/{assembly}"),
+                (
+                    "/assembly/{assembly_name}/children",
+                    f"/assembly/{assembly}/children",
+                ),
+                ("/assembly/{assembly_name}/leaves", f"/assembly/{assembly}/leaves"),
+                ("/assembly/{assembly_name}/explode", f"/assembly/{assembly}/explode"),
+                ("/part/{part_name}/parents", f"/part/{part}/parents"),
+                ("/part/{part_name}/where_used", f"/part/{part}/where_used"),
+                ("/part", "/part?limit=100"),
+            ]
+        )
+        await self.send(f"GET {scope}{endpoint}", "GET", prefix + path, None, due)
+
+    async def write(self, due: float):
+        """
+        Adds a part to a random assembly of the live project, or imports a small
+        assembly into it
+
+        Parameters
+        ----------
+        due : float
+            perf_counter time the workflow is due to start
+
+        Returns
+        -------
+        None
+        """
+
+        prefix, scope = f"/project/{LIVE_PROJECT}", "/project/{project_name}"
+        number = next(self.counter)
+        if self.random.random() < 0.5:
+            assembly = {"id": f"import-{number}", "children": [{"id": f"{number}.0"}]}
+            endpoint = f"POST {scope}/assembly/import"
+            path = f"{prefix}/assembly/import"
+            await self.send(endpoint, "POST", path, {"assembly": assembly}, due)
+            return
+        part = f"part-{number}"
+        data = {"part_name": part}
+        due = await self.send(f"POST {scope}/part", "POST", f"{prefix}/part", data, due)
+        assembly = self.random.choice(self.assemblies)
+        await self.send(
+            f"POST {scope}/assembly/{{assembly_name}}/child/{{part_name}}",
+            "POST",
+            f"{prefix}/assembly/{assembly}/child/{part}",
+            None,
+            due,
+        )
+
+    async def variant(self, due: float):
+        """
+        Builds and saves a variant of the base project, as pen_builder does for every
+        barrel and ink color, then loads the base project back
+
+        Parameters
+        ----------
+        due : float
+            perf_counter time the workflow is due to start
+
+        Returns
+        -------
+        None
+        """
+
+        number = next(self.counter)
+        barrel, ink = f"barrel-{number}", f"ink-{number}"
+        async with self.variant_lock:
+            due = await self.send(
+                "POST /part/batch",
+                "POST",
+                "/part/batch",
+                {"part_names": [barrel, ink]},
+                due,
+            )
+            for part, assembly in ((barrel, self.pen), (ink, self.cartridge)):
+                due = await self.send(
+                    "POST /assembly/{assembly_name}/child/{part_name}",
+                    "POST",
+                    f"/assembly/{assembly}/child/{part}",
+                    None,
+                    due,
+                )
+            due = await self.send(
+                "GET /assembly/{assembly_name}",
+                "GET",
+                f"/assembly/{self.pen}",
+                None,
+                due,
+            )
+            due = await self.send(
+                "POST /project/{project_name}?variant=true",
+                "POST",
+                f"/project/variant-{number}?variant=true",
+                None,
+                due,
+            )
+            await self.send(
+                "GET /project/{project_name}",
+                "GET",
+                f"/project/{BASE_PROJECT}",
+                None,
+                due,
+            )
+
+    async def run(self, mix: dict, rate: float, seconds: float, concurrency: int):
+        """
+        Starts workflows picked from a mix at a target rate, with at most concurrency
+        of them in flight, and waits for all of them to finish
+
+        Parameters
+        ----------
+        mix : dict
+            Weight of every workflow by name
+        rate : float
+            Workflows started per second
+        seconds : float
+            How long to start workflows for
+        concurrency : int
+            Most workflows in flight at once
+
+        Returns
+        -------
+        float
+            Seconds from the first workflow starting to the last one finishing
+        """
+
+        slots = asyncio.Semaphore(concurrency)
+
+        async def start(workflow, due):
+            async with slots:
+                await getattr(self, workflow)(due)
+
+        names, weights = list(mix), list(mix.values())
+        tasks = []
+        begin = time.perf_counter()
+        for index in range(int(rate * seconds)):
+            due = begin + index / rate
+            await asyncio.sleep(max(due - time.perf_counter(), 0))
+            workflow = self.random.choices(names, weights)[0]
+            tasks.append(asyncio.ensure_future(start(workflow, due)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - begin
+
+    def report(self, elapsed: float) -> dict:
+        """
+        Summarizes the recorded requests by endpoint
+
+        Parameters
+        ----------
+        elapsed : float
+            Seconds the load test ran for
+
+        Returns
+        -------
+        dict
+            Requests, requests per second, errors by status, error rate and latency
+            percentiles in milliseconds, keyed by endpoint
+        """
+
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            errors = self.errors.get(endpoint, {})
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "requests_per_second": len(latencies) / elapsed,
+                "errors": {str(status): count for status, count in errors.items()},
+                "error_rate": sum(errors.values()) / len(latencies),
+                **{
+                    f"p{rank}_ms": percentile(latencies, rank) * 1000
+                    for rank in PERCENTILES
+                },
+            }
+        return endpoints
+
+
+async def load_test(url: str, bom: dict, args: argparse.Namespace) -> dict:
+    """
+    Function to seed the API with a BOM and run a load test against it
+
+    Parameters
+    ----------
+    url : str
+        Base URL of the API
+    bom : dict
+        Nested assembly tree to seed the live project and base project with
+    args : argparse.Namespace
+        Load test options
+
+    Returns
+    -------
+    dict
+        Totals of the whole load test, and the report of every endpoint
+    """
+
+    async with request_handler.AsyncClient(
+        base_url=url, timeout=args.timeout, concurrency=args.concurrency
+    ) as client:
+        await client.request(
+            "POST", f"/project/{LIVE_PROJECT}/assembly/import", {"assembly": bom}
+        )
+        await client.request("POST", "/assembly/import", {"assembly": bom})
+        await client.request("POST", f"/project/{BASE_PROJECT}")
+        await client.request("GET", f"/project/{BASE_PROJECT}")
+
+        test = LoadTest(client, bom, args.seed)
+        elapsed = await test.run(args.mix, args.rate, args.seconds, args.concurrency)
+    endpoints = test.report(elapsed)
+    requests = sum(report["requests"] for report in endpoints.values())
+    errors = sum(
+        report["error_rate"] * report["requests"] for report in endpoints.values()
+    )
+    return {
+        "seconds": elapsed,
+        "requests": requests,
+        "requests_per_second": requests / elapsed,
+        "error_rate": errors / requests if requests else 0,
+        "endpoints": endpoints,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depth", type=int, default=4, help="assembly levels")
+    parser.add_argument("--fanout", type=int, default=10, help="children per assembly")
+    parser.add_argument(
+        "--mix",
+        nargs="+",
+        default=["read=70", "write=20", "variant=10"],
+        help="workflow weights as name=weight, of read, write and variant",
+    )
+    parser.add_argument("--rate", type=float, default=100, help="workflows per second")
+    parser.add_argument("--seconds", type=float, default=10, help="how long to run")
+    parser.add_argument(
+        "--concurrency", type=int, default=64, help="most workflows in flight"
+    )
+    parser.add_argument("--timeout", type=float, default=60, help="request timeout")
+    parser.add_argument("--backend", default="memory", choices=list(STORES))
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes")
+    parser.add_argument("--port", type=int, default=8124, help="port to serve on")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the workflow mix")
+    parser.add_argument("--json", help="file to write results to as JSON")
+    args = parser.parse_args()
+    try:
+        args.mix = parse_mix(args.mix)
+    except argparse.ArgumentTypeError as ex:
+        parser.error(str(ex))
+    if args.workers > 1 and args.backend != "sqlite":
+        parser.error("--workers above 1 needs --backend sqlite")
+
+    bom = generate_bom("load", args.depth, args.fanout)
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            "BOM_STORE": args.backend,
+            "BOM_SQLITE_PATH": os.path.join(directory, "bom.sqlite3"),
+        }
+        server = start_server(args.workers, args.port, env)
+        try:
+            url = f"http://127.0.0.1:{args.port}"
+            results = asyncio.run(load_test(url, bom, args))
+        finally:
+            server.terminate()
+            server.wait()
+    results = {
+        "nodes": count_nodes(bom),
+        "backend": args.backend,
+        "workers": args.workers,
+        "target_rate": args.rate,
+        "mix": args.mix,
+        **results,
+    }
+
+    print(
+        f"{results['nodes']} nodes on {args.backend} with {args.workers} workers: "
+        f"{results['requests']} requests in {results['seconds']:.1f}s, "
+        f"{results['requests_per_second']:.1f} req/s, "
+        f"{results['error_rate']:.2%} errors\n"
+    )
+    print(
+        f"{'endpoint':<72}{'requests':>10}{'req/s':>9}{'errors':>8}"
+        + "".join(f"{f'p{rank}':>10}" for rank in PERCENTILES)
+    )
+    for endpoint, report in results["endpoints"].items():
+        print(
+            f"{endpoint:<72}{report['requests']:>10}"
+            f"{report['requests_per_second']:>9.1f}{report['error_rate']:>8.1%}"
+            + "".join(f"{report[f'p{rank}_ms']:>8.1f}ms" for rank in PERCENTILES)
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
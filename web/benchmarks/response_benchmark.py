@@ -0,0 +1,136 @@
+"""
+Benchmark comparing the throughput of the original and /v2 read endpoints on large
+synthetic Bills of Materials
+
+Usage, from the web directory:
+    python -m benchmarks.response_benchmark --depth 5 --fanout 10
+"""
+
+import argparse
+import json
+import time
+from fastapi.testclient import TestClient
+import app as bom_app
+from storage import STORES, create_store
+from benchmarks.synthetic_bom import count_nodes, generate_bom
+
+
+def decode_v1(response, is_list: bool):
+    """
+    Function to decode an original endpoint's response the way clients have to, the
+    response, then its data, then every item
+
+    Parameters
+    ----------
+    response : Response
+        HTTP response object
+    is_list : bool
+        Whether the data is a list of items
+
+    Returns
+    -------
+    Any
+        Decoded data
+    """
+
+    data = json.loads(response.json()["data"])
+    return [json.loads(item) for item in data] if is_list else data
+
+
+def decode_v2(response, is_list: bool):
+    """
+    Function to decode a /v2 endpoint's response in a single pass
+
+    Parameters
+    ----------
+    response : Response
+        HTTP response object
+    is_list : bool
+        Unused, the data is already nested JSON
+
+    Returns
+    -------
+    Any
+        Decoded data
+    """
+
+    return response.json()["data"]
+
+
+def benchmark_responses(client: TestClient, paths: dict, repeat: int) -> dict:
+    """
+    Function to time requesting and decoding each endpoint in both versions
+
+    Parameters
+    ----------
+    client : TestClient
+        Client of the app
+    paths : dict
+        Whether the data is a list, keyed by endpoint path
+    repeat : int
+        Number of requests per endpoint and version
+
+    Returns
+    -------
+    dict
+        Requests per second, and megabytes per response, keyed by endpoint path then
+        version
+    """
+
+    results = {}
+    for path, is_list in paths.items():
+        results[path] = {}
+        for version, prefix, decode in [
+            ("v1", "", decode_v1),
+            ("v2", "/v2", decode_v2),
+        ]:
+            # Warming the export caches, so both versions serve the same cached JSON
+            response = client.get(prefix + path)
+            decoded = decode(response, is_list)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                assert decode(client.get(prefix + path), is_list) == decoded
+            results[path][version] = {
+                "requests_per_second": repeat / (time.perf_counter() - start),
+                "megabytes": len(response.content) / 2**20,
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depth", type=int, default=5, help="assembly levels")
+    parser.add_argument("--fanout", type=int, default=10, help="children per assembly")
+    parser.add_argument("--backend", default="compact", choices=list(STORES))
+    parser.add_argument("--repeat", type=int, default=5, help="requests per endpoint")
+    parser.add_argument("--json", help="file to write results to as JSON")
+    args = parser.parse_args()
+
+    bom = generate_bom("bench", args.depth, args.fanout)
+    options = {"path": ":memory:"} if args.backend == "sqlite" else {}
+    bom_app.gStore = create_store(args.backend, **options)
+    bom_app.gStore.import_assembly(bom)
+    paths = {
+        f"/assembly/{bom['id']}": False,
+        f"/assembly/{bom['children'][0]['id']}/children": True,
+        "/part": True,
+    }
+    results = {
+        "nodes": count_nodes(bom),
+        "orjson": bom_app.orjson is not None,
+        "endpoints": benchmark_responses(TestClient(bom_app.app), paths, args.repeat),
+    }
+
+    print(f"{results['nodes']} nodes (depth {args.depth}, fanout {args.fanout})\n")
+    print(f"{'endpoint':<32}{'v1 req/s':>12}{'v2 req/s':>12}{'speedup':>10}{'MB':>8}")
+    for path, versions in results["endpoints"].items():
+        v1, v2 = versions["v1"], versions["v2"]
+        print(
+            f"{path:<32}{v1['requests_per_second']:>12.2f}"
+            f"{v2['requests_per_second']:>12.2f}"
+            f"{v2['requests_per_second'] / v1['requests_per_second']:>9.1f}x"
+            f"{v2['megabytes']:>8.1f}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
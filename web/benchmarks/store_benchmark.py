@@ -0,0 +1,112 @@
+"""
+Benchmark comparing the storage backends on large synthetic Bills of Materials
+
+Usage, from the web directory:
+    python -m benchmarks.store_benchmark --depth 5 --fanout 10
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from storage import STORES, create_store
+from benchmarks.synthetic_bom import count_nodes, deepest_part, generate_bom
+
+
+def time_call(function, *args) -> float:
+    """
+    Function to time a single call
+
+    Parameters
+    ----------
+    function : callable
+        Function to call
+    *args
+        Arguments to call it with
+
+    Returns
+    -------
+    float
+        Elapsed seconds
+    """
+
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def benchmark_store(backend: str, bom: dict, directory: str) -> dict:
+    """
+    Function to time the operations behind each API endpoint on one backend
+
+    Parameters
+    ----------
+    backend : str
+        Name of storage backend
+    bom : dict
+        Nested assembly tree to import
+    directory : str
+        Directory for database files
+
+    Returns
+    -------
+    dict
+        Elapsed seconds keyed by operation
+    """
+
+    options = {"path": os.path.join(directory, "bom.sqlite3")}
+    store = create_store(backend, **(options if backend == "sqlite" else {}))
+    assembly_name = bom["id"]
+    subassembly_name = bom["children"][0]["id"]
+    part_name = deepest_part(bom)
+    parent_name = part_name.rsplit(".", 1)[0]
+    timings = {
+        "import": time_call(store.import_assembly, bom),
+        "export_assembly": time_call(store.export_assembly, assembly_name),
+        "export_assembly_again": time_call(store.export_assembly, assembly_name),
+        "first_children": time_call(store.export_first_children, assembly_name),
+        "descendants": time_call(store.export_descendants, subassembly_name),
+        "leaves": time_call(store.export_leaves, subassembly_name),
+        "part_ancestors": time_call(store.export_part_ancestors, part_name),
+        "where_used": time_call(store.part_where_used, part_name),
+        "top_assemblies": time_call(store.export_top_assemblies),
+        "components": time_call(store.export_components),
+        "orphans": time_call(store.export_orphans),
+        "detach_part": time_call(store.detach_part, part_name),
+        "attach_part": time_call(store.attach_part, parent_name, part_name),
+        "save_project": time_call(store.save_project, "benchmark"),
+        "load_project": time_call(store.load_project, "benchmark"),
+    }
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depth", type=int, default=5, help="assembly levels")
+    parser.add_argument("--fanout", type=int, default=10, help="children per assembly")
+    parser.add_argument(
+        "--backends", nargs="+", default=list(STORES), choices=list(STORES)
+    )
+    parser.add_argument("--json", help="file to write results to as JSON")
+    args = parser.parse_args()
+
+    bom = generate_bom("bench", args.depth, args.fanout)
+    results = {"nodes": count_nodes(bom), "backends": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends:
+            results["backends"][backend] = benchmark_store(backend, bom, directory)
+
+    print(f"{results['nodes']} nodes (depth {args.depth}, fanout {args.fanout})\n")
+    print(f"{'operation':<24}" + "".join(f"{b:>12}" for b in results["backends"]))
+    for operation in next(iter(results["backends"].values())):
+        print(
+            f"{operation:<24}"
+            + "".join(
+                f"{timings[operation] * 1000:>10.1f}ms"
+                for timings in results["backends"].values()
+            )
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
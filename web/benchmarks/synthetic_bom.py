@@ -0,0 +1,118 @@
+"""
+Generators for synthetic Bills of Materials used by the benchmarks
+"""
+
+import collections
+
+
+def generate_bom(name: str, depth: int, fanout: int) -> dict:
+    """
+    Function to generate a nested assembly tree in the shape JsonExporter emits
+
+    Every assembly has fanout children, and the tree has depth levels of assemblies
+    above its leaf parts, so it holds fanout ** depth parts.
+
+    Parameters
+    ----------
+    name : str
+        Name of the top-level assembly, used as a prefix for every node name
+    depth : int
+        Number of assembly levels, at least 1
+    fanout : int
+        Number of children of every assembly
+
+    Returns
+    -------
+    dict
+        Nested assembly tree
+    """
+
+    root = {"id": name}
+    stack = [(root, depth)]
+    while stack:
+        node, levels = stack.pop()
+        if not levels:
+            continue
+        node["children"] = [{"id": f"{node['id']}.{i}"} for i in range(fanout)]
+        stack.extend((child, levels - 1) for child in node["children"])
+    return root
+
+
+def generate_sized_bom(name: str, nodes: int, fanout: int) -> dict:
+    """
+    Function to generate a nested assembly tree with a given number of nodes
+
+    Levels are filled breadth-first, every assembly getting up to fanout children, so
+    the tree is as shallow as the node count allows and its depth follows from it.
+
+    Parameters
+    ----------
+    name : str
+        Name of the top-level assembly, used as a prefix for every node name
+    nodes : int
+        Number of parts and assemblies, at least 2
+    fanout : int
+        Most children of any assembly
+
+    Returns
+    -------
+    dict
+        Nested assembly tree
+    """
+
+    root = {"id": name}
+    queue = collections.deque([root])
+    count = 1
+    while count < nodes:
+        node = queue.popleft()
+        node["children"] = [
+            {"id": f"{node['id']}.{i}"} for i in range(min(fanout, nodes - count))
+        ]
+        count += len(node["children"])
+        queue.extend(node["children"])
+    return root
+
+
+def count_nodes(bom: dict) -> int:
+    """
+    Function to count the nodes of a nested assembly tree
+
+    Parameters
+    ----------
+    bom : dict
+        Nested assembly tree
+
+    Returns
+    -------
+    int
+        Number of parts and assemblies
+    """
+
+    count = 0
+    stack = [bom]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.get("children", []))
+    return count
+
+
+def deepest_part(bom: dict) -> str:
+    """
+    Function to get the name of the first part on the deepest level of a tree
+
+    Parameters
+    ----------
+    bom : dict
+        Nested assembly tree
+
+    Returns
+    -------
+    str
+        Name of part
+    """
+
+    node = bom
+    while node.get("children"):
+        node = node["children"][0]
+    return node["id"]
@@ -0,0 +1,243 @@
+"""
+Load test measuring how read throughput scales with the number of API worker
+processes serving one SQLite database
+
+Usage, from the web directory:
+    python -m benchmarks.worker_benchmark --depth 4 --fanout 10 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from storage import create_store
+from benchmarks.synthetic_bom import count_nodes, deepest_part, generate_bom
+
+
+def read_paths(bom: dict) -> list:
+    """
+    Function to list the read endpoints a load test requests, each subassembly's
+    subtree and rollup, and the where-used of the deepest part
+
+    Parameters
+    ----------
+    bom : dict
+        Nested assembly tree the database holds
+
+    Returns
+    -------
+    list
+        Endpoint paths
+    """
+
+    paths = [f"/part/{deepest_part(bom)}/where_used"]
+    for child in bom["children"]:
+        paths.append(f"/v2/assembly/{child['id']}")
+        paths.append(f"/assembly/{child['id']}/explode")
+    return paths
+
+
+async def send_reads(url: str, paths: list, seconds: float, concurrency: int) -> dict:
+    """
+    Function to request endpoints round-robin from concurrent connections until a
+    deadline
+
+    Parameters
+    ----------
+    url : str
+        Base URL of the API
+    paths : list
+        Endpoint paths to request
+    seconds : float
+        How long to send requests for
+    concurrency : int
+        Number of connections sending requests
+
+    Returns
+    -------
+    dict
+        Number of requests answered, and of those that failed
+    """
+
+    counts = {"requests": 0, "errors": 0}
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+
+        async def connection(offset: int):
+            index = offset
+            while time.perf_counter() < deadline:
+                response = await client.get(paths[index % len(paths)])
+                counts["requests"] += 1
+                counts["errors"] += response.status_code != 200
+                index += 1
+
+        await asyncio.gather(*(connection(offset) for offset in range(concurrency)))
+    return counts
+
+
+def run_client(url: str, paths: list, seconds: float, concurrency: int) -> dict:
+    """
+    Function to run a load test client, in a process of its own so the client isn't
+    what limits throughput
+
+    Parameters
+    ----------
+    url : str
+        Base URL of the API
+    paths : list
+        Endpoint paths to request
+    seconds : float
+        How long to send requests for
+    concurrency : int
+        Number of connections sending requests
+
+    Returns
+    -------
+    dict
+        Number of requests answered, and of those that failed
+    """
+
+    return asyncio.run(send_reads(url, paths, seconds, concurrency))
+
+
+def start_server(workers: int, port: int, env: dict) -> subprocess.Popen:
+    """
+    Function to start the API with a number of worker processes, and wait until it
+    answers
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes
+    port : int
+        Port to listen on
+    env : dict
+        Environment variables configuring the API, such as its storage backend
+
+    Returns
+    -------
+    subprocess.Popen
+        Server process
+    """
+
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        env={**os.environ, **env},
+    )
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"API with {workers} workers didn't start")
+
+
+def benchmark_workers(
+    workers: int, path: str, paths: list, args: argparse.Namespace
+) -> dict:
+    """
+    Function to measure the read throughput of the API with a number of workers
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes
+    path : str
+        SQLite database file
+    paths : list
+        Endpoint paths to request
+    args : argparse.Namespace
+        Load test options
+
+    Returns
+    -------
+    dict
+        Requests per second, and number of requests and errors
+    """
+
+    server = start_server(
+        workers, args.port, {"BOM_STORE": "sqlite", "BOM_SQLITE_PATH": path}
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        # Warming every worker's connection before measuring
+        run_client(url, paths, 1, args.concurrency)
+        with multiprocessing.Pool(args.clients) as pool:
+            counts = pool.starmap(
+                run_client,
+                [(url, paths, args.seconds, args.concurrency)] * args.clients,
+            )
+    finally:
+        server.terminate()
+        server.wait()
+    requests = sum(count["requests"] for count in counts)
+    return {
+        "requests_per_second": requests / args.seconds,
+        "requests": requests,
+        "errors": sum(count["errors"] for count in counts),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depth", type=int, default=4, help="assembly levels")
+    parser.add_argument("--fanout", type=int, default=10, help="children per assembly")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--clients", type=int, default=4, help="load test client processes"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="connections per client"
+    )
+    parser.add_argument("--seconds", type=float, default=10, help="per worker count")
+    parser.add_argument("--port", type=int, default=8123, help="port to serve on")
+    parser.add_argument("--json", help="file to write results to as JSON")
+    args = parser.parse_args()
+
+    bom = generate_bom("bench", args.depth, args.fanout)
+    paths = read_paths(bom)
+    results = {"nodes": count_nodes(bom), "cpus": os.cpu_count(), "workers": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bom.sqlite3")
+        store = create_store("sqlite", path=path)
+        store.import_assembly(bom)
+        store.connection.close()
+        for workers in args.workers:
+            results["workers"][workers] = benchmark_workers(workers, path, paths, args)
+
+    print(
+        f"{results['nodes']} nodes (depth {args.depth}, fanout {args.fanout}) "
+        f"on {results['cpus']} CPUs\n"
+    )
+    print(f"{'workers':<10}{'req/s':>12}{'speedup':>10}{'per worker':>12}{'errors':>8}")
+    baseline = next(iter(results["workers"].values()))["requests_per_second"]
+    for workers, result in results["workers"].items():
+        speedup = result["requests_per_second"] / baseline
+        print(
+            f"{workers:<10}{result['requests_per_second']:>12.1f}{speedup:>9.2f}x"
+            f"{speedup / workers * args.workers[0]:>11.0%}{result['errors']:>8}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
@@ -14,8 +14,7 @@ if __name__ == "__main__":
     box_parts = ["box_top", "box_bottom", "box_inserts"]
 
     # Creating parts for base ink cartridge, pen_components & box_parts
-    for part in ink_cartridge + pen_components + box_parts:
-        rq.add_part(part)
+    rq.add_parts(ink_cartridge + pen_components + box_parts)
 
     # Creating base ink cartridge assembly
     rq.add_assembly(assembly_name="ink_cartridge", part_names=ink_cartridge)
@@ -50,13 +49,13 @@ if __name__ == "__main__":
             project = f"{barrel}_{ink_color}_pen"
 
             # Displaying each variant of pen assembly
-            response = rq.get_assembly("pen_box")
+            response = rq.get_assembly_tree("pen_box")
 
             print(f"{project}:\n")
             rq.render_assembly(response.json()["data"])
 
-            # Saving the current assembly
-            rq.save_assembly_project(project)
+            # Saving the current assembly as its differences from the base assembly
+            rq.save_variant_project(project)
             # Loading a copy of the base assembly to build more variants
             rq.copy_assembly_project("base_pen")
 
@@ -0,0 +1,34 @@
+"""
+Storage backends for the Bill of Materials App
+"""
+
+from storage.base_store import BaseStore
+from storage.memory_store import MemoryStore
+from storage.compact_store import CompactStore
+from storage.sqlite_store import SqliteStore
+
+
+# Storage backends selectable by name
+STORES = {store.name: store for store in (MemoryStore, CompactStore, SqliteStore)}
+
+
+def create_store(backend: str = "memory", **options) -> BaseStore:
+    """
+    Function to create a storage backend by name
+
+    Parameters
+    ----------
+    backend : str, optional
+        Name of backend, one of memory, compact or sqlite
+    **options
+        Keyword arguments passed to the backend, such as the SQLite database path
+
+    Returns
+    -------
+    BaseStore
+        New storage backend
+    """
+
+    if backend not in STORES:
+        raise ValueError(f"Unknown storage backend {backend}")
+    return STORES[backend](**options)
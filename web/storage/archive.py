@@ -0,0 +1,378 @@
+"""
+This file contains the archive the in-memory backends keep saved projects in, storing
+every distinct subtree and run of names once however many projects hold it
+"""
+
+import collections
+import itertools
+import os
+import sys
+import threading
+import weakref
+from collections.abc import Callable, Iterable, Iterator
+from storage.base_store import ProjectView
+
+
+# Number of saved projects kept built in a backend's own form beside the archive, so
+# loading a recently saved or loaded project doesn't rebuild it, set with
+# BOM_HOT_PROJECTS. Each costs the memory of a built project, and loading any other
+# project rebuilds it in time linear in its nodes
+HOT_PROJECTS = int(os.environ.get("BOM_HOT_PROJECTS", "4"))
+# Name orders are cut after every name whose hash has these bits clear, so runs of
+# names average 64 long and an insertion or removal only changes the run it falls in
+CHUNK_MASK = 63
+# Indexes of a project kept as name orders, in the order projects are dumped
+ORDERS = ("parts", "assemblies", "orphans", "components", "subassemblies")
+
+
+class Subtree:
+    """
+    Immutable assembly subtree, interned by its digest so structurally identical
+    subtrees of every saved project are one object
+
+    Parts are kept as their interned names, and subassemblies as their own Subtree, so
+    a subtree holds no parent and can be shared by any number of projects.
+    """
+
+    __slots__ = ("name", "children", "quantities", "shared", "digest", "__weakref__")
+
+    def __init__(
+        self,
+        name: str,
+        children: tuple,
+        quantities: tuple | None,
+        shared: tuple,
+        digest: str,
+    ):
+        # Name of the assembly
+        self.name = name
+        # Part name or Subtree of every child in attach order
+        self.children = children
+        # Number of each child the assembly needs, or None if every one is 1
+        self.quantities = quantities
+        # (Subtree, quantity) of every assembly it shares, in the order they were shared
+        self.shared = shared
+        # Digest from subtree_digest
+        self.digest = digest
+
+    def edges(self) -> list:
+        """
+        Gets the children of the subtree with their quantities
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list
+            (part name or Subtree, quantity) of every child in attach order
+        """
+
+        return list(zip(self.children, self.quantities or itertools.repeat(1)))
+
+
+class Names:
+    """
+    Interned run of names, wrapping a tuple so the archive can hold it weakly
+    """
+
+    __slots__ = ("names", "__weakref__")
+
+    def __init__(self, names: tuple):
+        # Names in order
+        self.names = names
+
+
+class ArchivedProject:
+    """
+    Saved project as its interned top-level subtrees and the order of every index
+    """
+
+    __slots__ = ("roots", "orders", "shared")
+
+    def __init__(self, roots: tuple, orders: dict, shared: tuple):
+        # Subtree of every top-level assembly, in top-level order
+        self.roots = roots
+        # Interned runs of names of every index in ORDERS, by index name
+        self.orders = orders
+        # (assembly, name, quantity) of every shared assembly, in the order they were
+        # shared
+        self.shared = shared
+
+    def names(self, index_name: str) -> Iterator:
+        """
+        Gets the names of an index in order
+
+        Parameters
+        ----------
+        index_name : str
+            One of ORDERS
+
+        Returns
+        -------
+        Iterator
+            Names of the index
+        """
+
+        return itertools.chain.from_iterable(
+            chunk.names for chunk in self.orders[index_name]
+        )
+
+    def dump(self) -> dict:
+        """
+        Expands the project into the format the in-memory backends dump projects in
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            Names in every index, parent links in pre-order and shared assemblies
+        """
+
+        project = {index_name: list(self.names(index_name)) for index_name in ORDERS}
+        project["top_assemblies"] = [root.name for root in self.roots]
+        project["edges"] = []
+        for root in self.roots:
+            # Iterative pre-order walk so deep trees don't hit the recursion limit
+            stack = [(root, *edge) for edge in reversed(root.edges())]
+            while stack:
+                parent, child, quantity = stack.pop()
+                is_part = isinstance(child, str)
+                name = child if is_part else child.name
+                project["edges"].append([parent.name, name, is_part, quantity])
+                if not is_part:
+                    stack.extend((child, *edge) for edge in reversed(child.edges()))
+        project["shared"] = [list(edge) for edge in self.shared]
+        return project
+
+
+class Archive:
+    """
+    Store-wide interning layer for saved projects
+
+    Subtrees are interned by digest and name orders by runs of names, both held weakly,
+    so content is freed with the last project holding it and archive memory grows with
+    distinct content rather than with the number of projects. Saved projects are
+    expanded back into a backend's own form to be loaded, and the hot_projects most
+    recently used are kept in that form. Loading a hot project only shares its nodes,
+    while a cold one is rebuilt from the archive in time linear in its nodes, about
+    0.15 s (memory) or 0.04 s (compact) at 11,111 nodes.
+    """
+
+    def __init__(self, hot_projects: int = HOT_PROJECTS):
+        # Interned subtrees by digest
+        self.subtrees = weakref.WeakValueDictionary()
+        # Interned runs of names by hash
+        self.chunks = weakref.WeakValueDictionary()
+        # Most recently used projects in the backend's own form, by name, oldest first
+        self.hot = collections.OrderedDict()
+        # Number of projects kept hot
+        self.hot_projects = hot_projects
+        # Guards the hot projects, which reads of several threads update
+        self.lock = threading.Lock()
+
+    def intern_subtree(self, view: ProjectView, assembly_name: str) -> Subtree:
+        """
+        Interns the subtree of an assembly, reusing interned subassemblies
+
+        Digests are cached by the backends, so only subtrees that changed since they
+        were last interned are walked.
+
+        Parameters
+        ----------
+        view : ProjectView
+            Project holding the assembly
+        assembly_name : str
+            Name of assembly
+
+        Returns
+        -------
+        Subtree
+            Interned subtree
+        """
+
+        # Subtrees interned by this walk, held until their parents reference them
+        interned = {}
+        # Iterative post-order walk so deep trees don't hit the recursion limit
+        stack = [(assembly_name, False)]
+        while stack:
+            name, children_interned = stack.pop()
+            digest = view.digest(name)
+            if digest in interned:
+                continue
+            subtree = self.subtrees.get(digest)
+            if subtree is None and not children_interned:
+                stack.append((name, True))
+                stack.extend(
+                    (child, False)
+                    for kind, child in view.children(name)
+                    if kind == "assembly"
+                )
+                stack.extend((child, False) for child in view.shared(name))
+                continue
+            if subtree is None:
+                edges = view.children(name)
+                children = tuple(
+                    interned[view.digest(child)]
+                    if kind == "assembly"
+                    else sys.intern(child)
+                    for kind, child in edges
+                )
+                quantities = tuple(view.node(kind, child)[1] for kind, child in edges)
+                shared = tuple(
+                    (interned[view.digest(child)], quantity)
+                    for child, quantity in view.shared(name).items()
+                )
+                subtree = Subtree(
+                    sys.intern(name),
+                    children,
+                    None if set(quantities) <= {1} else quantities,
+                    shared,
+                    digest,
+                )
+                self.subtrees[digest] = subtree
+            interned[digest] = subtree
+        return interned[view.digest(assembly_name)]
+
+    def intern_names(self, names: Iterable) -> tuple:
+        """
+        Interns a name order as runs of names, cut where the content says so that equal
+        stretches of two orders make the same runs
+
+        Parameters
+        ----------
+        names : iterable
+            Names in order
+
+        Returns
+        -------
+        tuple
+            Interned runs of names
+        """
+
+        names = tuple(map(sys.intern, names))
+        ends = [
+            end
+            for end, name_hash in enumerate(map(hash, names), 1)
+            if not name_hash & CHUNK_MASK
+        ]
+        if names and (not ends or ends[-1] != len(names)):
+            ends.append(len(names))
+        chunks = []
+        for start, end in zip([0, *ends], ends):
+            chunk = names[start:end]
+            key = hash(chunk)
+            interned = self.chunks.get(key)
+            if interned is None or interned.names != chunk:
+                interned = self.chunks[key] = Names(chunk)
+            chunks.append(interned)
+        return tuple(chunks)
+
+    def archive_project(
+        self, view: ProjectView, orders: dict, top_assemblies: Iterable, shared: list
+    ) -> ArchivedProject:
+        """
+        Interns a project about to be saved
+
+        Parameters
+        ----------
+        view : ProjectView
+            Project to archive
+        orders : dict
+            Names of every index in ORDERS in order, by index name
+        top_assemblies : iterable
+            Names of the top-level assemblies in order
+        shared : list
+            (assembly, name, quantity) of every shared assembly, in the order they were
+            shared
+
+        Returns
+        -------
+        ArchivedProject
+            Archived project
+        """
+
+        return ArchivedProject(
+            tuple(self.intern_subtree(view, name) for name in top_assemblies),
+            {
+                index_name: self.intern_names(orders[index_name])
+                for index_name in ORDERS
+            },
+            tuple(
+                (sys.intern(assembly_name), sys.intern(name), quantity)
+                for assembly_name, name, quantity in shared
+            ),
+        )
+
+    def keep_hot(self, project_name: str, project):
+        """
+        Keeps a saved project in a backend's own form, dropping the least recently used
+        one beyond hot_projects
+
+        Parameters
+        ----------
+        project_name : str
+            Name of project
+        project : object
+            Project as the backend loads it, never mutated again
+
+        Returns
+        -------
+        None
+        """
+
+        with self.lock:
+            self.hot[project_name] = project
+            self.hot.move_to_end(project_name)
+            while len(self.hot) > self.hot_projects:
+                self.hot.popitem(last=False)
+
+    def drop(self, project_name: str):
+        """
+        Drops a project that is no longer saved from the hot projects
+
+        Parameters
+        ----------
+        project_name : str
+            Name of project
+
+        Returns
+        -------
+        None
+        """
+
+        with self.lock:
+            self.hot.pop(project_name, None)
+
+    def expand(
+        self, project_name: str, archived: ArchivedProject, build: Callable
+    ) -> object:
+        """
+        Gets a saved project in a backend's own form, building it from the archive
+        unless it is hot
+
+        Parameters
+        ----------
+        project_name : str
+            Name of project
+        archived : ArchivedProject
+            Archived project
+        build : callable
+            Function building the backend's form from ArchivedProject.dump
+
+        Returns
+        -------
+        object
+            Project as the backend loads it
+        """
+
+        with self.lock:
+            project = self.hot.get(project_name)
+        if project is None:
+            project = build(archived.dump())
+        self.keep_hot(project_name, project)
+        return project
@@ -0,0 +1,1252 @@
+"""
+This file contains the interface every Bill of Materials storage backend implements
+"""
+
+import contextlib
+import functools
+import hashlib
+import itertools
+import json
+import uuid
+from collections.abc import Iterator
+
+
+# Random token of this process, so versions handed out by an earlier process never
+# match the versions of this one
+VERSION_EPOCH = uuid.uuid4().hex[:12]
+# Clock the in-memory backends stamp versions from. It is shared by every project and
+# store of the process, so no version is ever handed out twice
+VERSION_CLOCK = itertools.count(1)
+
+
+def recorded(mutation):
+    """
+    Decorator for store mutations, recording each one applied in the working project's
+    differences from the project it was loaded from, so it can be saved as a variant
+
+    Parameters
+    ----------
+    mutation : function
+        Store method changing the working project
+
+    Returns
+    -------
+    function
+        Store method applying the mutation and recording it in one transaction
+    """
+
+    @functools.wraps(mutation)
+    def wrapper(self, *args):
+        with self.transaction():
+            result = mutation(self, *args)
+            self.record_delta(json.dumps([mutation.__name__, args]))
+        return result
+
+    return wrapper
+
+
+def subtree_digest(assembly_name: str, edges: list) -> str:
+    """
+    Hashes the subtree of an assembly from its name and the digests of its children,
+    so two subtrees get the same digest exactly when they hold the same nodes
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly
+    edges : list
+        [kind, name, quantity, digest] of every child, followed by every assembly it
+        shares with kind "shared". Parts have no digest
+
+    Returns
+    -------
+    str
+        Hex digest
+    """
+
+    content = json.dumps([assembly_name, edges]).encode()
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+class ProjectView:
+    """
+    Read-only view of one project of a store, two of which diff_views compares
+    """
+
+    def node(self, kind: str, name: str) -> tuple | None:
+        """
+        Gets where a node is attached
+
+        Parameters
+        ----------
+        kind : str
+            Either "part" or "assembly"
+        name : str
+            Name of node
+
+        Returns
+        -------
+        tuple or None
+            Name of parent assembly, None for top-level nodes, and the number of the
+            node it needs, or None if the node doesn't exist
+        """
+
+        raise NotImplementedError
+
+    def children(self, assembly_name: str) -> list:
+        """
+        Gets the children of an assembly, without the assemblies it shares
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        list
+            (kind, name) of every child
+        """
+
+        raise NotImplementedError
+
+    def shared(self, assembly_name: str) -> dict:
+        """
+        Gets the assemblies an assembly shares
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        dict
+            Number of each shared assembly the assembly needs by name
+        """
+
+        raise NotImplementedError
+
+    def digest(self, assembly_name: str) -> str:
+        """
+        Gets the digest of an assembly's subtree, from subtree_digest
+
+        Backends cache digests like exports, dropping them along the ancestor path of
+        every change, so only changed subtrees are hashed again.
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        str
+            Hex digest
+        """
+
+        raise NotImplementedError
+
+    def roots(self) -> list:
+        """
+        Gets the top-level assemblies and orphan parts
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list
+            (kind, name) of every top-level node
+        """
+
+        raise NotImplementedError
+
+
+def diff_views(old: ProjectView, new: ProjectView) -> dict:
+    """
+    Function to compare two projects, walking down from their top-level nodes only into
+    assemblies whose subtrees differ, so the cost grows with the changes rather than
+    the size of the projects
+
+    Parameters
+    ----------
+    old : ProjectView
+        Project to compare from
+    new : ProjectView
+        Project to compare to
+
+    Returns
+    -------
+    dict
+        added : list
+            Nodes only in the new project, with their parent and quantity
+        removed : list
+            Nodes only in the old project, with their parent and quantity
+        changed : list
+            Nodes in both with another parent or quantity, as [old, new] pairs
+        shared : list
+            Assemblies shared in the new project and not the old, or with another
+            quantity
+        unshared : list
+            Assemblies shared in the old project and not the new
+    """
+
+    diff = {"added": [], "removed": [], "changed": [], "shared": [], "unshared": []}
+    seen = set()
+    # Assemblies to walk, and whether they are in the old and new projects
+    stack = []
+
+    def compare(kind: str, name: str):
+        if (kind, name) in seen:
+            return
+        seen.add((kind, name))
+        before, after = old.node(kind, name), new.node(kind, name)
+        if before is None and after is not None:
+            diff["added"].append(
+                {"kind": kind, "id": name, "parent": after[0], "quantity": after[1]}
+            )
+        elif after is None:
+            diff["removed"].append(
+                {"kind": kind, "id": name, "parent": before[0], "quantity": before[1]}
+            )
+        elif before != after:
+            diff["changed"].append(
+                {
+                    "kind": kind,
+                    "id": name,
+                    "parent": [before[0], after[0]],
+                    "quantity": [before[1], after[1]],
+                }
+            )
+        # Subtrees with the same digest hold the same nodes, so aren't walked
+        if kind == "assembly" and (
+            before is None or after is None or old.digest(name) != new.digest(name)
+        ):
+            stack.append((name, before is not None, after is not None))
+
+    for kind, name in [*old.roots(), *new.roots()]:
+        compare(kind, name)
+    while stack:
+        name, in_old, in_new = stack.pop()
+        for view, present in ((old, in_old), (new, in_new)):
+            for kind, child in view.children(name) if present else ():
+                compare(kind, child)
+        before = old.shared(name) if in_old else {}
+        after = new.shared(name) if in_new else {}
+        for child, quantity in after.items():
+            if before.get(child) != quantity:
+                diff["shared"].append(
+                    {"assembly": name, "id": child, "quantity": quantity}
+                )
+        for child, quantity in before.items():
+            if child not in after:
+                diff["unshared"].append(
+                    {"assembly": name, "id": child, "quantity": quantity}
+                )
+    # The walk order depends on how each backend lists top-level nodes
+    for entries in diff.values():
+        entries.sort(
+            key=lambda entry: (
+                entry.get("assembly", ""),
+                entry["id"],
+                entry.get("kind", ""),
+            )
+        )
+    return diff
+
+
+class BaseStore:
+    """
+    Storage backend holding the working assembly project and all saved projects
+
+    Backends only store and query data. Input validation and HTTP errors are handled by
+    the API in app.py, which checks preconditions through the lookup methods before
+    calling any mutation. Exports are JSON strings in the shape anytree's
+    JsonExporter(sort_keys=True) emits.
+    """
+
+    # Name used to select the backend
+    name = "base"
+
+    def has_part(self, part_name: str) -> bool:
+        """
+        Checks if a part exists in the working project
+
+        Parameters
+        ----------
+        part_name : str
+            Name of part
+
+        Returns
+        -------
+        bool
+            True if the part exists
+        """
+
+        raise NotImplementedError
+
+    def has_assembly(self, assembly_name: str) -> bool:
+        """
+        Checks if an assembly exists in the working project
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of assembly
+
+        Returns
+        -------
+        bool
+            True if the assembly exists
+        """
+
+        raise NotImplementedError
+
+    def part_parent(self, part_name: str) -> str | None:
+        """
+        Gets the name of the assembly a part is attached to
+
+        Parameters
+        ----------
+        part_name : str
+            Name of an existing part
+
+        Returns
+        -------
+        str, optional
+            Name of parent assembly, or None if the part has no parent
+        """
+
+        raise NotImplementedError
+
+    def assembly_parent(self, assembly_name: str) -> str | None:
+        """
+        Gets the name of the assembly an assembly is attached to
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        str, optional
+            Name of parent assembly, or None if the assembly is top-level
+        """
+
+        raise NotImplementedError
+
+    def assembly_contains(self, assembly_name: str, kind: str, name: str) -> bool:
+        """
+        Checks if a part or assembly is anywhere inside an assembly's subtree
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+        kind : str
+            part or assembly
+        name : str
+            Name of an existing part or assembly
+
+        Returns
+        -------
+        bool
+            True if the node is a descendant of the assembly
+        """
+
+        raise NotImplementedError
+
+    def part_count(self) -> int:
+        """
+        Counts the parts in the working project
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        int
+            Number of parts
+        """
+
+        raise NotImplementedError
+
+    def assembly_count(self) -> int:
+        """
+        Counts the assemblies in the working project
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        int
+            Number of assemblies
+        """
+
+        raise NotImplementedError
+
+    def tree_depth(self) -> int:
+        """
+        Counts the assembly levels of the deepest assembly tree in the working project,
+        following parent links only, so assemblies shared into a tree don't add levels
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        int
+            Levels of assemblies, 1 for top-level assemblies holding only parts, or 0
+            without any assembly
+        """
+
+        raise NotImplementedError
+
+    def create_parts(self, part_names: list):
+        """
+        Creates orphan parts
+
+        Parameters
+        ----------
+        part_names : list
+            Names of parts that don't exist yet
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def delete_part(self, part_name: str):
+        """
+        Detaches a part from its parent assembly and deletes it
+
+        Parameters
+        ----------
+        part_name : str
+            Name of an existing part
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def create_assembly(
+        self,
+        assembly_name: str,
+        part_names: list,
+        subassembly_names: list,
+        quantities: dict | None = None,
+    ):
+        """
+        Creates a top-level assembly from orphan parts and top-level assemblies
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of assembly that doesn't exist yet
+        part_names : list
+            Names of existing parts without parents
+        subassembly_names : list
+            Names of existing assemblies without parents
+        quantities : dict, optional
+            Number of each child the assembly needs by name, 1 when missing
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def import_assembly(self, assembly: dict) -> dict:
+        """
+        Builds a whole validated nested assembly tree
+
+        Parameters
+        ----------
+        assembly : dict
+            Nested tree whose nodes have an id and assemblies a list of children. Every
+            name is unique, assemblies don't exist yet and leaves are new or orphan parts.
+            Nodes may have a quantity, the number of them their parent needs, 1 when
+            missing
+
+        Returns
+        -------
+        dict
+            assemblies : int
+                Number of assemblies created
+            parts : int
+                Number of parts in the tree
+            created_parts : int
+                Number of parts created
+        """
+
+        raise NotImplementedError
+
+    def attach_part(self, assembly_name: str, part_name: str, quantity: int = 1):
+        """
+        Attaches an orphan part to an assembly
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+        part_name : str
+            Name of an existing part without a parent
+        quantity : int, optional
+            Number of the part the assembly needs
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def detach_part(self, part_name: str):
+        """
+        Detaches a part from its parent assembly
+
+        Parameters
+        ----------
+        part_name : str
+            Name of an existing part with a parent
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def shared_subassemblies(self, assembly_name: str) -> dict:
+        """
+        Gets the assemblies an assembly shares besides its own subassemblies
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        dict
+            Number of each shared assembly needed by name, in the order they were shared
+        """
+
+        raise NotImplementedError
+
+    def share_assembly(
+        self, assembly_name: str, subassembly_name: str, quantity: int = 1
+    ):
+        """
+        Adds an assembly below another without taking it from its own parent, so one
+        subassembly can be used by many assemblies
+
+        Shared assemblies follow an assembly's own children in exports and traversals,
+        and are visited once per traversal however many times they are reached. The
+        classification indexes only follow parents, so a shared top-level assembly
+        stays top-level.
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+        subassembly_name : str
+            Name of an existing assembly that isn't shared by the assembly yet and
+            doesn't contain it
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def unshare_assembly(self, assembly_name: str, subassembly_name: str):
+        """
+        Removes an assembly shared by another
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+        subassembly_name : str
+            Name of an assembly it shares
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def explode_assembly(self, assembly_name: str) -> dict:
+        """
+        Totals the quantity of every part needed to build one of an assembly, multiplying
+        quantities down each path through its subassemblies
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        dict
+            Total quantity by part name, which callers must not mutate since it may be
+            cached
+        """
+
+        raise NotImplementedError
+
+    def assembly_version(self, assembly_name: str) -> str:
+        """
+        Gets the version of an assembly, which changes whenever anything below it
+        changes, including inside the assemblies it shares
+
+        Versions are stamped up the ancestor chain of every change, so reading one
+        never exports the assembly.
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        str
+            Opaque version, never the same for two different states of the assembly
+        """
+
+        raise NotImplementedError
+
+    def export_part(self, part_name: str) -> str:
+        """
+        Exports an existing part
+
+        Parameters
+        ----------
+        part_name : str
+            Name of part
+
+        Returns
+        -------
+        str
+            JSON representation of part
+        """
+
+        raise NotImplementedError
+
+    def export_assembly(self, assembly_name: str) -> str:
+        """
+        Exports an existing assembly with its subtree
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of assembly
+
+        Returns
+        -------
+        str
+            JSON representation of assembly
+        """
+
+        raise NotImplementedError
+
+    def export_parts(self) -> list:
+        """
+        Exports all parts in creation order
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list
+            JSON representations of parts
+        """
+
+        raise NotImplementedError
+
+    def export_assemblies(self) -> list:
+        """
+        Exports all assemblies in creation order
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list
+            JSON representations of assemblies
+        """
+
+        raise NotImplementedError
+
+    def iter_parts(self, after: str | None = None) -> Iterator[tuple[str, str]]:
+        """
+        Lazily exports all parts in creation order, for paginated and streamed listings
+
+        Mutations made while iterating never end the listing early: parts deleted since
+        iterating started are skipped.
+
+        Parameters
+        ----------
+        after : str, optional
+            Name of an existing part to resume after
+
+        Yields
+        ------
+        tuple
+            Name and JSON representation of each part
+        """
+
+        raise NotImplementedError
+
+    def iter_assemblies(self, after: str | None = None) -> Iterator[tuple[str, str]]:
+        """
+        Lazily exports all assemblies in creation order
+
+        Parameters
+        ----------
+        after : str, optional
+            Name of an existing assembly to resume after
+
+        Yields
+        ------
+        tuple
+            Name and JSON representation of each assembly
+        """
+
+        raise NotImplementedError
+
+    def iter_descendants(
+        self, assembly_name: str, after: tuple | None = None
+    ) -> Iterator[tuple[tuple, str]]:
+        """
+        Lazily exports all children of an assembly in pre-order
+
+        A part and an assembly can share a name, so descendants are keyed by kind and
+        name.
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+        after : tuple, optional
+            Kind and name of a descendant to resume after
+
+        Yields
+        ------
+        tuple
+            Kind and name, and JSON representation of each descendant
+        """
+
+        raise NotImplementedError
+
+    def iter_leaves(
+        self, assembly_name: str, after: tuple | None = None
+    ) -> Iterator[tuple[tuple, str]]:
+        """
+        Lazily exports all descendants of an assembly that have no children, in
+        pre-order
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+        after : tuple, optional
+            Kind and name of a descendant to resume after, which needn't be a leaf
+
+        Yields
+        ------
+        tuple
+            Kind and name, and JSON representation of each leaf
+        """
+
+        raise NotImplementedError
+
+    def part_where_used(self, part_name: str) -> list:
+        """
+        Gets the names of all assemblies that contain a part, in the same order as
+        export_part_ancestors, without exporting them
+
+        Parameters
+        ----------
+        part_name : str
+            Name of an existing part
+
+        Returns
+        -------
+        list
+            Names of ancestor assemblies
+        """
+
+        raise NotImplementedError
+
+    def export_part_ancestors(self, part_name: str) -> list:
+        """
+        Exports all assemblies that contain a part, from the top-level assembly down.
+        Once a part is below a shared assembly its ancestors no longer form a chain, and
+        are ordered farthest first, then by name
+
+        Parameters
+        ----------
+        part_name : str
+            Name of an existing part
+
+        Returns
+        -------
+        list
+            JSON representations of ancestor assemblies
+        """
+
+        raise NotImplementedError
+
+    def export_first_children(self, assembly_name: str) -> list:
+        """
+        Exports the first level children of an assembly
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        list
+            JSON representations of children
+        """
+
+        raise NotImplementedError
+
+    def export_descendants(self, assembly_name: str) -> list:
+        """
+        Exports all children of an assembly in pre-order
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        list
+            JSON representations of descendants
+        """
+
+        raise NotImplementedError
+
+    def export_leaves(self, assembly_name: str) -> list:
+        """
+        Exports all descendants of an assembly that have no children, in pre-order
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        list
+            JSON representations of leaves
+        """
+
+        raise NotImplementedError
+
+    def export_top_assemblies(self) -> list:
+        """
+        Exports all assemblies that are not children of another assembly
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list
+            JSON representations of top-level assemblies
+        """
+
+        raise NotImplementedError
+
+    def export_subassemblies(self) -> list:
+        """
+        Exports all assemblies that are children of another assembly
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list
+            JSON representations of subassemblies
+        """
+
+        raise NotImplementedError
+
+    def export_components(self) -> list:
+        """
+        Exports all parts that are included in a parent assembly
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list
+            JSON representations of component parts
+        """
+
+        raise NotImplementedError
+
+    def export_orphans(self) -> list:
+        """
+        Exports all parts that have neither parents nor children
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list
+            JSON representations of orphan parts
+        """
+
+        raise NotImplementedError
+
+    def has_project(self, project_name: str) -> bool:
+        """
+        Checks if a project or variant has been saved
+
+        Parameters
+        ----------
+        project_name : str
+            Name of project
+
+        Returns
+        -------
+        bool
+            True if the project exists
+        """
+
+        raise NotImplementedError
+
+    def project_names(self) -> list:
+        """
+        Lists the names of every saved project and variant
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list
+            Names of saved projects
+        """
+
+        raise NotImplementedError
+
+    def save_project(self, project_name: str):
+        """
+        Saves the working project under a name in full, replacing any variant of that
+        name, and clears the working project
+
+        Parameters
+        ----------
+        project_name : str
+            Name of project to save
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def load_project(self, project_name: str):
+        """
+        Replaces the working project with a copy of a saved project, and starts
+        recording its differences from it. Variants are loaded by load_variant
+
+        Parameters
+        ----------
+        project_name : str
+            Name of an existing project
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def has_variants(self, project_name: str) -> bool:
+        """
+        Checks if any saved variant is based on a project
+
+        Parameters
+        ----------
+        project_name : str
+            Name of project
+
+        Returns
+        -------
+        bool
+            True if a variant is based on the project
+        """
+
+        raise NotImplementedError
+
+    def project_base(self, project_name: str) -> str | None:
+        """
+        Gets the name of the project a saved variant is based on
+
+        Parameters
+        ----------
+        project_name : str
+            Name of an existing project
+
+        Returns
+        -------
+        str or None
+            Name of base project, or None if the project is saved in full
+        """
+
+        raise NotImplementedError
+
+    def working_base(self) -> str | None:
+        """
+        Gets the name of the project the working project was loaded from
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        str or None
+            Name of base project, or None if the working project wasn't loaded or has
+            been saved since
+        """
+
+        raise NotImplementedError
+
+    def variant_delta(self, project_name: str) -> list:
+        """
+        Gets the differences of a saved variant from its base project
+
+        Parameters
+        ----------
+        project_name : str
+            Name of a saved variant
+
+        Returns
+        -------
+        list
+            Mutations applied to the base project, in order, each a JSON list of the
+            store method's name and its arguments
+        """
+
+        raise NotImplementedError
+
+    def start_delta(self, project_name: str | None):
+        """
+        Starts recording the working project's differences from a project, dropping
+        any recorded so far
+
+        Parameters
+        ----------
+        project_name : str or None
+            Name of base project, or None to stop recording
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def record_delta(self, record: str):
+        """
+        Records a mutation of the working project, if it has a base project
+
+        Parameters
+        ----------
+        record : str
+            JSON list of the store method's name and its arguments
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def save_variant(self, project_name: str):
+        """
+        Saves the working project under a name as its differences from its base
+        project, and clears the working project
+
+        Only the recorded mutations are stored, so a variant of a large project costs
+        as much as its changes. A variant can be loaded, changed and saved as a variant
+        of its own.
+
+        Parameters
+        ----------
+        project_name : str
+            Name of project to save, which no variant is based on and isn't the base
+            project
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
+
+    def load_variant(self, project_name: str):
+        """
+        Replaces the working project with a saved variant, loading the project at the
+        root of its chain of bases and replaying the differences of each variant on it
+
+        Parameters
+        ----------
+        project_name : str
+            Name of a saved variant
+
+        Returns
+        -------
+        None
+        """
+
+        deltas = []
+        base_name = project_name
+        while self.project_base(base_name) is not None:
+            deltas.append(self.variant_delta(base_name))
+            base_name = self.project_base(base_name)
+        with self.transaction():
+            self.load_project(base_name)
+            for delta in reversed(deltas):
+                for record in delta:
+                    operation, args = json.loads(record)
+                    getattr(self, operation)(*args)
+            self.start_delta(project_name)
+
+    def project_views(self, project_names: list) -> contextlib.AbstractContextManager:
+        """
+        Opens read-only views of saved projects, loading variants apart from the
+        working project
+
+        Parameters
+        ----------
+        project_names : list
+            Names of existing projects
+
+        Returns
+        -------
+        contextlib.AbstractContextManager
+            Context giving a ProjectView of each project, valid until it exits
+        """
+
+        raise NotImplementedError
+
+    def diff_projects(self, old_name: str, new_name: str) -> dict:
+        """
+        Compares two saved projects, skipping the subtrees they hold unchanged
+
+        Parameters
+        ----------
+        old_name : str
+            Name of an existing project to compare from
+        new_name : str
+            Name of an existing project to compare to
+
+        Returns
+        -------
+        dict
+            Differences in the shape diff_views returns
+        """
+
+        with self.project_views([old_name, new_name]) as (old, new):
+            return diff_views(old, new)
+
+    def transaction(self) -> contextlib.AbstractContextManager:
+        """
+        Opens a write transaction, so the API's precondition checks and the mutation
+        they guard are applied atomically even with other processes sharing the data
+
+        The in-memory backends are only ever used by one process, whose API applies
+        each request without yielding to another, so they need no locking.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        contextlib.AbstractContextManager
+            Context committing on exit, or rolling back if an exception is raised
+        """
+
+        return contextlib.nullcontext()
+
+    def dump(self) -> dict:
+        """
+        Dumps the working project and all saved projects as plain JSON-serializable data
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            working : dict
+                Working project
+            projects : dict
+                Saved projects keyed by name
+            variants : dict
+                Base project and differences of saved variants keyed by name
+            base : str or None
+                Name of the working project's base project
+            delta : list
+                Differences of the working project from its base project
+        """
+
+        raise NotImplementedError
+
+    def restore(self, state: dict):
+        """
+        Replaces all data in the store with a dump
+
+        Parameters
+        ----------
+        state : dict
+            Dump from BaseStore.dump of the same backend
+
+        Returns
+        -------
+        None
+        """
+
+        raise NotImplementedError
@@ -0,0 +1,1454 @@
+"""
+This file contains the compact array-backed storage backend for the Bill of Materials App
+"""
+
+import contextlib
+import json
+from array import array
+from collections.abc import Iterator
+from storage.archive import Archive
+from storage.base_store import (
+    VERSION_CLOCK,
+    VERSION_EPOCH,
+    BaseStore,
+    ProjectView,
+    recorded,
+    subtree_digest,
+)
+
+# A stale tree is only relabeled for a range scan below a node whose subtree was at
+# least this share of the tree when last labeled, so relabeling pays for itself
+RELABEL_SHARE = 1 / 8
+
+
+class CompactTree:
+    """
+    Parts and assemblies of one project, stored as integer node ids into flat arrays
+
+    Node names are kept in a string table indexed by node id, parents in an array of
+    node ids (-1 for none) and the children of every assembly in an array of node ids,
+    so a node costs a few machine words instead of an AnyTree object with its own dict.
+    Deleted parts leave a hole in the arrays, since ids are never reused.
+
+    Every top-level tree is also labeled with nested intervals: the node ids of the tree
+    in pre-order, and each node's position in it with the size of its subtree. A node's
+    descendants are then a contiguous slice, and ancestry is an interval check. A
+    mutation only marks the trees it touches as stale. Ancestry in a stale tree is
+    checked by walking up the parents, and a stale tree is only relabeled in one pass
+    when a range scan over a large enough share of it pays for it. Smaller scans walk
+    the children arrays instead.
+
+    Assemblies shared by other assemblies besides their own parent are kept beside the
+    trees, so labels only cover trees. Traversals fall back to walking the children
+    arrays once anything is shared.
+    """
+
+    __slots__ = (
+        "names",
+        "assembly_flags",
+        "parents",
+        "children",
+        "part_ids",
+        "assembly_ids",
+        "orphans",
+        "components",
+        "top_assemblies",
+        "subassemblies",
+        "exports",
+        "quantities",
+        "rollups",
+        "digests",
+        "chains",
+        "versions",
+        "shared",
+        "sharing",
+        "label_roots",
+        "label_starts",
+        "label_sizes",
+        "label_orders",
+        "stale_roots",
+    )
+
+    def __init__(self):
+        # Name of every node, or None once deleted
+        self.names = []
+        # 1 for assemblies and 0 for parts
+        self.assembly_flags = bytearray()
+        # Parent node id of every node, or -1 if it has no parent
+        self.parents = array("q")
+        # Child node ids of every assembly in attach order, or None for parts
+        self.children = []
+        # Node ids of all parts and assemblies by name, in creation order
+        self.part_ids = {}
+        self.assembly_ids = {}
+        # Sets of node ids, kept in step with every parent change. Node ids are handed
+        # out in creation order, so they are listed sorted
+        self.orphans = {}
+        self.components = {}
+        self.top_assemblies = {}
+        self.subassemblies = {}
+        # Cached JSON exports of subtrees by node id
+        self.exports = {}
+        # Number of each node its parent needs
+        self.quantities = array("q")
+        # Cached total quantity by part name of every rolled up assembly, by node id
+        self.rollups = {}
+        # Cached subtree digests of every hashed assembly, by node id
+        self.digests = {}
+        # Cached distance by name of every assembly each chained assembly is below, and
+        # of itself at 0, farthest first, by node id
+        self.chains = {}
+        # Clock value of the last change below each assembly, by node id
+        self.versions = {}
+        # Assemblies each assembly shares besides its own children, as node id ->
+        # quantity by the sharing assembly's node id
+        self.shared = {}
+        # Node ids of the assemblies sharing each shared assembly, by its node id
+        self.sharing = {}
+        # Top-level root each node was last labeled under, or -1 if never labeled
+        self.label_roots = array("q")
+        # Pre-order position of each node in its labeled tree, and its subtree size
+        self.label_starts = array("q")
+        self.label_sizes = array("q")
+        # Node ids of every labeled tree in pre-order, by root node id
+        self.label_orders = {}
+        # Roots whose tree changed since it was labeled
+        self.stale_roots = set()
+
+    def copy(self) -> "CompactTree":
+        """
+        Copies the tree, sharing only immutable names, exports and digests
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        CompactTree
+            Independent copy
+        """
+
+        tree = CompactTree()
+        tree.names = self.names[:]
+        tree.assembly_flags = self.assembly_flags[:]
+        tree.parents = self.parents[:]
+        tree.quantities = self.quantities[:]
+        tree.children = [None if ids is None else ids[:] for ids in self.children]
+        tree.label_roots = self.label_roots[:]
+        tree.label_starts = self.label_starts[:]
+        tree.label_sizes = self.label_sizes[:]
+        tree.label_orders = dict(self.label_orders)
+        tree.stale_roots = set(self.stale_roots)
+        tree.shared = {node: dict(edges) for node, edges in self.shared.items()}
+        tree.sharing = {node: dict(edges) for node, edges in self.sharing.items()}
+        for slot in (
+            "part_ids",
+            "assembly_ids",
+            "orphans",
+            "components",
+            "top_assemblies",
+            "subassemblies",
+            "exports",
+            "rollups",
+            "digests",
+            "chains",
+            "versions",
+        ):
+            setattr(tree, slot, dict(getattr(self, slot)))
+        return tree
+
+    def add_node(
+        self, name: str, is_assembly: bool, parent: int = -1, quantity: int = 1
+    ) -> int:
+        """
+        Adds a node, appending it to its parent's children
+
+        Parameters
+        ----------
+        name : str
+            Name of part or assembly
+        is_assembly : bool
+            True for assemblies
+        parent : int, optional
+            Parent node id, -1 for none
+        quantity : int, optional
+            Number of the node the parent needs
+
+        Returns
+        -------
+        int
+            Node id
+        """
+
+        node = len(self.names)
+        self.names.append(name)
+        self.assembly_flags.append(is_assembly)
+        self.parents.append(parent)
+        self.quantities.append(quantity)
+        self.children.append(array("q") if is_assembly else None)
+        self.label_roots.append(-1)
+        self.label_starts.append(0)
+        self.label_sizes.append(1)
+        if parent >= 0:
+            self.mark_stale(parent)
+            self.children[parent].append(node)
+        if is_assembly:
+            self.assembly_ids[name] = node
+        else:
+            self.part_ids[name] = node
+        return node
+
+    def invalidate(self, node: int):
+        """
+        Drops the cached exports, rollups and digests of a node and of everything
+        including it: its ancestors, and the assemblies sharing any of them
+
+        A node without any cache can't be included in anything with one, since
+        exporting, rolling up or hashing a node caches everything below it, so each
+        walk stops at the first uncached node.
+
+        Parameters
+        ----------
+        node : int
+            Node id whose subtree changed, -1 for none
+
+        Returns
+        -------
+        None
+        """
+
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            while node >= 0:
+                exported = self.exports.pop(node, None) is not None
+                rolled_up = self.rollups.pop(node, None) is not None
+                hashed = self.digests.pop(node, None) is not None
+                if not (exported or rolled_up or hashed):
+                    break
+                stack.extend(self.sharing.get(node, ()))
+                node = self.parents[node]
+
+    def set_parent(self, node: int, parent: int, quantity: int = 1):
+        """
+        Reparents a node, moving it to the end of its new parent's children
+
+        Parameters
+        ----------
+        node : int
+            Node id
+        parent : int
+            New parent node id, -1 to detach
+        quantity : int, optional
+            Number of the node the new parent needs
+
+        Returns
+        -------
+        None
+        """
+
+        self.mark_stale(node)
+        if self.assembly_flags[node]:
+            self.drop_chains(node)
+        old_parent = self.parents[node]
+        if old_parent >= 0:
+            self.children[old_parent].remove(node)
+            self.invalidate(old_parent)
+        else:
+            self.label_orders.pop(node, None)
+        self.parents[node] = parent
+        self.quantities[node] = quantity
+        if parent >= 0:
+            self.mark_stale(parent)
+            self.children[parent].append(node)
+            self.invalidate(parent)
+        else:
+            # The node now roots its own tree, which has never been labeled
+            self.label_roots[node] = -1
+        self.index(node)
+        self.touch(old_parent)
+        self.touch(parent)
+
+    def touch(self, node: int):
+        """
+        Stamps an assembly whose subtree changed, everything including it and every
+        assembly sharing any of them with a new version
+
+        Parameters
+        ----------
+        node : int
+            Assembly node id, -1 for none
+
+        Returns
+        -------
+        None
+        """
+
+        version = next(VERSION_CLOCK)
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            # Assemblies reached twice through shared assemblies are stamped once
+            while node >= 0 and self.versions.get(node) != version:
+                self.versions[node] = version
+                stack.extend(self.sharing.get(node, ()))
+                node = self.parents[node]
+
+    def drop_chains(self, node: int):
+        """
+        Drops the cached ancestor chains of an assembly and of every assembly below it,
+        before its parents change
+
+        An assembly is only chained after everything it is below, so each walk stops
+        at the first unchained assembly.
+
+        Parameters
+        ----------
+        node : int
+            Assembly node id
+
+        Returns
+        -------
+        None
+        """
+
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if self.chains.pop(node, None) is not None:
+                stack.extend(self.children_of(node))
+
+    def mark_stale(self, node: int):
+        """
+        Marks the labels of the top-level tree containing a node as stale
+
+        A node with current labels is still in the tree it was labeled under, and one
+        without is in a tree already marked stale or never labeled, so this never walks
+        up the tree.
+
+        Parameters
+        ----------
+        node : int
+            Node id about to move or gain a child
+
+        Returns
+        -------
+        None
+        """
+
+        root = self.label_roots[node]
+        if root >= 0:
+            self.stale_roots.add(root)
+
+    def has_label(self, node: int, root: int) -> bool:
+        """
+        Checks if a node's labels are current and place it in a tree
+
+        A node that moved keeps its old labels until its new tree is relabeled, so its
+        position in the old tree's order no longer holds it.
+
+        Parameters
+        ----------
+        node : int
+            Node id
+        root : int
+            Root node id of the tree
+
+        Returns
+        -------
+        bool
+            True if the node is labeled in the tree and the labels are current
+        """
+
+        order = self.label_orders.get(root)
+        start = self.label_starts[node]
+        return (
+            order is not None
+            and root not in self.stale_roots
+            and start < len(order)
+            and order[start] == node
+        )
+
+    def label(self, node: int) -> int:
+        """
+        Makes sure the top-level tree containing a node is labeled
+
+        Parameters
+        ----------
+        node : int
+            Node id
+
+        Returns
+        -------
+        int
+            Root node id of the tree
+        """
+
+        root = self.label_roots[node]
+        if self.has_label(node, root):
+            return root
+        root = node
+        while self.parents[root] >= 0:
+            root = self.parents[root]
+        order = array("q")
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            self.label_roots[current] = root
+            self.label_starts[current] = len(order)
+            order.append(current)
+            stack.extend(reversed(self.children[current] or ()))
+        # Subtree sizes, children before parents
+        for current in reversed(order):
+            size = 1
+            for child in self.children[current] or ():
+                size += self.label_sizes[child]
+            self.label_sizes[current] = size
+        self.label_orders[root] = order
+        self.stale_roots.discard(root)
+        return root
+
+    def scan_root(self, node: int) -> int:
+        """
+        Gets the root of the labeled tree containing a node, for a range scan over its
+        descendants, relabeling a stale tree only if the node's subtree is a large
+        enough share of it
+
+        Parameters
+        ----------
+        node : int
+            Node id
+
+        Returns
+        -------
+        int
+            Root node id of the tree, or -1 if the children arrays should be walked
+        """
+
+        root = self.label_roots[node]
+        if self.has_label(node, root):
+            return root
+        root = node
+        while self.parents[root] >= 0:
+            root = self.parents[root]
+        # Subtree sizes from the last labeling are only estimates once stale
+        order = self.label_orders.get(root)
+        if root == node or (
+            order is not None and self.label_sizes[node] >= len(order) * RELABEL_SHARE
+        ):
+            return self.label(root)
+        return -1
+
+    def contains(self, ancestor: int, node: int) -> bool:
+        """
+        Checks if a node is below another node, following shared assemblies
+
+        Parameters
+        ----------
+        ancestor : int
+            Node id of the enclosing node
+        node : int
+            Node id
+
+        Returns
+        -------
+        bool
+            True if node is a descendant of ancestor
+        """
+
+        if self.sharing:
+            return ancestor in self.ancestors(node)
+        root = self.label_roots[node]
+        if not self.has_label(node, root):
+            # Walking up only costs the node's depth, relabeling the whole tree
+            current = self.parents[node]
+            while current >= 0:
+                if current == ancestor:
+                    return True
+                current = self.parents[current]
+            return False
+        if not self.has_label(ancestor, root):
+            return False
+        start = self.label_starts[ancestor]
+        return start < self.label_starts[node] < start + self.label_sizes[ancestor]
+
+    def index(self, node: int):
+        """
+        Files a node under the orphan, component, top-level or subassembly index
+
+        Parameters
+        ----------
+        node : int
+            Node id whose parent just changed
+
+        Returns
+        -------
+        None
+        """
+
+        has_parent = self.parents[node] >= 0
+        if self.assembly_flags[node]:
+            self.top_assemblies.pop(node, None)
+            self.subassemblies.pop(node, None)
+            (self.subassemblies if has_parent else self.top_assemblies)[node] = None
+        else:
+            self.orphans.pop(node, None)
+            self.components.pop(node, None)
+            (self.components if has_parent else self.orphans)[node] = None
+
+    def children_of(self, node: int):
+        """
+        Gets the children of a node followed by the assemblies it shares
+
+        Parameters
+        ----------
+        node : int
+            Node id
+
+        Returns
+        -------
+        array or list
+            Child node ids
+        """
+
+        children = self.children[node] or ()
+        shared = self.shared.get(node)
+        return [*children, *shared] if shared else children
+
+    def edges(self, node: int) -> list:
+        """
+        Gets the children of a node and the assemblies it shares, with the number of
+        each it needs
+
+        Parameters
+        ----------
+        node : int
+            Node id
+
+        Returns
+        -------
+        list
+            (node id, quantity) of every child
+        """
+
+        result = [
+            (child, self.quantities[child]) for child in self.children[node] or ()
+        ]
+        result.extend(self.shared.get(node, {}).items())
+        return result
+
+    def export(self, node: int) -> str:
+        """
+        Exports a node and its subtree in the shape of anytree's
+        JsonExporter(sort_keys=True), reusing cached subtree exports
+
+        Parameters
+        ----------
+        node : int
+            Node id
+
+        Returns
+        -------
+        str
+            JSON representation of the node and its subtree
+        """
+
+        if node in self.exports:
+            return self.exports[node]
+        if not self.assembly_flags[node]:
+            # Parts are cheaper to export than to cache, unless stitched into a parent
+            return f'{{"id": {json.dumps(self.names[node])}}}'
+        # Iterative post-order walk so deep trees don't hit the recursion limit
+        stack = [(node, False)]
+        while stack:
+            current, children_exported = stack.pop()
+            if current in self.exports:
+                continue
+            children = self.children_of(current)
+            if children and not children_exported:
+                stack.append((current, True))
+                stack.extend((child, False) for child in children)
+                continue
+            name = json.dumps(self.names[current])
+            if children:
+                self.exports[current] = (
+                    '{"children": ['
+                    + ", ".join(self.exports[child] for child in children)
+                    + f'], "id": {name}}}'
+                )
+            else:
+                self.exports[current] = f'{{"id": {name}}}'
+        return self.exports[node]
+
+    def rollup(self, node: int) -> dict:
+        """
+        Totals the quantity of every part needed to build one of an assembly, reusing
+        cached subassembly rollups
+
+        Parameters
+        ----------
+        node : int
+            Assembly node id
+
+        Returns
+        -------
+        dict
+            Total quantity by part name
+        """
+
+        # Iterative post-order walk so deep trees don't hit the recursion limit
+        stack = [(node, False)]
+        while stack:
+            current, children_rolled_up = stack.pop()
+            if current in self.rollups:
+                continue
+            edges = self.edges(current)
+            if not children_rolled_up:
+                stack.append((current, True))
+                stack.extend(
+                    (child, False) for child, _ in edges if self.assembly_flags[child]
+                )
+                continue
+            totals = {}
+            for child, quantity in edges:
+                if self.assembly_flags[child]:
+                    for part_name, count in self.rollups[child].items():
+                        totals[part_name] = totals.get(part_name, 0) + quantity * count
+                else:
+                    name = self.names[child]
+                    totals[name] = totals.get(name, 0) + quantity
+            self.rollups[current] = totals
+        return self.rollups[node]
+
+    def digest(self, node: int) -> str:
+        """
+        Hashes the subtree of an assembly, reusing cached subassembly digests
+
+        Parameters
+        ----------
+        node : int
+            Assembly node id
+
+        Returns
+        -------
+        str
+            Digest from subtree_digest
+        """
+
+        # Iterative post-order walk so deep trees don't hit the recursion limit
+        stack = [(node, False)]
+        while stack:
+            current, children_hashed = stack.pop()
+            if current in self.digests:
+                continue
+            children = self.children_of(current)
+            if not children_hashed:
+                stack.append((current, True))
+                stack.extend(
+                    (child, False) for child in children if self.assembly_flags[child]
+                )
+                continue
+            # Parts are never hashed, so have no digest
+            edges = [
+                [
+                    "assembly" if self.assembly_flags[child] else "part",
+                    self.names[child],
+                    self.quantities[child],
+                    self.digests.get(child),
+                ]
+                for child in self.children[current]
+            ]
+            edges += [
+                ["shared", self.names[child], quantity, self.digests[child]]
+                for child, quantity in self.shared.get(current, {}).items()
+            ]
+            self.digests[current] = subtree_digest(self.names[current], edges)
+        return self.digests[node]
+
+    def descendants(self, node: int) -> array:
+        """
+        Gets every node below a node in its own tree in pre-order, as a slice of its
+        tree's labels if they are current or worth relabeling
+
+        Parameters
+        ----------
+        node : int
+            Node id
+
+        Returns
+        -------
+        array
+            Node ids of descendants
+        """
+
+        root = self.scan_root(node)
+        if root < 0:
+            return array("q", self.preorder(node))
+        start = self.label_starts[node]
+        return self.label_orders[root][start + 1 : start + self.label_sizes[node]]
+
+    def preorder(self, node: int) -> Iterator[int]:
+        """
+        Iterates over every node below a node in its own tree in pre-order, walking
+        the children arrays
+
+        Parameters
+        ----------
+        node : int
+            Node id
+
+        Yields
+        ------
+        int
+            Node ids below the node
+        """
+
+        stack = list(reversed(self.children[node] or ()))
+        while stack:
+            current = stack.pop()
+            yield current
+            stack.extend(reversed(self.children[current] or ()))
+
+    def walk(self, node: int) -> Iterator[int]:
+        """
+        Iterates over every node below a node in pre-order, following shared
+        assemblies and visiting each of them once
+
+        Parameters
+        ----------
+        node : int
+            Node id
+
+        Yields
+        ------
+        int
+            Node ids below the node
+        """
+
+        if not self.shared:
+            yield from self.descendants(node)
+            return
+        # Only shared assemblies can be reached twice, or lead back to the node
+        seen = {node}
+        stack = list(reversed(self.children_of(node)))
+        while stack:
+            current = stack.pop()
+            if current in self.sharing:
+                if current in seen:
+                    continue
+                seen.add(current)
+            yield current
+            stack.extend(reversed(self.children_of(current)))
+
+    def ancestors(self, node: int) -> list:
+        """
+        Gets every assembly a node is below, following shared assemblies up to every
+        assembly sharing them
+
+        Parameters
+        ----------
+        node : int
+            Node id
+
+        Returns
+        -------
+        list
+            Node ids of ancestors, from the top-level assembly down, or once anything
+            is shared farthest first, then by name
+        """
+
+        if self.sharing:
+            # Breadth-first, so each ancestor is found at its shortest distance
+            found = {}
+            level = [node]
+            distance = 0
+            while level:
+                distance += 1
+                parents = []
+                for current in level:
+                    for parent in (
+                        self.parents[current],
+                        *self.sharing.get(current, ()),
+                    ):
+                        if parent >= 0 and parent not in found:
+                            found[parent] = (-distance, self.names[parent])
+                            parents.append(parent)
+                level = parents
+            return sorted(found, key=found.get)
+        result = []
+        node = self.parents[node]
+        while node >= 0:
+            result.append(node)
+            node = self.parents[node]
+        result.reverse()
+        return result
+
+    def chain(self, node: int) -> dict:
+        """
+        Gets every assembly an assembly is below, reusing cached chains
+
+        Each assembly's chain is built from the chains of its parent and of the
+        assemblies sharing it, and cached until one of them moves, so a where-used
+        lookup doesn't walk up the tree again.
+
+        Parameters
+        ----------
+        node : int
+            Assembly node id
+
+        Returns
+        -------
+        dict
+            Distance by name of every assembly the assembly is below, and of itself at
+            0, ordered like ancestors. Callers must not mutate it, since it is cached
+        """
+
+        stack = [node]
+        while stack:
+            current = stack[-1]
+            if current in self.chains:
+                stack.pop()
+                continue
+            parents = [
+                parent
+                for parent in (self.parents[current], *self.sharing.get(current, ()))
+                if parent >= 0
+            ]
+            unchained = [parent for parent in parents if parent not in self.chains]
+            if unchained:
+                stack.extend(unchained)
+                continue
+            stack.pop()
+            if len(parents) == 1:
+                # A single parent's chain is already in order
+                chain = {
+                    name: distance + 1
+                    for name, distance in self.chains[parents[0]].items()
+                }
+            else:
+                distances = {}
+                for parent in parents:
+                    for name, distance in self.chains[parent].items():
+                        if name not in distances or distance + 1 < distances[name]:
+                            distances[name] = distance + 1
+                chain = {
+                    name: distances[name]
+                    for name in sorted(
+                        distances, key=lambda name: (-distances[name], name)
+                    )
+                }
+            chain[self.names[current]] = 0
+            self.chains[current] = chain
+        return self.chains[node]
+
+
+class CompactView(ProjectView):
+    """
+    Read-only view of a saved project of a CompactStore
+    """
+
+    def __init__(self, tree: CompactTree):
+        # Tree of the project
+        self.tree = tree
+
+    def node(self, kind: str, name: str) -> tuple | None:
+        tree = self.tree
+        node = (tree.part_ids if kind == "part" else tree.assembly_ids).get(name)
+        if node is None:
+            return None
+        parent = tree.parents[node]
+        if parent < 0:
+            return None, 1
+        return tree.names[parent], tree.quantities[node]
+
+    def children(self, assembly_name: str) -> list:
+        tree = self.tree
+        return [
+            ("assembly" if tree.assembly_flags[child] else "part", tree.names[child])
+            for child in tree.children[tree.assembly_ids[assembly_name]]
+        ]
+
+    def shared(self, assembly_name: str) -> dict:
+        tree = self.tree
+        shared = tree.shared.get(tree.assembly_ids[assembly_name], {})
+        return {tree.names[node]: quantity for node, quantity in shared.items()}
+
+    def digest(self, assembly_name: str) -> str:
+        return self.tree.digest(self.tree.assembly_ids[assembly_name])
+
+    def roots(self) -> list:
+        names = self.tree.names
+        return [("assembly", names[node]) for node in self.tree.top_assemblies] + [
+            ("part", names[node]) for node in self.tree.orphans
+        ]
+
+
+def build_tree(project: dict) -> CompactTree:
+    """
+    Builds the tree of a project from the format CompactStore.dump dumps it in
+
+    Parameters
+    ----------
+    project : dict
+        Dumped project
+
+    Returns
+    -------
+    CompactTree
+        Tree of the project
+    """
+
+    tree = CompactTree()
+    for part_name in project["parts"]:
+        tree.add_node(part_name, False)
+    for assembly_name in project["assemblies"]:
+        tree.add_node(assembly_name, True)
+    for parent, name, is_part, quantity in project["edges"]:
+        node = (tree.part_ids if is_part else tree.assembly_ids)[name]
+        tree.parents[node] = tree.assembly_ids[parent]
+        tree.quantities[node] = quantity
+        tree.children[tree.assembly_ids[parent]].append(node)
+    for index_name in ("orphans", "components"):
+        ids = {tree.part_ids[name]: None for name in project[index_name]}
+        setattr(tree, index_name, ids)
+    for index_name in ("top_assemblies", "subassemblies"):
+        ids = {tree.assembly_ids[name]: None for name in project[index_name]}
+        setattr(tree, index_name, ids)
+    # Snapshots taken before assemblies could be shared have none
+    for assembly_name, name, quantity in project.get("shared", []):
+        assembly = tree.assembly_ids[assembly_name]
+        node = tree.assembly_ids[name]
+        tree.shared.setdefault(assembly, {})[node] = quantity
+        tree.sharing.setdefault(node, {})[assembly] = None
+    # Versions aren't dumped, so every built assembly gets a new one
+    tree.versions = dict.fromkeys(tree.assembly_ids.values(), next(VERSION_CLOCK))
+    return tree
+
+
+class CompactStore(BaseStore):
+    """
+    Storage backend keeping every project as a CompactTree in process memory
+
+    Serves the same endpoints as MemoryStore with far less memory per node. Saved
+    projects are archived, with identical subtrees of every project stored once, and
+    loading one copies the arrays of its frozen tree, built from the archive unless it
+    was recently used.
+    """
+
+    name = "compact"
+
+    def __init__(self):
+        # Working project
+        self.tree = CompactTree()
+        # Saved projects as archived, by name
+        self.projects = {}
+        # Subtrees and name orders of every saved project, and the most recently used
+        # saved projects as frozen trees
+        self.archive = Archive()
+        # Saved variants, as their base project's name and differences, by name
+        self.variants = {}
+        # Name of the project the working tree was loaded from, and its differences
+        # from it, recorded while it is set
+        self.base, self.delta = None, []
+
+    def export_nodes(self, nodes) -> list:
+        """
+        Exports the subtrees of nodes of the working project
+
+        Parameters
+        ----------
+        nodes : iterable
+            Node ids
+
+        Returns
+        -------
+        list
+            JSON representations of the nodes and their subtrees
+        """
+
+        return [self.tree.export(node) for node in nodes]
+
+    def has_part(self, part_name: str) -> bool:
+        return part_name in self.tree.part_ids
+
+    def has_assembly(self, assembly_name: str) -> bool:
+        return assembly_name in self.tree.assembly_ids
+
+    def part_parent(self, part_name: str) -> str | None:
+        parent = self.tree.parents[self.tree.part_ids[part_name]]
+        return self.tree.names[parent] if parent >= 0 else None
+
+    def assembly_parent(self, assembly_name: str) -> str | None:
+        parent = self.tree.parents[self.tree.assembly_ids[assembly_name]]
+        return self.tree.names[parent] if parent >= 0 else None
+
+    def assembly_contains(self, assembly_name: str, kind: str, name: str) -> bool:
+        ids = self.tree.part_ids if kind == "part" else self.tree.assembly_ids
+        return self.tree.contains(self.tree.assembly_ids[assembly_name], ids[name])
+
+    def part_count(self) -> int:
+        return len(self.tree.part_ids)
+
+    def assembly_count(self) -> int:
+        return len(self.tree.assembly_ids)
+
+    def tree_depth(self) -> int:
+        # Level of every assembly reached, walking up only as far as a known level
+        parents, levels = self.tree.parents, {}
+        for node in self.tree.assembly_ids.values():
+            chain = []
+            while node != -1 and node not in levels:
+                chain.append(node)
+                node = parents[node]
+            level = levels[node] if node != -1 else 0
+            for node in reversed(chain):
+                level += 1
+                levels[node] = level
+        return max(levels.values(), default=0)
+
+    @recorded
+    def create_parts(self, part_names: list):
+        for part_name in part_names:
+            self.tree.index(self.tree.add_node(part_name, False))
+
+    @recorded
+    def delete_part(self, part_name: str):
+        tree = self.tree
+        part = tree.part_ids.pop(part_name)
+        tree.set_parent(part, -1)
+        tree.orphans.pop(part, None)
+        tree.exports.pop(part, None)
+        tree.names[part] = None
+
+    @recorded
+    def create_assembly(
+        self,
+        assembly_name: str,
+        part_names: list,
+        subassembly_names: list,
+        quantities: dict | None = None,
+    ):
+        quantities = quantities or {}
+        tree = self.tree
+        new_assembly = tree.add_node(assembly_name, True)
+        for part_name in part_names:
+            tree.set_parent(
+                tree.part_ids[part_name], new_assembly, quantities.get(part_name, 1)
+            )
+        for subassembly_name in subassembly_names:
+            tree.set_parent(
+                tree.assembly_ids[subassembly_name],
+                new_assembly,
+                quantities.get(subassembly_name, 1),
+            )
+        tree.index(new_assembly)
+
+    @recorded
+    def import_assembly(self, assembly: dict) -> dict:
+        # Walking in pre-order, so node ids of a subtree are contiguous and children
+        # keep their input order. Every node is new or an uncached orphan part, so no
+        # cached export needs invalidating
+        tree = self.tree
+        summary = {"assemblies": 0, "parts": 0, "created_parts": 0}
+        version = next(VERSION_CLOCK)
+        stack = [(assembly, -1)]
+        while stack:
+            item, parent = stack.pop()
+            children = item.get("children") or []
+            quantity = item.get("quantity", 1)
+            if children:
+                node = tree.add_node(item["id"], True, parent, quantity)
+                tree.versions[node] = version
+                summary["assemblies"] += 1
+                stack.extend((child, node) for child in reversed(children))
+            else:
+                summary["parts"] += 1
+                node = tree.part_ids.get(item["id"])
+                if node is None:
+                    node = tree.add_node(item["id"], False, parent, quantity)
+                    summary["created_parts"] += 1
+                else:
+                    tree.mark_stale(node)
+                    tree.label_orders.pop(node, None)
+                    tree.parents[node] = parent
+                    tree.quantities[node] = quantity
+                    tree.children[parent].append(node)
+            tree.index(node)
+        return summary
+
+    @recorded
+    def attach_part(self, assembly_name: str, part_name: str, quantity: int = 1):
+        self.tree.set_parent(
+            self.tree.part_ids[part_name],
+            self.tree.assembly_ids[assembly_name],
+            quantity,
+        )
+
+    @recorded
+    def detach_part(self, part_name: str):
+        self.tree.set_parent(self.tree.part_ids[part_name], -1)
+
+    def shared_subassemblies(self, assembly_name: str) -> dict:
+        tree = self.tree
+        shared = tree.shared.get(tree.assembly_ids[assembly_name], {})
+        return {tree.names[node]: quantity for node, quantity in shared.items()}
+
+    @recorded
+    def share_assembly(
+        self, assembly_name: str, subassembly_name: str, quantity: int = 1
+    ):
+        tree = self.tree
+        assembly = tree.assembly_ids[assembly_name]
+        subassembly = tree.assembly_ids[subassembly_name]
+        tree.invalidate(assembly)
+        tree.drop_chains(subassembly)
+        tree.shared.setdefault(assembly, {})[subassembly] = quantity
+        tree.sharing.setdefault(subassembly, {})[assembly] = None
+        tree.touch(assembly)
+
+    @recorded
+    def unshare_assembly(self, assembly_name: str, subassembly_name: str):
+        tree = self.tree
+        assembly = tree.assembly_ids[assembly_name]
+        subassembly = tree.assembly_ids[subassembly_name]
+        tree.invalidate(assembly)
+        tree.drop_chains(subassembly)
+        for edges, key, node in (
+            (tree.shared, assembly, subassembly),
+            (tree.sharing, subassembly, assembly),
+        ):
+            del edges[key][node]
+            if not edges[key]:
+                del edges[key]
+        tree.touch(assembly)
+
+    def explode_assembly(self, assembly_name: str) -> dict:
+        return self.tree.rollup(self.tree.assembly_ids[assembly_name])
+
+    def assembly_version(self, assembly_name: str) -> str:
+        version = self.tree.versions.get(self.tree.assembly_ids[assembly_name], 0)
+        return f"{VERSION_EPOCH}-{version}"
+
+    def export_part(self, part_name: str) -> str:
+        return self.tree.export(self.tree.part_ids[part_name])
+
+    def export_assembly(self, assembly_name: str) -> str:
+        return self.tree.export(self.tree.assembly_ids[assembly_name])
+
+    def export_parts(self) -> list:
+        return self.export_nodes(self.tree.part_ids.values())
+
+    def export_assemblies(self) -> list:
+        return self.export_nodes(self.tree.assembly_ids.values())
+
+    def iter_kind(
+        self, is_assembly: bool, after: str | None
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Lazily exports all parts or assemblies in creation order
+
+        Node ids are handed out in creation order, so resuming seeks straight to the
+        id after the named node.
+
+        Parameters
+        ----------
+        is_assembly : bool
+            True for assemblies
+        after : str, optional
+            Name of node to resume after
+
+        Yields
+        ------
+        tuple
+            Name and JSON representation of each node
+        """
+
+        tree = self.tree
+        ids = tree.assembly_ids if is_assembly else tree.part_ids
+        start = 0 if after is None else ids[after] + 1
+        for node in range(start, len(tree.names)):
+            if (
+                tree.assembly_flags[node] == is_assembly
+                and tree.names[node] is not None
+            ):
+                yield tree.names[node], tree.export(node)
+
+    def iter_subtree(
+        self, assembly_name: str, after: tuple | None, leaves: bool
+    ) -> Iterator[tuple[tuple, str]]:
+        """
+        Lazily exports the descendants of an assembly as a range of its tree's labels
+
+        The labels are read once, so later changes to the tree are only seen in the
+        exports, and nodes deleted or moved out of the assembly since are skipped.
+        Resuming seeks straight to the named descendant's label. Once anything is
+        shared, or if the tree is stale and the assembly too small a share of it to
+        relabel, the children arrays are walked instead, and resuming skips every node
+        up to the named one.
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of assembly
+        after : tuple, optional
+            Kind and name of descendant to resume after
+        leaves : bool
+            Whether to only export nodes without children
+
+        Yields
+        ------
+        tuple
+            Kind and name, and JSON representation of each node
+        """
+
+        tree = self.tree
+
+        def key(node):
+            return ("assembly" if tree.assembly_flags[node] else "part"), tree.names[
+                node
+            ]
+
+        assembly = tree.assembly_ids[assembly_name]
+        version = tree.versions.get(assembly)
+
+        def listed(node):
+            # Nodes deleted or moved out since the listing started are skipped, which
+            # only needs checking once the assembly's version moved on
+            if tree.versions.get(assembly) == version:
+                return True
+            return tree.names[node] is not None and tree.contains(assembly, node)
+
+        if after is not None:
+            kind, name = after
+            after = (tree.assembly_ids if kind == "assembly" else tree.part_ids)[name]
+        root = -1 if tree.shared else tree.scan_root(assembly)
+        if root < 0:
+            nodes = tree.walk(assembly) if tree.shared else tree.preorder(assembly)
+            if after is not None:
+                if not tree.contains(assembly, after):
+                    return
+                for node in nodes:
+                    if node == after:
+                        break
+            for node in nodes:
+                if (not leaves or not tree.children_of(node)) and listed(node):
+                    yield key(node), tree.export(node)
+            return
+        order = tree.label_orders[root]
+        start = tree.label_starts[assembly]
+        end = start + tree.label_sizes[assembly]
+        if after is not None:
+            if not tree.contains(assembly, after):
+                return
+            start = tree.label_starts[after]
+        for position in range(start + 1, end):
+            node = order[position]
+            if (not leaves or not tree.children[node]) and listed(node):
+                yield key(node), tree.export(node)
+
+    def iter_parts(self, after: str | None = None) -> Iterator[tuple[str, str]]:
+        return self.iter_kind(False, after)
+
+    def iter_assemblies(self, after: str | None = None) -> Iterator[tuple[str, str]]:
+        return self.iter_kind(True, after)
+
+    def iter_descendants(
+        self, assembly_name: str, after: tuple | None = None
+    ) -> Iterator[tuple[tuple, str]]:
+        return self.iter_subtree(assembly_name, after, False)
+
+    def iter_leaves(
+        self, assembly_name: str, after: tuple | None = None
+    ) -> Iterator[tuple[tuple, str]]:
+        return self.iter_subtree(assembly_name, after, True)
+
+    def part_where_used(self, part_name: str) -> list:
+        parent = self.tree.parents[self.tree.part_ids[part_name]]
+        return list(self.tree.chain(parent)) if parent >= 0 else []
+
+    def export_part_ancestors(self, part_name: str) -> list:
+        return self.export_nodes(self.tree.ancestors(self.tree.part_ids[part_name]))
+
+    def export_first_children(self, assembly_name: str) -> list:
+        return self.export_nodes(
+            self.tree.children_of(self.tree.assembly_ids[assembly_name])
+        )
+
+    def export_descendants(self, assembly_name: str) -> list:
+        return self.export_nodes(self.tree.walk(self.tree.assembly_ids[assembly_name]))
+
+    def export_leaves(self, assembly_name: str) -> list:
+        return self.export_nodes(
+            node
+            for node in self.tree.walk(self.tree.assembly_ids[assembly_name])
+            if not self.tree.children_of(node)
+        )
+
+    def export_top_assemblies(self) -> list:
+        return self.export_nodes(sorted(self.tree.top_assemblies))
+
+    def export_subassemblies(self) -> list:
+        return self.export_nodes(sorted(self.tree.subassemblies))
+
+    def export_components(self) -> list:
+        return self.export_nodes(sorted(self.tree.components))
+
+    def export_orphans(self) -> list:
+        return self.export_nodes(sorted(self.tree.orphans))
+
+    def has_project(self, project_name: str) -> bool:
+        return project_name in self.projects or project_name in self.variants
+
+    def project_names(self) -> list:
+        return [*self.projects, *self.variants]
+
+    def save_project(self, project_name: str):
+        # The working tree is archived, and kept as is while it is among the most
+        # recently used saved projects, never to be mutated again
+        tree = self.tree
+        names = tree.names
+        self.projects[project_name] = self.archive.archive_project(
+            CompactView(tree),
+            {
+                "parts": tree.part_ids,
+                "assemblies": tree.assembly_ids,
+                "orphans": [names[node] for node in tree.orphans],
+                "components": [names[node] for node in tree.components],
+                "subassemblies": [names[node] for node in tree.subassemblies],
+            },
+            [names[node] for node in tree.top_assemblies],
+            [
+                (names[assembly], names[node], quantity)
+                for assembly, shared in tree.shared.items()
+                for node, quantity in shared.items()
+            ],
+        )
+        self.archive.keep_hot(project_name, tree)
+        self.variants.pop(project_name, None)
+        self.tree = CompactTree()
+        self.base, self.delta = None, []
+
+    def load_project(self, project_name: str):
+        if project_name in self.variants:
+            return self.load_variant(project_name)
+        self.tree = self.saved_tree(project_name).copy()
+        self.start_delta(project_name)
+
+    def saved_tree(self, project_name: str) -> CompactTree:
+        """
+        Gets the frozen tree of a saved project, building it from the archive unless it
+        was recently used
+
+        Parameters
+        ----------
+        project_name : str
+            Name of a saved project
+
+        Returns
+        -------
+        CompactTree
+            Tree of the project, never to be mutated
+        """
+
+        return self.archive.expand(
+            project_name, self.projects[project_name], build_tree
+        )
+
+    def has_variants(self, project_name: str) -> bool:
+        return any(
+            variant["base"] == project_name for variant in self.variants.values()
+        )
+
+    def project_base(self, project_name: str) -> str | None:
+        variant = self.variants.get(project_name)
+        return variant["base"] if variant else None
+
+    def working_base(self) -> str | None:
+        return self.base
+
+    def variant_delta(self, project_name: str) -> list:
+        return self.variants[project_name]["delta"]
+
+    def start_delta(self, project_name: str | None):
+        self.base, self.delta = project_name, []
+
+    def record_delta(self, record: str):
+        if self.base is not None:
+            self.delta.append(record)
+
+    def save_variant(self, project_name: str):
+        # Only the delta is kept, and the working tree is dropped
+        self.variants[project_name] = {"base": self.base, "delta": self.delta}
+        self.projects.pop(project_name, None)
+        self.archive.drop(project_name)
+        self.tree = CompactTree()
+        self.base, self.delta = None, []
+
+    def project_views(self, project_names: list) -> contextlib.AbstractContextManager:
+        views = []
+        for project_name in project_names:
+            if project_name in self.projects:
+                tree = self.saved_tree(project_name)
+            else:
+                # Variants are loaded by a store of their own sharing the saved projects
+                store = CompactStore()
+                store.projects, store.variants = self.projects, self.variants
+                store.archive = self.archive
+                store.load_variant(project_name)
+                tree = store.tree
+            views.append(CompactView(tree))
+        return contextlib.nullcontext(views)
+
+    def dump(self) -> dict:
+        # Same format as MemoryStore.dump, so a journal can move between the two
+        def dump_project(tree):
+            names = tree.names
+            project = {
+                "parts": list(tree.part_ids),
+                "assemblies": list(tree.assembly_ids),
+                "orphans": [names[node] for node in tree.orphans],
+                "components": [names[node] for node in tree.components],
+                "top_assemblies": [names[node] for node in tree.top_assemblies],
+                "subassemblies": [names[node] for node in tree.subassemblies],
+            }
+            project["edges"] = [
+                [
+                    names[tree.parents[node]],
+                    names[node],
+                    not tree.assembly_flags[node],
+                    tree.quantities[node],
+                ]
+                for root in tree.top_assemblies
+                for node in tree.descendants(root)
+            ]
+            project["shared"] = [
+                [names[assembly], names[node], quantity]
+                for assembly, shared in tree.shared.items()
+                for node, quantity in shared.items()
+            ]
+            return project
+
+        return {
+            "working": dump_project(self.tree),
+            "projects": {
+                project_name: archived.dump()
+                for project_name, archived in self.projects.items()
+            },
+            "variants": dict(self.variants),
+            "base": self.base,
+            "delta": list(self.delta),
+        }
+
+    def restore(self, state: dict):
+        self.projects, self.archive = {}, Archive()
+        for project_name, project in state["projects"].items():
+            self.tree = build_tree(project)
+            self.save_project(project_name)
+        self.tree = build_tree(state["working"])
+        # Snapshots taken before variants could be saved have none
+        self.variants = {
+            project_name: {"base": variant["base"], "delta": list(variant["delta"])}
+            for project_name, variant in state.get("variants", {}).items()
+        }
+        self.base, self.delta = state.get("base"), list(state.get("delta", []))
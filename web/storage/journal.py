@@ -0,0 +1,263 @@
+"""
+This file contains the append-only journal and snapshots used for crash recovery
+"""
+
+import json
+import os
+import time
+from storage.base_store import BaseStore
+
+
+class Journal:
+    """
+    Append-only log of store mutations, compacted into periodic snapshots
+
+    The journal directory holds numbered log segments (journal-<n>.log) with one JSON
+    record per mutation, and snapshots (snapshot-<n>.json) of the full store state as of
+    the start of segment n. Recovery restores the newest snapshot and replays every
+    segment from its number on, so a crash during compaction loses nothing.
+    """
+
+    def __init__(self, directory: str, fsync: bool = False):
+        # Directory holding log segments and snapshots
+        self.directory = directory
+        # Whether every record is forced to disk, surviving power loss and not only
+        # process crashes
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self.segment = max(self.numbers("journal-", ".log") or [0])
+        self.file = open(self.path("journal", self.segment), "a", encoding="utf-8")
+        # Records appended since the last snapshot
+        self.pending = 0
+        self.stats = {"recovery": None, "compactions": 0, "last_compaction": None}
+
+    def numbers(self, prefix: str, suffix: str) -> list:
+        """
+        Gets the numbers of every file in the journal directory of a kind
+
+        Parameters
+        ----------
+        prefix : str
+            File name prefix
+        suffix : str
+            File name suffix
+
+        Returns
+        -------
+        list
+            Sorted file numbers
+        """
+
+        return sorted(
+            int(name[len(prefix) : -len(suffix)])
+            for name in os.listdir(self.directory)
+            if name.startswith(prefix) and name.endswith(suffix)
+        )
+
+    def path(self, kind: str, number: int) -> str:
+        """
+        Gets the path of a log segment or snapshot
+
+        Parameters
+        ----------
+        kind : str
+            journal or snapshot
+        number : int
+            Segment number
+
+        Returns
+        -------
+        str
+            File path
+        """
+
+        suffix = ".log" if kind == "journal" else ".json"
+        return os.path.join(self.directory, f"{kind}-{number}{suffix}")
+
+    def append(self, operation: str, args: tuple):
+        """
+        Appends a mutation record to the current log segment
+
+        Parameters
+        ----------
+        operation : str
+            Name of the store method applied
+        args : tuple
+            Arguments it was applied with
+
+        Returns
+        -------
+        None
+        """
+
+        self.file.write(json.dumps([operation, *args], separators=(",", ":")) + "\n")
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.pending += 1
+
+    def recover(self, store: BaseStore) -> dict:
+        """
+        Rebuilds a store from the newest snapshot and the log segments after it
+
+        Parameters
+        ----------
+        store : BaseStore
+            Empty store to rebuild
+
+        Returns
+        -------
+        dict
+            snapshot : int, optional
+                Number of the restored snapshot
+            records : int
+                Number of log records replayed
+            seconds : float
+                Time taken to recover
+        """
+
+        start = time.perf_counter()
+        snapshots = self.numbers("snapshot-", ".json")
+        snapshot = snapshots[-1] if snapshots else None
+        if snapshot is not None:
+            with open(self.path("snapshot", snapshot), encoding="utf-8") as file:
+                store.restore(json.load(file))
+        records = 0
+        for segment in self.numbers("journal-", ".log"):
+            if snapshot is not None and segment < snapshot:
+                continue
+            with open(self.path("journal", segment), "rb") as file:
+                replayed = 0
+                for line in file:
+                    # A torn last line from a crash mid-write was never acknowledged
+                    if not line.endswith(b"\n"):
+                        break
+                    operation, *args = json.loads(line)
+                    getattr(store, operation)(*args)
+                    records += 1
+                    replayed += len(line)
+            # Cutting off a torn line, so new records don't get appended to it
+            os.truncate(self.path("journal", segment), replayed)
+        self.pending = records
+        self.stats["recovery"] = {
+            "snapshot": snapshot,
+            "records": records,
+            "seconds": time.perf_counter() - start,
+        }
+        return self.stats["recovery"]
+
+    def rotate(self) -> int:
+        """
+        Starts a new log segment, so a snapshot can be taken as of its start
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        int
+            Number of the new segment
+        """
+
+        self.file.close()
+        self.segment += 1
+        self.file = open(self.path("journal", self.segment), "a", encoding="utf-8")
+        self.pending = 0
+        return self.segment
+
+    def write_snapshot(self, state: dict, segment: int):
+        """
+        Writes a snapshot as of the start of a segment and drops the files it replaces
+
+        The snapshot is written to a temporary file and renamed into place, so a crash
+        leaves either the old or the new snapshot, never a partial one.
+
+        Parameters
+        ----------
+        state : dict
+            Store state from BaseStore.dump, taken when the segment was started
+        segment : int
+            Number of the segment started with the state
+
+        Returns
+        -------
+        None
+        """
+
+        start = time.perf_counter()
+        temporary = self.path("snapshot", segment) + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(state, file, separators=(",", ":"))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path("snapshot", segment))
+        for number in self.numbers("snapshot-", ".json"):
+            if number < segment:
+                os.remove(self.path("snapshot", number))
+        for number in self.numbers("journal-", ".log"):
+            if number < segment:
+                os.remove(self.path("journal", number))
+        self.stats["compactions"] += 1
+        self.stats["last_compaction"] = {
+            "segment": segment,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def close(self):
+        """
+        Closes the current log segment
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self.file.close()
+
+
+class JournaledStore:
+    """
+    Store wrapper appending every successful mutation to a journal
+
+    Reads are passed straight through. A mutation is recorded once the store has
+    applied it and before the API acknowledges it, so every acknowledged write is
+    replayed on recovery.
+    """
+
+    # Store methods that change state
+    MUTATIONS = {
+        "create_parts",
+        "delete_part",
+        "create_assembly",
+        "import_assembly",
+        "attach_part",
+        "detach_part",
+        "share_assembly",
+        "unshare_assembly",
+        "save_project",
+        "save_variant",
+        "load_project",
+    }
+
+    def __init__(self, store: BaseStore, journal: Journal):
+        # Store to apply mutations to
+        self.store = store
+        # Journal to record mutations in
+        self.journal = journal
+
+    def __getattr__(self, attribute: str):
+        value = getattr(self.store, attribute)
+        if attribute not in self.MUTATIONS:
+            return value
+
+        def journaled(*args):
+            result = value(*args)
+            self.journal.append(attribute, args)
+            return result
+
+        return journaled
@@ -0,0 +1,1490 @@
+"""
+This file contains the in-memory AnyTree storage backend for the Bill of Materials App
+"""
+
+import contextlib
+import json
+from collections.abc import Callable, Iterable, Iterator
+from itertools import count, islice
+from operator import attrgetter
+from anytree import AnyNode, PreOrderIter
+from storage.archive import Archive
+from storage.base_store import (
+    VERSION_CLOCK,
+    VERSION_EPOCH,
+    BaseStore,
+    ProjectView,
+    recorded,
+    subtree_digest,
+)
+
+# Clock every node is stamped from when it is created, and never again, so the
+# classification indexes can be listed in creation order however often items move
+# between them
+CREATION_CLOCK = count()
+
+
+def export_node(node: AnyNode, shared_edges: Callable | None = None) -> str:
+    """
+    Exports an AnyTree node and its subtree to JSON, reusing cached subtree exports
+
+    The output matches anytree's JsonExporter(sort_keys=True). Each node keeps the JSON of
+    its subtree in its private _export_cache attribute, and a parent's JSON is stitched
+    together from its children's cached JSON, so repeated exports of an unchanged subtree
+    cost a single lookup. Shared assemblies are listed after an assembly's own children,
+    and their JSON is stitched in from the same cache by every assembly sharing them.
+
+    Parameters
+    ----------
+    node : AnyNode
+        Node to export
+    shared_edges : callable, optional
+        Function getting the (node, quantity) of every assembly a node shares
+
+    Returns
+    -------
+    str
+        JSON representation of the node and its subtree
+    """
+
+    if "_export_cache" in node.__dict__:
+        return node._export_cache
+    # Iterative post-order walk so deep trees don't hit the recursion limit
+    stack = [(node, False)]
+    while stack:
+        current, children_exported = stack.pop()
+        if "_export_cache" in current.__dict__:
+            continue
+        children = current.children
+        if shared_edges:
+            children += tuple(child for child, _ in shared_edges(current))
+        if not children_exported:
+            stack.append((current, True))
+            stack.extend((child, False) for child in children)
+            continue
+        # Attributes are copied in one step first, since the API can export a part
+        # while its store thread caches the export of a tree holding it
+        fields = {
+            key: json.dumps(value, sort_keys=True)
+            for key, value in list(current.__dict__.items())
+            if not key.startswith("_")
+        }
+        if children:
+            fields["children"] = (
+                "[" + ", ".join(child._export_cache for child in children) + "]"
+            )
+        current._export_cache = (
+            "{"
+            + ", ".join(
+                f"{json.dumps(key)}: {value}" for key, value in sorted(fields.items())
+            )
+            + "}"
+        )
+    return node._export_cache
+
+
+def rollup_node(
+    node: AnyNode, is_part: Callable, shared_edges: Callable | None = None
+) -> dict:
+    """
+    Totals the quantity of every part needed to build one of an assembly, reusing
+    cached subassembly rollups
+
+    Each assembly keeps its rollup in its private _rollup_cache attribute, and a
+    parent's rollup is summed from its children's, scaled by their quantities. A shared
+    assembly is rolled up once and reused by every assembly sharing it.
+
+    Parameters
+    ----------
+    node : AnyNode
+        Assembly node to roll up
+    is_part : callable
+        Function telling if a leaf node is a part rather than an empty assembly
+    shared_edges : callable, optional
+        Function getting the (node, quantity) of every assembly a node shares
+
+    Returns
+    -------
+    dict
+        Total quantity by part name
+    """
+
+    def edges(current):
+        result = [
+            (child, child.__dict__.get("_quantity", 1)) for child in current.children
+        ]
+        if shared_edges:
+            result += shared_edges(current)
+        return result
+
+    # Iterative post-order walk so deep trees don't hit the recursion limit
+    stack = [(node, False)]
+    while stack:
+        current, children_rolled_up = stack.pop()
+        if "_rollup_cache" in current.__dict__:
+            continue
+        if not children_rolled_up:
+            stack.append((current, True))
+            stack.extend(
+                (child, False) for child, _ in edges(current) if not is_part(child)
+            )
+            continue
+        totals = {}
+        for child, quantity in edges(current):
+            if is_part(child):
+                totals[child.id] = totals.get(child.id, 0) + quantity
+            else:
+                for part_name, count in child._rollup_cache.items():
+                    totals[part_name] = totals.get(part_name, 0) + quantity * count
+        current._rollup_cache = totals
+    return node._rollup_cache
+
+
+def digest_node(
+    node: AnyNode, is_part: Callable, shared_edges: Callable | None = None
+) -> str:
+    """
+    Hashes the subtree of an assembly, reusing cached subassembly digests
+
+    Each assembly keeps its digest in its private _digest_cache attribute, and a
+    parent's digest is hashed from its children's, so the digests of a subtree are
+    only computed again along the ancestor path of a change.
+
+    Parameters
+    ----------
+    node : AnyNode
+        Assembly node to hash
+    is_part : callable
+        Function telling if a leaf node is a part rather than an empty assembly
+    shared_edges : callable, optional
+        Function getting the (node, quantity) of every assembly a node shares
+
+    Returns
+    -------
+    str
+        Digest from subtree_digest
+    """
+
+    def shared(current):
+        return shared_edges(current) if shared_edges else []
+
+    # Iterative post-order walk so deep trees don't hit the recursion limit
+    stack = [(node, False)]
+    while stack:
+        current, children_hashed = stack.pop()
+        if "_digest_cache" in current.__dict__:
+            continue
+        if not children_hashed:
+            stack.append((current, True))
+            stack.extend(
+                (child, False) for child in current.children if not is_part(child)
+            )
+            stack.extend((child, False) for child, _ in shared(current))
+            continue
+        edges = [
+            (
+                ["part", child.id, child.__dict__.get("_quantity", 1), None]
+                if is_part(child)
+                else [
+                    "assembly",
+                    child.id,
+                    child.__dict__.get("_quantity", 1),
+                    child._digest_cache,
+                ]
+            )
+            for child in current.children
+        ]
+        edges += [
+            ["shared", child.id, quantity, child._digest_cache]
+            for child, quantity in shared(current)
+        ]
+        current._digest_cache = subtree_digest(current.id, edges)
+    return node._digest_cache
+
+
+def invalidate_caches(node: AnyNode | None, sharing: Callable | None = None):
+    """
+    Drops the cached exports, rollups and digests of a node and of everything including
+    it: its ancestors, and the assemblies sharing any of them
+
+    A node without any cache can't be included in anything with one, since exporting,
+    rolling up or hashing a node caches everything below it, so each walk stops at the
+    first uncached node.
+
+    Parameters
+    ----------
+    node : AnyNode, optional
+        Node whose subtree changed
+    sharing : callable, optional
+        Function getting the assembly nodes sharing a node
+
+    Returns
+    -------
+    None
+    """
+
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        while node is not None and (
+            "_export_cache" in node.__dict__
+            or "_rollup_cache" in node.__dict__
+            or "_digest_cache" in node.__dict__
+        ):
+            node.__dict__.pop("_export_cache", None)
+            node.__dict__.pop("_rollup_cache", None)
+            node.__dict__.pop("_digest_cache", None)
+            if sharing:
+                stack.extend(sharing(node))
+            node = node.parent
+
+
+def set_parent(
+    node: AnyNode,
+    parent: AnyNode | None,
+    quantity: int = 1,
+    sharing: Callable | None = None,
+):
+    """
+    Reparents a node, invalidating the cached exports, rollups and digests of its old
+    and new ancestors
+
+    Parameters
+    ----------
+    node : AnyNode
+        Node to reparent
+    parent : AnyNode, optional
+        New parent node, or None to detach
+    quantity : int, optional
+        Number of the node the new parent needs
+    sharing : callable, optional
+        Function getting the assembly nodes sharing a node, whose caches include it
+
+    Returns
+    -------
+    None
+    """
+
+    invalidate_caches(node.parent, sharing)
+    node.parent = parent
+    # Only kept when it isn't the default, to save a dict entry per node
+    if quantity == 1:
+        node.__dict__.pop("_quantity", None)
+    else:
+        node._quantity = quantity
+    invalidate_caches(parent, sharing)
+
+
+def by_creation(nodes: dict) -> list:
+    """
+    Function to list the nodes of an index in the order they were created
+
+    Indexes are refiled in the order items last moved, which mostly matches creation
+    order, so sorting them is close to linear.
+
+    Parameters
+    ----------
+    nodes : dict
+        Nodes by name
+
+    Returns
+    -------
+    list
+        Nodes in creation order
+    """
+
+    return sorted(nodes.values(), key=attrgetter("_created"))
+
+
+def build_project(project: dict, generation: int) -> dict:
+    """
+    Builds the nodes and indexes of a project from the format MemoryStore.dump dumps
+    it in
+
+    Parameters
+    ----------
+    project : dict
+        Dumped project
+    generation : int
+        Generation to stamp every node with
+
+    Returns
+    -------
+    dict
+        Indexes, shared assemblies and versions of the project keyed by attribute name,
+        as MemoryStore.project gets them
+    """
+
+    parts = {
+        name: AnyNode(id=name, _generation=generation, _created=next(CREATION_CLOCK))
+        for name in project["parts"]
+    }
+    assemblies = {
+        name: AnyNode(id=name, _generation=generation, _created=next(CREATION_CLOCK))
+        for name in project["assemblies"]
+    }
+    for parent, name, is_part, quantity in project["edges"]:
+        node = (parts if is_part else assemblies)[name]
+        set_parent(node, assemblies[parent], quantity)
+    built = {"parts": parts, "assemblies": assemblies}
+    for index_name in ("orphans", "components", "top_assemblies", "subassemblies"):
+        nodes = parts if index_name in ("orphans", "components") else assemblies
+        built[index_name] = {name: nodes[name] for name in project[index_name]}
+    # Snapshots taken before assemblies could be shared have none
+    built["shared"], built["sharing"] = {}, {}
+    for assembly_name, name, quantity in project.get("shared", []):
+        built["shared"].setdefault(assembly_name, {})[name] = quantity
+        built["sharing"].setdefault(name, {})[assembly_name] = None
+    # Versions aren't dumped, so every built assembly gets a new one
+    built["versions"] = dict.fromkeys(assemblies, next(VERSION_CLOCK))
+    return built
+
+
+def iter_exports(
+    nodes: Iterable[AnyNode],
+    export: Callable,
+    kind_of: Callable,
+    after: tuple | None = None,
+) -> Iterator[tuple[tuple, str]]:
+    """
+    Lazily exports parts and assemblies, resuming after the node of a kind and name
+
+    Nodes have no position to seek to, so resuming skips every node up to the named
+    one.
+
+    Parameters
+    ----------
+    nodes : iterable
+        Nodes in listing order
+    export : callable
+        Function exporting a node
+    kind_of : callable
+        Function telling if a node is a part or an assembly
+    after : tuple, optional
+        Kind and name of node to resume after
+
+    Yields
+    ------
+    tuple
+        Kind and name, and JSON representation of each node
+    """
+
+    nodes = iter(nodes)
+    if after is not None:
+        for node in nodes:
+            if (kind_of(node), node.id) == after:
+                break
+    for node in nodes:
+        yield (kind_of(node), node.id), export(node)
+
+
+class MemoryView(ProjectView):
+    """
+    Read-only view of a saved project of a MemoryStore, or of its working project
+    """
+
+    def __init__(self, project: dict):
+        # Indexes and shared assemblies of the project, as MemoryStore.project gets them
+        self.project = project
+
+    def node(self, kind: str, name: str) -> tuple | None:
+        node = self.project["parts" if kind == "part" else "assemblies"].get(name)
+        if node is None:
+            return None
+        if node.parent is None:
+            return None, 1
+        return node.parent.id, node.__dict__.get("_quantity", 1)
+
+    def is_part(self, node: AnyNode) -> bool:
+        """
+        Checks if a node of the project is a part
+
+        Parameters
+        ----------
+        node : AnyNode
+            Node of the project
+
+        Returns
+        -------
+        bool
+            True if the node is a part
+        """
+
+        return self.project["parts"].get(node.id) is node
+
+    def children(self, assembly_name: str) -> list:
+        return [
+            ("part" if self.is_part(child) else "assembly", child.id)
+            for child in self.project["assemblies"][assembly_name].children
+        ]
+
+    def shared(self, assembly_name: str) -> dict:
+        return dict(self.project["shared"].get(assembly_name, {}))
+
+    def shared_edges(self, node: AnyNode) -> list:
+        """
+        Gets the assemblies an assembly of the project shares
+
+        Parameters
+        ----------
+        node : AnyNode
+            Assembly node of the project
+
+        Returns
+        -------
+        list
+            (node, quantity) of every shared assembly, in the order they were shared
+        """
+
+        assemblies = self.project["assemblies"]
+        return [
+            (assemblies[name], quantity)
+            for name, quantity in self.project["shared"].get(node.id, {}).items()
+        ]
+
+    def digest(self, assembly_name: str) -> str:
+        return digest_node(
+            self.project["assemblies"][assembly_name],
+            self.is_part,
+            self.shared_edges if self.project["shared"] else None,
+        )
+
+    def roots(self) -> list:
+        return [("assembly", name) for name in self.project["top_assemblies"]] + [
+            ("part", name) for name in self.project["orphans"]
+        ]
+
+
+class MemoryStore(BaseStore):
+    """
+    Storage backend keeping every part and assembly as an AnyTree node in process memory
+
+    Orphan, component, top-level and subassembly indexes are kept in step with every
+    parent change, so the listing endpoints cost O(result size). Dicts are used as
+    insertion-ordered sets of name -> AnyTree node.
+
+    An AnyTree node has a single parent, so shared assemblies are kept by name beside
+    the trees. Every assembly sharing another, and everything it is below, belongs to
+    the working generation, so caches that follow shared assemblies never end up on
+    nodes of saved projects.
+
+    Saved projects are archived, with identical subtrees of every project stored once,
+    and only the most recently used are kept as snapshots. Other projects are built
+    back into a snapshot of frozen nodes when loaded, in time linear in their nodes.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        # Key-Value pairs of all part names with their corresponding AnyTree nodes
+        self.parts = {}
+        # Key-Value pairs of all assembly names with their corresponding AnyTree nodes
+        self.assemblies = {}
+        # Parts without parents or children
+        self.orphans = {}
+        # Parts included in a parent assembly
+        self.components = {}
+        # Assemblies that are not children of another assembly
+        self.top_assemblies = {}
+        # Assemblies that are children of another assembly
+        self.subassemblies = {}
+        # Assemblies each assembly shares besides its own children, as name -> quantity
+        # by the sharing assembly's name. Inner dicts are replaced rather than mutated,
+        # since saved projects share them
+        self.shared = {}
+        # Names of the assemblies sharing each shared assembly, by its name
+        self.sharing = {}
+        # Clock value of the last change below each assembly, by its name
+        self.versions = {}
+        # Cached distance by name of every assembly each chained assembly of the
+        # working project is below, and of itself at 0, farthest first, by its name
+        self.chains = {}
+        # Saved projects as archived, by name
+        self.projects = {}
+        # Subtrees and name orders of every saved project, and the most recently used
+        # saved projects as snapshots
+        self.archive = Archive()
+        # Saved variants, as their base project's name and differences, by name
+        self.variants = {}
+        # Name of the project the working project was loaded from, and its differences
+        # from it, recorded while it is set
+        self.base, self.delta = None, []
+        # Generation of the working project. Nodes stamped with an older generation
+        # belong to saved projects, which are immutable snapshots shared by every load
+        self.generation = 0
+
+    def new_node(self, name: str) -> AnyNode:
+        """
+        Creates a writable AnyTree node in the working project
+
+        Parameters
+        ----------
+        name : str
+            Name of part or assembly
+
+        Returns
+        -------
+        AnyNode
+            New node stamped with the current generation
+        """
+
+        return AnyNode(
+            id=name, _generation=self.generation, _created=next(CREATION_CLOCK)
+        )
+
+    def thaw(self, node: AnyNode) -> AnyNode:
+        """
+        Returns a writable version of a node, copying it out of a saved snapshot on
+        first write
+
+        Only the path from the node up to the root is copied. Every writable node's
+        ancestors are writable, so parent links walked up from them are always current.
+        The untouched children of the copies stay shared with the snapshot, and keep
+        their parent links into it, so parents of frozen nodes are looked up by name
+        with parent_of. The working project's parts, assemblies and indexes are
+        repointed at the copies, so callers must look nodes up again after thawing.
+
+        Parameters
+        ----------
+        node : AnyNode
+            Node about to be mutated
+
+        Returns
+        -------
+        AnyNode
+            Writable node to mutate in place of the given one
+        """
+
+        if node._generation == self.generation:
+            return node
+        # Frozen nodes from the node up to its first writable ancestor
+        path = []
+        parent = node
+        while parent is not None and parent._generation != self.generation:
+            path.append(parent)
+            parent = self.parent_of(parent)
+        indexes = self.indexes().values()
+        for old in reversed(path):
+            attrs = {
+                key: value
+                for key, value in old.__dict__.items()
+                if not key.startswith("_NodeMixin__")
+            }
+            attrs["_generation"] = self.generation
+            new = AnyNode(**attrs)
+            # Linked in place of the old node directly, since setting parents through
+            # anytree would relink the shared children and reorder the siblings
+            new._NodeMixin__children = list(old.children)
+            if parent is not None:
+                siblings = list(parent.children)
+                siblings[siblings.index(old)] = new
+                parent._NodeMixin__children = siblings
+                new._NodeMixin__parent = parent
+            for index in indexes:
+                if index.get(old.id) is old:
+                    index[old.id] = new
+            parent = new
+        return parent
+
+    def parent_of(self, node: AnyNode) -> AnyNode | None:
+        """
+        Gets the parent of a node of the working project
+
+        A frozen node's parent link can point at the saved version of a parent thawed
+        since, but the parent's name still holds, so the parent is looked up by it.
+
+        Parameters
+        ----------
+        node : AnyNode
+            Node of the working project
+
+        Returns
+        -------
+        AnyNode, optional
+            Parent assembly node, or None for roots
+        """
+
+        parent = node.parent
+        if parent is None or parent._generation == self.generation:
+            return parent
+        return self.assemblies[parent.id]
+
+    def indexes(self) -> dict:
+        """
+        Gets every name -> node dict making up the working project
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            Dicts of the working project keyed by attribute name
+        """
+
+        return {
+            "parts": self.parts,
+            "assemblies": self.assemblies,
+            "orphans": self.orphans,
+            "components": self.components,
+            "top_assemblies": self.top_assemblies,
+            "subassemblies": self.subassemblies,
+        }
+
+    def project(self) -> dict:
+        """
+        Gets every dict making up the working project, as saved
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            Indexes, shared assemblies and versions of the working project keyed by
+            attribute name
+        """
+
+        return {
+            **self.indexes(),
+            "shared": self.shared,
+            "sharing": self.sharing,
+            "versions": self.versions,
+        }
+
+    def shared_edges(self, node: AnyNode) -> list:
+        """
+        Gets the assemblies an assembly of the working project shares
+
+        Parameters
+        ----------
+        node : AnyNode
+            Node of the working project
+
+        Returns
+        -------
+        list
+            (node, quantity) of every shared assembly, in the order they were shared
+        """
+
+        shared = self.shared.get(node.id)
+        if not shared or self.assemblies.get(node.id) is not node:
+            return []
+        return [(self.assemblies[name], quantity) for name, quantity in shared.items()]
+
+    def sharing_nodes(self, node: AnyNode) -> list:
+        """
+        Gets the assemblies of the working project sharing an assembly
+
+        Parameters
+        ----------
+        node : AnyNode
+            Node of the working project
+
+        Returns
+        -------
+        list
+            Nodes of the sharing assemblies
+        """
+
+        sharing = self.sharing.get(node.id)
+        if not sharing or self.assemblies.get(node.id) is not node:
+            return []
+        return [self.assemblies[name] for name in sharing]
+
+    def children_of(self, node: AnyNode) -> tuple:
+        """
+        Gets the children of a node followed by the assemblies it shares
+
+        Parameters
+        ----------
+        node : AnyNode
+            Node of the working project
+
+        Returns
+        -------
+        tuple
+            Child nodes
+        """
+
+        return node.children + tuple(child for child, _ in self.shared_edges(node))
+
+    def export(self, node: AnyNode) -> str:
+        """
+        Exports a node of the working project, following shared assemblies
+
+        Parameters
+        ----------
+        node : AnyNode
+            Node to export
+
+        Returns
+        -------
+        str
+            JSON representation of the node and everything below it
+        """
+
+        return export_node(node, self.shared_edges if self.shared else None)
+
+    def reparent(self, node: AnyNode, parent: AnyNode | None, quantity: int = 1):
+        """
+        Reparents a node of the working project, invalidating the caches of everything
+        including its old and new parents
+
+        Parameters
+        ----------
+        node : AnyNode
+            Writable node to reparent
+        parent : AnyNode, optional
+            New parent node, or None to detach
+        quantity : int, optional
+            Number of the node the new parent needs
+
+        Returns
+        -------
+        None
+        """
+
+        if self.chains and self.assemblies.get(node.id) is node:
+            self.drop_chains(node)
+        old_parent = node.parent
+        set_parent(node, parent, quantity, self.sharing_nodes if self.sharing else None)
+        self.touch(old_parent)
+        self.touch(parent)
+
+    def touch(self, node: AnyNode | None):
+        """
+        Stamps an assembly whose subtree changed, everything including it and every
+        assembly sharing any of them with a new version
+
+        Parameters
+        ----------
+        node : AnyNode, optional
+            Assembly node of the working project
+
+        Returns
+        -------
+        None
+        """
+
+        version = next(VERSION_CLOCK)
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            # Assemblies reached twice through shared assemblies are stamped once
+            while node is not None and self.versions.get(node.id) != version:
+                self.versions[node.id] = version
+                if self.sharing:
+                    stack.extend(self.sharing_nodes(node))
+                node = node.parent
+
+    def drop_chains(self, node: AnyNode):
+        """
+        Drops the cached ancestor chains of an assembly and of every assembly below it,
+        before its parents change
+
+        An assembly is only chained after everything it is below, so each walk stops
+        at the first unchained assembly.
+
+        Parameters
+        ----------
+        node : AnyNode
+            Assembly node of the working project
+
+        Returns
+        -------
+        None
+        """
+
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if self.chains.pop(node.id, None) is not None:
+                stack.extend(self.children_of(node))
+
+    def chain(self, node: AnyNode) -> dict:
+        """
+        Gets every assembly an assembly is below, reusing cached chains
+
+        Each assembly's chain is built from the chains of its parent and of the
+        assemblies sharing it, and cached until one of them moves, so a where-used
+        lookup doesn't walk up the tree again.
+
+        Parameters
+        ----------
+        node : AnyNode
+            Assembly node of the working project
+
+        Returns
+        -------
+        dict
+            Distance by name of every assembly the assembly is below, and of itself at
+            0, ordered like ancestors_of. Callers must not mutate it, since it is cached
+        """
+
+        stack = [node]
+        while stack:
+            current = stack[-1]
+            if current.id in self.chains:
+                stack.pop()
+                continue
+            parents = [
+                parent
+                for parent in (self.parent_of(current), *self.sharing_nodes(current))
+                if parent is not None
+            ]
+            unchained = [parent for parent in parents if parent.id not in self.chains]
+            if unchained:
+                stack.extend(unchained)
+                continue
+            stack.pop()
+            if len(parents) == 1:
+                # A single parent's chain is already in order
+                chain = {
+                    name: distance + 1
+                    for name, distance in self.chains[parents[0].id].items()
+                }
+            else:
+                distances = {}
+                for parent in parents:
+                    for name, distance in self.chains[parent.id].items():
+                        if name not in distances or distance + 1 < distances[name]:
+                            distances[name] = distance + 1
+                chain = {
+                    name: distances[name]
+                    for name in sorted(
+                        distances, key=lambda name: (-distances[name], name)
+                    )
+                }
+            chain[current.id] = 0
+            self.chains[current.id] = chain
+        return self.chains[node.id]
+
+    def walk(self, node: AnyNode) -> Iterator[AnyNode]:
+        """
+        Iterates over every node below a node in pre-order, following shared
+        assemblies and visiting each of them once
+
+        Parameters
+        ----------
+        node : AnyNode
+            Node of the working project
+
+        Yields
+        ------
+        AnyNode
+            Nodes below the node
+        """
+
+        if not self.shared:
+            yield from islice(PreOrderIter(node), 1, None)
+            return
+        # Only shared assemblies can be reached twice, or lead back to the node
+        seen = {id(node)}
+        stack = list(reversed(self.children_of(node)))
+        while stack:
+            current = stack.pop()
+            if current.id in self.sharing:
+                if id(current) in seen:
+                    continue
+                seen.add(id(current))
+            yield current
+            stack.extend(reversed(self.children_of(current)))
+
+    def ancestors_of(self, node: AnyNode) -> list:
+        """
+        Gets every assembly a node is below, following shared assemblies up to every
+        assembly sharing them
+
+        Parameters
+        ----------
+        node : AnyNode
+            Node of the working project
+
+        Returns
+        -------
+        list
+            Assembly nodes, farthest first, then by name
+        """
+
+        if not self.sharing:
+            ancestors = []
+            parent = self.parent_of(node)
+            while parent is not None:
+                ancestors.append(parent)
+                parent = self.parent_of(parent)
+            return ancestors[::-1]
+        # Breadth-first, so each ancestor is found at its shortest distance
+        found = {}
+        level = [node]
+        distance = 0
+        while level:
+            distance += 1
+            parents = []
+            for current in level:
+                for parent in (self.parent_of(current), *self.sharing_nodes(current)):
+                    if parent is not None and id(parent) not in found:
+                        found[id(parent)] = (-distance, parent.id, parent)
+                        parents.append(parent)
+            level = parents
+        return [
+            parent for *_, parent in sorted(found.values(), key=lambda item: item[:2])
+        ]
+
+    def index_part(self, part: AnyNode):
+        """
+        Files a part under the orphan or component index based on its current parent
+
+        Parameters
+        ----------
+        part : AnyNode
+            Part node whose parent just changed
+
+        Returns
+        -------
+        None
+        """
+
+        self.orphans.pop(part.id, None)
+        self.components.pop(part.id, None)
+        if part.parent:
+            self.components[part.id] = part
+        elif not part.children:
+            self.orphans[part.id] = part
+
+    def index_assembly(self, assembly: AnyNode):
+        """
+        Files an assembly under the top-level or subassembly index based on its parent
+
+        Parameters
+        ----------
+        assembly : AnyNode
+            Assembly node whose parent just changed
+
+        Returns
+        -------
+        None
+        """
+
+        self.top_assemblies.pop(assembly.id, None)
+        self.subassemblies.pop(assembly.id, None)
+        if assembly.parent:
+            self.subassemblies[assembly.id] = assembly
+        else:
+            self.top_assemblies[assembly.id] = assembly
+
+    def has_part(self, part_name: str) -> bool:
+        return part_name in self.parts
+
+    def has_assembly(self, assembly_name: str) -> bool:
+        return assembly_name in self.assemblies
+
+    def part_parent(self, part_name: str) -> str | None:
+        parent = self.parts[part_name].parent
+        return parent.id if parent else None
+
+    def assembly_parent(self, assembly_name: str) -> str | None:
+        parent = self.assemblies[assembly_name].parent
+        return parent.id if parent else None
+
+    def assembly_contains(self, assembly_name: str, kind: str, name: str) -> bool:
+        node = (self.parts if kind == "part" else self.assemblies)[name]
+        return self.assemblies[assembly_name] in self.ancestors_of(node)
+
+    def part_count(self) -> int:
+        return len(self.parts)
+
+    def assembly_count(self) -> int:
+        return len(self.assemblies)
+
+    def tree_depth(self) -> int:
+        # Level of every assembly reached, walking up only as far as a known level
+        levels = {}
+        for node in self.assemblies.values():
+            chain = []
+            while node is not None and node.id not in levels:
+                chain.append(node.id)
+                node = self.parent_of(node)
+            level = levels[node.id] if node is not None else 0
+            for assembly_name in reversed(chain):
+                level += 1
+                levels[assembly_name] = level
+        return max(levels.values(), default=0)
+
+    @recorded
+    def create_parts(self, part_names: list):
+        for part_name in part_names:
+            self.parts[part_name] = self.new_node(part_name)
+            self.index_part(self.parts[part_name])
+
+    @recorded
+    def delete_part(self, part_name: str):
+        self.reparent(self.thaw(self.parts[part_name]), None)
+        del self.parts[part_name]
+        self.orphans.pop(part_name, None)
+        self.components.pop(part_name, None)
+
+    @recorded
+    def create_assembly(
+        self,
+        assembly_name: str,
+        part_names: list,
+        subassembly_names: list,
+        quantities: dict | None = None,
+    ):
+        quantities = quantities or {}
+        new_assembly = self.new_node(assembly_name)
+        # Attaching child parts to new assembly
+        for part_name in part_names:
+            self.reparent(
+                self.thaw(self.parts[part_name]),
+                new_assembly,
+                quantities.get(part_name, 1),
+            )
+            self.index_part(self.parts[part_name])
+        # Attaching child assemblies to new assembly
+        for subassembly_name in subassembly_names:
+            self.reparent(
+                self.thaw(self.assemblies[subassembly_name]),
+                new_assembly,
+                quantities.get(subassembly_name, 1),
+            )
+            self.index_assembly(self.assemblies[subassembly_name])
+        self.assemblies[assembly_name] = new_assembly
+        self.index_assembly(new_assembly)
+
+    @recorded
+    def import_assembly(self, assembly: dict) -> dict:
+        # Building bottom-up, so each attach only checks its new parent for loops and
+        # nothing is exported until the whole tree exists
+        summary = {"assemblies": 0, "parts": 0, "created_parts": 0}
+        stack = [(assembly, False)]
+        nodes = []
+        while stack:
+            item, children_built = stack.pop()
+            children = item.get("children") or []
+            if not children:
+                if item["id"] not in self.parts:
+                    self.parts[item["id"]] = self.new_node(item["id"])
+                    summary["created_parts"] += 1
+                summary["parts"] += 1
+                nodes.append(self.thaw(self.parts[item["id"]]))
+            elif not children_built:
+                stack.append((item, True))
+                stack.extend((child, False) for child in reversed(children))
+            else:
+                new_assembly = self.new_node(item["id"])
+                child_nodes = nodes[len(nodes) - len(children) :]
+                del nodes[len(nodes) - len(children) :]
+                for child, child_item in zip(child_nodes, children):
+                    self.reparent(child, new_assembly, child_item.get("quantity", 1))
+                    if child.children:
+                        self.index_assembly(child)
+                    else:
+                        self.index_part(child)
+                self.assemblies[item["id"]] = new_assembly
+                summary["assemblies"] += 1
+                nodes.append(new_assembly)
+        self.index_assembly(nodes[0])
+        return summary
+
+    @recorded
+    def attach_part(self, assembly_name: str, part_name: str, quantity: int = 1):
+        self.thaw(self.assemblies[assembly_name])
+        self.reparent(
+            self.thaw(self.parts[part_name]), self.assemblies[assembly_name], quantity
+        )
+        self.index_part(self.parts[part_name])
+
+    @recorded
+    def detach_part(self, part_name: str):
+        self.reparent(self.thaw(self.parts[part_name]), None)
+        self.index_part(self.parts[part_name])
+
+    def shared_subassemblies(self, assembly_name: str) -> dict:
+        return dict(self.shared.get(assembly_name, {}))
+
+    @recorded
+    def share_assembly(
+        self, assembly_name: str, subassembly_name: str, quantity: int = 1
+    ):
+        invalidate_caches(self.thaw(self.assemblies[assembly_name]), self.sharing_nodes)
+        self.drop_chains(self.assemblies[subassembly_name])
+        shared = self.shared.get(assembly_name, {})
+        self.shared[assembly_name] = {**shared, subassembly_name: quantity}
+        sharing = self.sharing.get(subassembly_name, {})
+        self.sharing[subassembly_name] = {**sharing, assembly_name: None}
+        self.touch(self.assemblies[assembly_name])
+
+    @recorded
+    def unshare_assembly(self, assembly_name: str, subassembly_name: str):
+        invalidate_caches(self.thaw(self.assemblies[assembly_name]), self.sharing_nodes)
+        self.drop_chains(self.assemblies[subassembly_name])
+        for edges, key, name in (
+            (self.shared, assembly_name, subassembly_name),
+            (self.sharing, subassembly_name, assembly_name),
+        ):
+            remaining = {
+                other: value for other, value in edges[key].items() if other != name
+            }
+            if remaining:
+                edges[key] = remaining
+            else:
+                del edges[key]
+        self.touch(self.assemblies[assembly_name])
+
+    def explode_assembly(self, assembly_name: str) -> dict:
+        def is_part(node):
+            return self.parts.get(node.id) is node
+
+        return rollup_node(
+            self.assemblies[assembly_name],
+            is_part,
+            self.shared_edges if self.shared else None,
+        )
+
+    def assembly_version(self, assembly_name: str) -> str:
+        return f"{VERSION_EPOCH}-{self.versions.get(assembly_name, 0)}"
+
+    def export_part(self, part_name: str) -> str:
+        return self.export(self.parts[part_name])
+
+    def export_assembly(self, assembly_name: str) -> str:
+        return self.export(self.assemblies[assembly_name])
+
+    def export_parts(self) -> list:
+        return [self.export(item) for item in self.parts.values()]
+
+    def export_assemblies(self) -> list:
+        return [self.export(item) for item in self.assemblies.values()]
+
+    def iter_kind(
+        self, index_name: str, after: str | None
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Lazily exports all parts or assemblies in creation order
+
+        Indexes are kept in creation order, so the index itself is walked, keeping
+        only the creation stamp of the last node exported. A listing read a chunk at a
+        time is never cut short by mutations between chunks: once the index changes
+        size or is replaced by a load, it is walked again past that stamp, so nodes
+        deleted since are skipped, and nodes created since are left out.
+
+        Parameters
+        ----------
+        index_name : str
+            parts or assemblies
+        after : str, optional
+            Name of node to resume after
+
+        Yields
+        ------
+        tuple
+            Name and JSON representation of each node
+        """
+
+        index = getattr(self, index_name)
+        last = -1 if after is None else index[after]._created
+        # Stamped after every node listed, and before any node created since
+        end = next(CREATION_CLOCK)
+        nodes = iter(index.values())
+        while True:
+            if getattr(self, index_name) is not index:
+                # Replaced by a load since the last chunk
+                index = getattr(self, index_name)
+                nodes = iter(index.values())
+            try:
+                node = next(nodes)
+            except StopIteration:
+                return
+            except RuntimeError:
+                # Changed size since the last chunk
+                nodes = iter(index.values())
+                continue
+            if last < node._created < end:
+                last = node._created
+                yield node.id, self.export(node)
+
+    def kind_of(self, node: AnyNode) -> str:
+        """
+        Tells if a node of the working project is a part or an assembly
+
+        Parameters
+        ----------
+        node : AnyNode
+            Node of the working project
+
+        Returns
+        -------
+        str
+            part or assembly
+        """
+
+        return "part" if self.parts.get(node.id) is node else "assembly"
+
+    def iter_parts(self, after: str | None = None) -> Iterator[tuple[str, str]]:
+        return self.iter_kind("parts", after)
+
+    def iter_assemblies(self, after: str | None = None) -> Iterator[tuple[str, str]]:
+        return self.iter_kind("assemblies", after)
+
+    def walk_current(self, assembly_name: str) -> Iterator[AnyNode]:
+        """
+        Iterates over every node below an assembly like walk, skipping nodes deleted
+        or moved out of it since the walk started
+
+        The walk carries on over the nodes it started from, which a thaw replaces with
+        copies, so once the assembly's version moves on each node is looked up again
+        by name and creation stamp, and the current copy is yielded.
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of assembly
+
+        Yields
+        ------
+        AnyNode
+            Current nodes below the assembly
+        """
+
+        version = self.versions.get(assembly_name)
+        for node in self.walk(self.assemblies[assembly_name]):
+            if self.versions.get(assembly_name) == version:
+                yield node
+                continue
+            for index in (self.parts, self.assemblies):
+                current = index.get(node.id)
+                if current is not None and current._created == node._created:
+                    if self.assemblies[assembly_name] in self.ancestors_of(current):
+                        yield current
+                    break
+
+    def iter_descendants(
+        self, assembly_name: str, after: tuple | None = None
+    ) -> Iterator[tuple[tuple, str]]:
+        return iter_exports(
+            self.walk_current(assembly_name), self.export, self.kind_of, after
+        )
+
+    def iter_leaves(
+        self, assembly_name: str, after: tuple | None = None
+    ) -> Iterator[tuple[tuple, str]]:
+        leaves = (
+            node
+            for node in self.walk_current(assembly_name)
+            if not self.children_of(node)
+        )
+        return iter_exports(leaves, self.export, self.kind_of, after)
+
+    def part_where_used(self, part_name: str) -> list:
+        parent = self.parent_of(self.parts[part_name])
+        return list(self.chain(parent)) if parent else []
+
+    def export_part_ancestors(self, part_name: str) -> list:
+        return [self.export(item) for item in self.ancestors_of(self.parts[part_name])]
+
+    def export_first_children(self, assembly_name: str) -> list:
+        return [
+            self.export(item)
+            for item in self.children_of(self.assemblies[assembly_name])
+        ]
+
+    def export_descendants(self, assembly_name: str) -> list:
+        return [self.export(item) for item in self.walk(self.assemblies[assembly_name])]
+
+    def export_leaves(self, assembly_name: str) -> list:
+        assembly = self.assemblies[assembly_name]
+        if not self.shared:
+            return [export_node(item) for item in assembly.leaves]
+        return [
+            self.export(item)
+            for item in self.walk(assembly)
+            if not self.children_of(item)
+        ]
+
+    def export_top_assemblies(self) -> list:
+        return [self.export(item) for item in by_creation(self.top_assemblies)]
+
+    def export_subassemblies(self) -> list:
+        return [self.export(item) for item in by_creation(self.subassemblies)]
+
+    def export_components(self) -> list:
+        return [self.export(item) for item in by_creation(self.components)]
+
+    def export_orphans(self) -> list:
+        return [self.export(item) for item in by_creation(self.orphans)]
+
+    def has_project(self, project_name: str) -> bool:
+        return project_name in self.projects or project_name in self.variants
+
+    def project_names(self) -> list:
+        return [*self.projects, *self.variants]
+
+    def save_project(self, project_name: str):
+        # Saving assembly project as an immutable snapshot. Moving to a new generation
+        # freezes every saved node without visiting it. The snapshot is archived, and
+        # only kept itself while it is among the most recently used
+        project = self.project()
+        self.projects[project_name] = self.archive.archive_project(
+            MemoryView(project),
+            project,
+            project["top_assemblies"],
+            [
+                (assembly_name, name, quantity)
+                for assembly_name, shared in project["shared"].items()
+                for name, quantity in shared.items()
+            ],
+        )
+        self.archive.keep_hot(project_name, project)
+        self.variants.pop(project_name, None)
+        self.base, self.delta = None, []
+        self.generation += 1
+        self.parts, self.assemblies = {}, {}
+        self.orphans, self.components = {}, {}
+        self.top_assemblies, self.subassemblies = {}, {}
+        self.shared, self.sharing = {}, {}
+        self.versions, self.chains = {}, {}
+
+    def load_project(self, project_name: str):
+        if project_name in self.variants:
+            return self.load_variant(project_name)
+        # Sharing the saved snapshot's nodes with a new generation, so only the paths
+        # to the nodes that get mutated are ever copied
+        self.generation += 1
+        self.chains = {}
+        for index_name, index in self.snapshot(project_name).items():
+            setattr(self, index_name, dict(index))
+        for assembly_name in self.shared:
+            self.thaw(self.assemblies[assembly_name])
+        self.start_delta(project_name)
+
+    def snapshot(self, project_name: str) -> dict:
+        """
+        Gets a saved project as an immutable snapshot, building it from the archive
+        unless it was recently used
+
+        Parameters
+        ----------
+        project_name : str
+            Name of a saved project
+
+        Returns
+        -------
+        dict
+            Indexes, shared assemblies and versions of the project keyed by attribute
+            name, as project gets them
+        """
+
+        # Built nodes are stamped with a generation no working project ever has, so
+        # they are frozen like every other saved node
+        return self.archive.expand(
+            project_name,
+            self.projects[project_name],
+            lambda project: build_project(project, -1),
+        )
+
+    def has_variants(self, project_name: str) -> bool:
+        return any(
+            variant["base"] == project_name for variant in self.variants.values()
+        )
+
+    def project_base(self, project_name: str) -> str | None:
+        variant = self.variants.get(project_name)
+        return variant["base"] if variant else None
+
+    def working_base(self) -> str | None:
+        return self.base
+
+    def variant_delta(self, project_name: str) -> list:
+        return self.variants[project_name]["delta"]
+
+    def start_delta(self, project_name: str | None):
+        self.base, self.delta = project_name, []
+
+    def record_delta(self, record: str):
+        if self.base is not None:
+            self.delta.append(record)
+
+    def save_variant(self, project_name: str):
+        # Clearing the working project as a save does, then keeping only its delta
+        variant = {"base": self.base, "delta": self.delta}
+        self.save_project(project_name)
+        del self.projects[project_name]
+        self.archive.drop(project_name)
+        self.variants[project_name] = variant
+
+    def project_views(self, project_names: list) -> contextlib.AbstractContextManager:
+        views = []
+        for project_name in project_names:
+            if project_name in self.projects:
+                project = self.snapshot(project_name)
+            else:
+                # Variants are loaded by a store of their own sharing the saved
+                # projects, on a generation of its own so it copies what it changes
+                store = MemoryStore()
+                store.projects, store.variants = self.projects, self.variants
+                store.archive = self.archive
+                store.generation = self.generation
+                store.load_variant(project_name)
+                project = store.project()
+            views.append(MemoryView(project))
+        return contextlib.nullcontext(views)
+
+    def dump(self) -> dict:
+        # Each project is dumped as the names in every index, keeping their order, its
+        # parent links in pre-order, keeping the order of children, and its shared
+        # assemblies in the order they were shared. Saved projects are expanded from the
+        # archive into the same format
+        def dump_project(saved):
+            indexes = {index_name: saved[index_name] for index_name in self.indexes()}
+            project = {index_name: list(index) for index_name, index in indexes.items()}
+            project["edges"] = [
+                [
+                    node.parent.id,
+                    node.id,
+                    indexes["parts"].get(node.id) is node,
+                    node.__dict__.get("_quantity", 1),
+                ]
+                for root in indexes["top_assemblies"].values()
+                for node in PreOrderIter(root)
+                if node.parent
+            ]
+            project["shared"] = [
+                [assembly_name, name, quantity]
+                for assembly_name, shared in saved["shared"].items()
+                for name, quantity in shared.items()
+            ]
+            return project
+
+        return {
+            "working": dump_project(self.project()),
+            "projects": {
+                project_name: archived.dump()
+                for project_name, archived in self.projects.items()
+            },
+            "variants": dict(self.variants),
+            "base": self.base,
+            "delta": list(self.delta),
+        }
+
+    def restore(self, state: dict):
+        def restore_project(project):
+            self.generation += 1
+            self.chains = {}
+            for index_name, index in build_project(project, self.generation).items():
+                setattr(self, index_name, index)
+
+        self.projects, self.archive = {}, Archive()
+        for project_name, project in state["projects"].items():
+            restore_project(project)
+            self.save_project(project_name)
+        restore_project(state["working"])
+        # Snapshots taken before variants could be saved have none
+        self.variants = {
+            project_name: {"base": variant["base"], "delta": list(variant["delta"])}
+            for project_name, variant in state.get("variants", {}).items()
+        }
+        self.base, self.delta = state.get("base"), list(state.get("delta", []))
@@ -0,0 +1,1343 @@
+"""
+This file contains the SQLite storage backend for the Bill of Materials App
+"""
+
+import collections
+import contextlib
+import copy
+import json
+import sqlite3
+from collections.abc import Iterator, MutableMapping
+from storage.base_store import BaseStore, ProjectView, recorded, subtree_digest
+
+
+# Name of the working project in the node table. Saved projects use their own names,
+# which can't be empty or contain a slash since they come from a URL path segment
+WORKING_PROJECT = ""
+
+# Number of rows read per query by lazy listings, so no statement stays open between
+# the items they yield
+BATCH_SIZE = 1000
+
+# Number of subtree digests a store caches before dropping them all
+DIGEST_CACHE_SIZE = 100000
+
+# Number of assembly rollups a store caches before dropping them all
+ROLLUP_CACHE_SIZE = 1000
+
+# Seconds a connection waits for another process to release the write lock before
+# failing
+BUSY_TIMEOUT = 30
+
+# Database files whose ETag epoch this process has drawn. Each process draws one when
+# it first opens a database, and stores it opens later for live projects keep it
+EPOCH_DRAWN = set()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS node (
+    project TEXT NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('part', 'assembly')),
+    name TEXT NOT NULL,
+    parent TEXT,
+    quantity INTEGER NOT NULL DEFAULT 1,
+    seq INTEGER NOT NULL,
+    created INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (project, kind, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS node_parent ON node (project, parent, seq);
+CREATE INDEX IF NOT EXISTS node_kind_parent ON node (project, kind, parent, seq);
+CREATE INDEX IF NOT EXISTS node_created ON node (project, kind, created);
+CREATE TABLE IF NOT EXISTS project (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS shared (
+    project TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    child TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 1,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (project, parent, child)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS shared_child ON shared (project, child);
+CREATE TABLE IF NOT EXISTS counter (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS overlay (project TEXT PRIMARY KEY, base TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS overlay_base ON overlay (base);
+CREATE TABLE IF NOT EXISTS delta (
+    project TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (project, seq)
+) WITHOUT ROWID;
+"""
+
+# Walks from the rows selected by {roots} down through every assembly and the
+# assemblies it shares. UNION drops the rows of subtrees nested in other selected
+# subtrees, and of shared assemblies reached more than once, so each node is fetched
+# once per parent
+SUBTREE_QUERY = """
+WITH RECURSIVE subtree (kind, name, parent, seq, shared) AS (
+    SELECT kind, name, parent, seq, 0 FROM node WHERE project = :project AND {roots}
+    UNION
+    SELECT n.kind, n.name, n.parent, n.seq, 0
+    FROM node n JOIN subtree s
+    ON s.kind = 'assembly' AND n.project = :project AND n.parent = s.name
+    UNION
+    SELECT 'assembly', sh.child, sh.parent, sh.seq, 1
+    FROM shared sh JOIN subtree s
+    ON s.kind = 'assembly' AND sh.project = :project AND sh.parent = s.name
+)
+SELECT kind, name, parent, seq, shared FROM subtree
+"""
+
+# Walks from a part up through its parent assemblies and every assembly sharing them,
+# keeping each ancestor's shortest distance
+ANCESTORS_QUERY = """
+WITH RECURSIVE ancestor (name, depth) AS (
+    SELECT parent, 0 FROM node
+    WHERE project = :project AND kind = 'part' AND name = :name
+    AND parent IS NOT NULL
+    UNION
+    SELECT n.parent, a.depth + 1
+    FROM node n JOIN ancestor a
+    ON n.project = :project AND n.kind = 'assembly' AND n.name = a.name
+    WHERE n.parent IS NOT NULL
+    UNION
+    SELECT sh.parent, a.depth + 1
+    FROM shared sh JOIN ancestor a
+    ON sh.project = :project AND sh.child = a.name
+)
+SELECT name FROM ancestor GROUP BY name ORDER BY MIN(depth) DESC, name
+"""
+
+# Walks down from every top-level assembly through the assemblies below it, counting
+# levels. Parent links form trees, so every assembly is reached once
+DEPTH_QUERY = """
+WITH RECURSIVE level (name, depth) AS (
+    SELECT name, 1 FROM node
+    WHERE project = :project AND kind = 'assembly' AND parent IS NULL
+    UNION ALL
+    SELECT n.name, l.depth + 1
+    FROM node n JOIN level l
+    ON n.project = :project AND n.kind = 'assembly' AND n.parent = l.name
+)
+SELECT COALESCE(MAX(depth), 0) FROM level
+"""
+
+# Walks from a node up through its parent assemblies and every assembly sharing them,
+# looking for one assembly. UNION stops at ancestors already visited
+CONTAINS_QUERY = """
+WITH RECURSIVE ancestor (name) AS (
+    SELECT parent FROM node WHERE project = :project AND kind = :kind AND name = :name
+    UNION
+    SELECT parent FROM shared
+    WHERE project = :project AND :kind = 'assembly' AND child = :name
+    UNION
+    SELECT n.parent FROM node n JOIN ancestor a
+    ON n.project = :project AND n.kind = 'assembly' AND n.name = a.name
+    UNION
+    SELECT sh.parent FROM shared sh JOIN ancestor a
+    ON sh.project = :project AND sh.child = a.name
+)
+SELECT 1 FROM ancestor WHERE name = :assembly LIMIT 1
+"""
+
+# Walks from an assembly down through its subassemblies and the assemblies it shares,
+# multiplying quantities along each path, and totals them by part. Children are found
+# through node_parent, which the planner otherwise passes over for the primary key,
+# since it doesn't cover quantity, scanning the whole project for every row
+EXPLODE_QUERY = """
+WITH RECURSIVE exploded (kind, name, quantity) AS (
+    SELECT kind, name, 1 FROM node
+    WHERE project = :project AND kind = 'assembly' AND name = :name
+    UNION ALL
+    SELECT n.kind, n.name, e.quantity * n.quantity
+    FROM exploded e JOIN node n INDEXED BY node_parent
+    ON n.project = :project AND n.parent = e.name
+    WHERE e.kind = 'assembly'
+    UNION ALL
+    SELECT 'assembly', sh.child, e.quantity * sh.quantity
+    FROM shared sh JOIN exploded e
+    ON e.kind = 'assembly' AND sh.project = :project AND sh.parent = e.name
+)
+SELECT name, SUM(quantity) FROM exploded WHERE kind = 'part' GROUP BY name
+"""
+
+
+# Stamps assemblies and everything including them, their ancestors and the assemblies
+# sharing any of them, with a new version. UNION stops at assemblies already stamped
+TOUCH_QUERY = """
+WITH RECURSIVE ancestor (name) AS (
+    SELECT value FROM json_each(:names)
+    UNION
+    SELECT n.parent FROM node n JOIN ancestor a
+    ON n.project = :project AND n.kind = 'assembly' AND n.name = a.name
+    WHERE n.parent IS NOT NULL
+    UNION
+    SELECT sh.parent FROM shared sh JOIN ancestor a
+    ON sh.project = :project AND sh.child = a.name
+)
+UPDATE node SET version = :version
+WHERE project = :project AND kind = 'assembly' AND name IN (SELECT name FROM ancestor)
+"""
+
+
+class Subtrees:
+    """
+    Subtrees fetched by SUBTREE_QUERY, exported in the shape of anytree's
+    JsonExporter(sort_keys=True)
+    """
+
+    def __init__(self, rows: list):
+        # Children of every fetched assembly ordered by when they were attached, with
+        # its own children before the assemblies it shares
+        self.children = {}
+        for kind, name, parent, seq, shared in rows:
+            self.children.setdefault(parent, []).append((shared, seq, kind, name))
+        for children in self.children.values():
+            children.sort()
+        self.exports = {}
+
+    def children_of(self, kind: str, name: str) -> list:
+        """
+        Gets the children of a fetched node
+
+        Parameters
+        ----------
+        kind : str
+            part or assembly
+        name : str
+            Name of node
+
+        Returns
+        -------
+        list
+            (kind, name) of every child in attach order
+        """
+
+        if kind != "assembly":
+            return []
+        return [(child[2], child[3]) for child in self.children.get(name, [])]
+
+    def export(self, kind: str, name: str) -> str:
+        """
+        Exports a fetched node and its subtree, reusing exports of shared subtrees
+
+        Parameters
+        ----------
+        kind : str
+            part or assembly
+        name : str
+            Name of node
+
+        Returns
+        -------
+        str
+            JSON representation of the node and its subtree
+        """
+
+        # Iterative post-order walk so deep trees don't hit the recursion limit
+        stack = [((kind, name), False)]
+        while stack:
+            key, children_exported = stack.pop()
+            if key in self.exports:
+                continue
+            children = self.children_of(*key)
+            if not children_exported and children:
+                stack.append((key, True))
+                stack.extend((child, False) for child in children)
+                continue
+            if children:
+                self.exports[key] = (
+                    '{"children": ['
+                    + ", ".join(self.exports[child] for child in children)
+                    + f'], "id": {json.dumps(key[1])}}}'
+                )
+            else:
+                self.exports[key] = f'{{"id": {json.dumps(key[1])}}}'
+        return self.exports[(kind, name)]
+
+    def descendants(self, kind: str, name: str) -> list:
+        """
+        Gets every descendant of a fetched node in pre-order, visiting shared
+        assemblies once
+
+        Parameters
+        ----------
+        kind : str
+            part or assembly
+        name : str
+            Name of node
+
+        Returns
+        -------
+        list
+            (kind, name) of every descendant
+        """
+
+        result = []
+        seen = {(kind, name)}
+        stack = list(reversed(self.children_of(kind, name)))
+        while stack:
+            key = stack.pop()
+            if key in seen:
+                continue
+            seen.add(key)
+            result.append(key)
+            stack.extend(reversed(self.children_of(*key)))
+        return result
+
+
+class SqliteView(ProjectView):
+    """
+    Read-only view of a project in a SQLite database
+
+    Digests are cached by assembly name and version. A version is stamped on an
+    assembly whenever its subtree changes, and kept when a project is saved or loaded,
+    so a cached digest holds for the assembly in every project with that version.
+    """
+
+    def __init__(
+        self, connection: sqlite3.Connection, project: str, digests: MutableMapping
+    ):
+        # Connection to read through
+        self.connection = connection
+        # Name the project's rows are kept under
+        self.project = project
+        # Cached digests by (name, version), shared by views of the same database
+        self.digests = digests
+
+    def node(self, kind: str, name: str) -> tuple | None:
+        row = self.connection.execute(
+            "SELECT parent, quantity FROM node "
+            "WHERE project = ? AND kind = ? AND name = ?",
+            (self.project, kind, name),
+        ).fetchone()
+        if row is None:
+            return None
+        return (row[0], row[1]) if row[0] is not None else (None, 1)
+
+    def edges(self, assembly_name: str) -> list:
+        """
+        Gets the children of an assembly followed by the assemblies it shares, with
+        the versions of child assemblies
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of an existing assembly
+
+        Returns
+        -------
+        list
+            (kind, name, quantity, version) of every child, with kind "shared" for
+            shared assemblies
+        """
+
+        edges = self.connection.execute(
+            "SELECT kind, name, quantity, version FROM node "
+            "WHERE project = ? AND parent = ? ORDER BY seq",
+            (self.project, assembly_name),
+        ).fetchall()
+        edges += self.connection.execute(
+            "SELECT 'shared', sh.child, sh.quantity, n.version FROM shared sh "
+            "JOIN node n ON n.project = sh.project AND n.kind = 'assembly' "
+            "AND n.name = sh.child WHERE sh.project = ? AND sh.parent = ? "
+            "ORDER BY sh.seq",
+            (self.project, assembly_name),
+        ).fetchall()
+        return edges
+
+    def children(self, assembly_name: str) -> list:
+        return [
+            (kind, name)
+            for kind, name, _, _ in self.edges(assembly_name)
+            if kind != "shared"
+        ]
+
+    def shared(self, assembly_name: str) -> dict:
+        return {
+            name: quantity
+            for kind, name, quantity, _ in self.edges(assembly_name)
+            if kind == "shared"
+        }
+
+    def digest(self, assembly_name: str) -> str:
+        (version,) = self.connection.execute(
+            "SELECT version FROM node "
+            "WHERE project = ? AND kind = 'assembly' AND name = ?",
+            (self.project, assembly_name),
+        ).fetchone()
+        # Iterative post-order walk so deep trees don't hit the recursion limit. Only
+        # assemblies without a cached digest have their children read
+        stack = [((assembly_name, version), None)]
+        while stack:
+            key, edges = stack.pop()
+            if key in self.digests:
+                continue
+            if edges is None:
+                edges = self.edges(key[0])
+                stack.append((key, edges))
+                stack.extend(
+                    ((name, child_version), None)
+                    for kind, name, _, child_version in edges
+                    if kind != "part"
+                )
+                continue
+            self.digests[key] = subtree_digest(
+                key[0],
+                [
+                    [kind, name, quantity, self.digests.get((name, child_version))]
+                    for kind, name, quantity, child_version in edges
+                ],
+            )
+        return self.digests[(assembly_name, version)]
+
+    def roots(self) -> list:
+        return self.connection.execute(
+            "SELECT kind, name FROM node WHERE project = ? AND parent IS NULL",
+            (self.project,),
+        ).fetchall()
+
+
+class SqliteStore(BaseStore):
+    """
+    Storage backend keeping every part and assembly as a row of a local SQLite database
+
+    The node table is an adjacency list with each node's parent assembly, and the shared
+    table lists the assemblies each assembly shares besides its own children. Subtrees
+    and ancestor chains are served by recursive CTEs, and the classification endpoints
+    by index range scans on (project, kind, parent). Saved projects live in the same
+    tables under their own project name, and a store can keep its working project under
+    another name, so several stores work on their own projects in one database. Every
+    mutation runs in a single transaction.
+
+    The overlay table names the base project of a variant, or of a working project
+    loaded from one, and the delta table holds its differences. A saved variant has
+    overlay and delta rows but no nodes.
+
+    Any number of processes can serve the same database file. Reads run concurrently
+    on WAL snapshots, writes are serialized by SQLite's write lock, and sequence
+    numbers come from a counter in the database instead of any one process.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "bom.sqlite3", project: str = WORKING_PROJECT):
+        # Database file, which stores opened on it share
+        self.path = path
+        # Name the working project's rows are kept under, so several stores can work
+        # on their own projects in one database
+        self.project = project
+        # Cached subtree digests by assembly name and version, for SqliteView
+        self.digests = {}
+        # Cached part totals by assembly name and version, for explode_assembly
+        self.rollups = {}
+        # check_same_thread is off since the API may call in from a worker thread
+        self.connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        # Migrating in a write transaction, so processes opening the database together
+        # migrate it once
+        with self.transaction():
+            columns = [
+                row[1] for row in self.connection.execute("PRAGMA table_info(node)")
+            ]
+            # Databases created before quantities were tracked get every edge as 1
+            if "quantity" not in columns:
+                self.connection.execute(
+                    "ALTER TABLE node ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1"
+                )
+            if "version" not in columns:
+                self.connection.execute(
+                    "ALTER TABLE node ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+                )
+            # Sequence numbers order children and listings by when they were attached,
+            # and version assemblies. Databases created before the counter was kept
+            # continue from the highest number handed out
+            self.connection.execute(
+                "INSERT OR IGNORE INTO counter (name, value) SELECT 'seq', MAX("
+                "(SELECT COALESCE(MAX(seq), 0) FROM node), "
+                "(SELECT COALESCE(MAX(version), 0) FROM node), "
+                "(SELECT COALESCE(MAX(seq), 0) FROM shared))"
+            )
+            # Versions start over when the database is recreated or restored, so
+            # ETags carry an epoch drawn afresh whenever a process opens the database
+            conflict = "IGNORE" if path in EPOCH_DRAWN else "REPLACE"
+            self.connection.execute(
+                f"INSERT OR {conflict} INTO counter (name, value) "
+                "VALUES ('epoch', abs(random()))"
+            )
+            EPOCH_DRAWN.add(path)
+            # Databases created before assemblies were versioned get a new version for
+            # every assembly of every project, since their states can differ
+            if "version" not in columns:
+                rows = self.connection.execute(
+                    "SELECT project, name FROM node WHERE kind = 'assembly'"
+                ).fetchall()
+                first = self.next_seq(len(rows)) - len(rows) + 1
+                self.connection.executemany(
+                    "UPDATE node SET version = ? "
+                    "WHERE project = ? AND kind = 'assembly' AND name = ?",
+                    [
+                        (version, project, name)
+                        for version, (project, name) in enumerate(rows, first)
+                    ],
+                )
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        # Nested transactions join the open one, so store mutations called by the API
+        # inside its own transaction commit with it
+        if self.connection.in_transaction:
+            yield
+            return
+        # IMMEDIATE takes the write lock up front, so another process can't change
+        # what is read before the writes
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.rollback()
+            raise
+        self.connection.commit()
+
+    def next_seq(self, count: int = 1) -> int:
+        """
+        Reserves sequence numbers to order created or reattached nodes, from a counter
+        in the database so processes sharing it never hand out the same number
+
+        It must be called in a transaction, which holds the counter until it commits.
+
+        Parameters
+        ----------
+        count : int, optional
+            Number of sequence numbers to reserve
+
+        Returns
+        -------
+        int
+            Last reserved sequence number
+        """
+
+        (seq,) = self.connection.execute(
+            "UPDATE counter SET value = value + ? WHERE name = 'seq' RETURNING value",
+            (count,),
+        ).fetchone()
+        return seq
+
+    def parent_of(self, kind: str, name: str) -> str | None:
+        """
+        Gets the parent assembly name of a node in the working project
+
+        Parameters
+        ----------
+        kind : str
+            part or assembly
+        name : str
+            Name of node
+
+        Returns
+        -------
+        str, optional
+            Name of parent assembly
+        """
+
+        row = self.connection.execute(
+            "SELECT parent FROM node WHERE project = ? AND kind = ? AND name = ?",
+            (self.project, kind, name),
+        ).fetchone()
+        return row[0] if row else None
+
+    def exists(self, kind: str, name: str) -> bool:
+        """
+        Checks if a node exists in the working project
+
+        Parameters
+        ----------
+        kind : str
+            part or assembly
+        name : str
+            Name of node
+
+        Returns
+        -------
+        bool
+            True if the node exists
+        """
+
+        row = self.connection.execute(
+            "SELECT 1 FROM node WHERE project = ? AND kind = ? AND name = ?",
+            (self.project, kind, name),
+        ).fetchone()
+        return row is not None
+
+    def count(self, kind: str) -> int:
+        """
+        Counts the nodes of a kind in the working project
+
+        Parameters
+        ----------
+        kind : str
+            part or assembly
+
+        Returns
+        -------
+        int
+            Number of nodes
+        """
+
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM node WHERE project = ? AND kind = ?",
+            (self.project, kind),
+        ).fetchone()[0]
+
+    def set_parent(self, kind: str, name: str, parent: str | None, quantity: int = 1):
+        """
+        Reparents a node, moving it to the end of its new parent's children
+
+        Parameters
+        ----------
+        kind : str
+            part or assembly
+        name : str
+            Name of node
+        parent : str, optional
+            Name of new parent assembly, or None to detach
+        quantity : int, optional
+            Number of the node the new parent needs
+
+        Returns
+        -------
+        None
+        """
+
+        self.connection.execute(
+            "UPDATE node SET parent = ?, quantity = ?, seq = ? "
+            "WHERE project = ? AND kind = ? AND name = ?",
+            (parent, quantity, self.next_seq(), self.project, kind, name),
+        )
+
+    def touch(self, assembly_names: list):
+        """
+        Stamps assemblies whose subtrees changed, everything including them and every
+        assembly sharing any of them with a new version
+
+        Parameters
+        ----------
+        assembly_names : list
+            Names of assemblies, None for none
+
+        Returns
+        -------
+        None
+        """
+
+        names = [name for name in assembly_names if name is not None]
+        if names:
+            self.connection.execute(
+                TOUCH_QUERY,
+                {
+                    "project": self.project,
+                    "names": json.dumps(names),
+                    "version": self.next_seq(),
+                },
+            )
+
+    def fetch_subtrees(self, roots: str, params: dict | None = None) -> Subtrees:
+        """
+        Fetches the subtrees of every working project node matching a condition
+
+        Parameters
+        ----------
+        roots : str
+            SQL condition on the node table selecting the subtree roots
+        params : dict, optional
+            Named parameters of the condition
+
+        Returns
+        -------
+        Subtrees
+            Fetched subtrees
+        """
+
+        return Subtrees(
+            self.connection.execute(
+                SUBTREE_QUERY.format(roots=roots),
+                {"project": self.project, **(params or {})},
+            ).fetchall()
+        )
+
+    def export_where(
+        self, kind: str, condition: str, order: str, params: dict | None = None
+    ) -> list:
+        """
+        Exports the subtrees of every working project node matching a condition
+
+        Parameters
+        ----------
+        kind : str
+            part or assembly
+        condition : str
+            SQL condition on the node table selecting the nodes to export
+        order : str
+            Column to order the exported nodes by
+        params : dict, optional
+            Named parameters of the condition
+
+        Returns
+        -------
+        list
+            JSON representations of the matching nodes and their subtrees
+        """
+
+        roots = f"kind = '{kind}' AND {condition}"
+        names = self.connection.execute(
+            f"SELECT name FROM node WHERE project = :project AND {roots} "
+            f"ORDER BY {order}",
+            {"project": self.project, **(params or {})},
+        ).fetchall()
+        if kind == "part" or not names:
+            # Parts have no subtrees to fetch
+            return [f'{{"id": {json.dumps(name)}}}' for (name,) in names]
+        subtrees = self.fetch_subtrees(roots, params)
+        return [subtrees.export(kind, name) for (name,) in names]
+
+    def has_part(self, part_name: str) -> bool:
+        return self.exists("part", part_name)
+
+    def has_assembly(self, assembly_name: str) -> bool:
+        return self.exists("assembly", assembly_name)
+
+    def part_parent(self, part_name: str) -> str | None:
+        return self.parent_of("part", part_name)
+
+    def assembly_parent(self, assembly_name: str) -> str | None:
+        return self.parent_of("assembly", assembly_name)
+
+    def assembly_contains(self, assembly_name: str, kind: str, name: str) -> bool:
+        row = self.connection.execute(
+            CONTAINS_QUERY,
+            {
+                "project": self.project,
+                "kind": kind,
+                "name": name,
+                "assembly": assembly_name,
+            },
+        ).fetchone()
+        return row is not None
+
+    def part_count(self) -> int:
+        return self.count("part")
+
+    def assembly_count(self) -> int:
+        return self.count("assembly")
+
+    def tree_depth(self) -> int:
+        return self.connection.execute(
+            DEPTH_QUERY, {"project": self.project}
+        ).fetchone()[0]
+
+    def insert_nodes(self, rows: list):
+        """
+        Inserts new nodes into the working project
+
+        Parameters
+        ----------
+        rows : list
+            kind, name, parent assembly name and quantity of every node, in creation
+            order
+
+        Returns
+        -------
+        None
+        """
+
+        first = self.next_seq(len(rows)) - len(rows) + 1
+        # New assemblies are versioned by when they were created
+        self.connection.executemany(
+            "INSERT INTO node "
+            "(project, kind, name, parent, quantity, seq, created, version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (self.project, kind, name, parent, quantity, seq, seq, seq)
+                for seq, (kind, name, parent, quantity) in enumerate(rows, first)
+            ),
+        )
+
+    @recorded
+    def create_parts(self, part_names: list):
+        with self.transaction():
+            self.insert_nodes([("part", name, None, 1) for name in part_names])
+
+    @recorded
+    def delete_part(self, part_name: str):
+        with self.transaction():
+            self.touch([self.parent_of("part", part_name)])
+            self.connection.execute(
+                "DELETE FROM node WHERE project = ? AND kind = 'part' AND name = ?",
+                (self.project, part_name),
+            )
+
+    @recorded
+    def create_assembly(
+        self,
+        assembly_name: str,
+        part_names: list,
+        subassembly_names: list,
+        quantities: dict | None = None,
+    ):
+        quantities = quantities or {}
+        with self.transaction():
+            self.insert_nodes([("assembly", assembly_name, None, 1)])
+            for part_name in part_names:
+                self.set_parent(
+                    "part", part_name, assembly_name, quantities.get(part_name, 1)
+                )
+            for subassembly_name in subassembly_names:
+                self.set_parent(
+                    "assembly",
+                    subassembly_name,
+                    assembly_name,
+                    quantities.get(subassembly_name, 1),
+                )
+
+    @recorded
+    def import_assembly(self, assembly: dict) -> dict:
+        summary = {"assemblies": 0, "parts": 0, "created_parts": 0}
+        rows = []
+        reparented = []
+        # Walking in pre-order, so sequence numbers keep children in input order
+        stack = [(assembly, None)]
+        while stack:
+            item, parent = stack.pop()
+            children = item.get("children") or []
+            quantity = item.get("quantity", 1)
+            if children:
+                rows.append(("assembly", item["id"], parent, quantity))
+                summary["assemblies"] += 1
+                stack.extend((child, item["id"]) for child in reversed(children))
+            else:
+                summary["parts"] += 1
+                if self.exists("part", item["id"]):
+                    reparented.append((parent, item["id"], quantity))
+                else:
+                    rows.append(("part", item["id"], parent, quantity))
+                    summary["created_parts"] += 1
+        with self.transaction():
+            self.insert_nodes(rows)
+            for parent, part_name, quantity in reparented:
+                self.set_parent("part", part_name, parent, quantity)
+        return summary
+
+    @recorded
+    def attach_part(self, assembly_name: str, part_name: str, quantity: int = 1):
+        with self.transaction():
+            old_parent = self.parent_of("part", part_name)
+            self.set_parent("part", part_name, assembly_name, quantity)
+            self.touch([old_parent, assembly_name])
+
+    @recorded
+    def detach_part(self, part_name: str):
+        with self.transaction():
+            self.touch([self.parent_of("part", part_name)])
+            self.set_parent("part", part_name, None)
+
+    def shared_subassemblies(self, assembly_name: str) -> dict:
+        rows = self.connection.execute(
+            "SELECT child, quantity FROM shared WHERE project = ? AND parent = ? "
+            "ORDER BY seq",
+            (self.project, assembly_name),
+        )
+        return dict(rows)
+
+    @recorded
+    def share_assembly(
+        self, assembly_name: str, subassembly_name: str, quantity: int = 1
+    ):
+        with self.transaction():
+            self.connection.execute(
+                "INSERT INTO shared (project, parent, child, quantity, seq) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.project,
+                    assembly_name,
+                    subassembly_name,
+                    quantity,
+                    self.next_seq(),
+                ),
+            )
+            self.touch([assembly_name])
+
+    @recorded
+    def unshare_assembly(self, assembly_name: str, subassembly_name: str):
+        with self.transaction():
+            self.connection.execute(
+                "DELETE FROM shared WHERE project = ? AND parent = ? AND child = ?",
+                (self.project, assembly_name, subassembly_name),
+            )
+            self.touch([assembly_name])
+
+    def explode_assembly(self, assembly_name: str) -> dict:
+        # Rollups are cached by assembly name and version like digests, since every
+        # change below an assembly, by any process, stamps it with a new version
+        (version,) = self.connection.execute(
+            "SELECT version FROM node "
+            "WHERE project = ? AND kind = 'assembly' AND name = ?",
+            (self.project, assembly_name),
+        ).fetchone()
+        rollup = self.rollups.get((assembly_name, version))
+        if rollup is None:
+            rollup = dict(
+                self.connection.execute(
+                    EXPLODE_QUERY, {"project": self.project, "name": assembly_name}
+                )
+            )
+            # Versions stamped in a transaction are handed out again if it is rolled
+            # back, so rollups read in one aren't cached
+            if not self.connection.in_transaction:
+                if len(self.rollups) >= ROLLUP_CACHE_SIZE:
+                    self.rollups.clear()
+                self.rollups[(assembly_name, version)] = rollup
+        return dict(rollup)
+
+    def assembly_version(self, assembly_name: str) -> str:
+        row = self.connection.execute(
+            "SELECT c.value, n.version FROM node n JOIN counter c ON c.name = 'epoch' "
+            "WHERE n.project = ? AND n.kind = 'assembly' AND n.name = ?",
+            (self.project, assembly_name),
+        ).fetchone()
+        return f"{row[0]:x}-{row[1]}"
+
+    def export_part(self, part_name: str) -> str:
+        return f'{{"id": {json.dumps(part_name)}}}'
+
+    def export_assembly(self, assembly_name: str) -> str:
+        subtrees = self.fetch_subtrees(
+            "kind = 'assembly' AND name = :name", {"name": assembly_name}
+        )
+        return subtrees.export("assembly", assembly_name)
+
+    def export_parts(self) -> list:
+        return self.export_where("part", "1", "created")
+
+    def export_assemblies(self) -> list:
+        return self.export_where("assembly", "1", "created")
+
+    def iter_kind(self, kind: str, after: str | None) -> Iterator[tuple[str, str]]:
+        """
+        Lazily exports all parts or assemblies in creation order, a batch at a time
+
+        Nodes created after the listing started are left out, so a listing read a
+        chunk at a time ends where it stood when it started.
+
+        Parameters
+        ----------
+        kind : str
+            part or assembly
+        after : str, optional
+            Name of node to resume after
+
+        Yields
+        ------
+        tuple
+            Name and JSON representation of each node
+        """
+
+        created = -1
+        if after is not None:
+            (created,) = self.connection.execute(
+                "SELECT created FROM node WHERE project = ? AND kind = ? AND name = ?",
+                (self.project, kind, after),
+            ).fetchone()
+        # Nodes are stamped from the sequence counter as they are created
+        (end,) = self.connection.execute(
+            "SELECT value FROM counter WHERE name = 'seq'"
+        ).fetchone()
+        while True:
+            params = {"kind": kind, "after": created, "limit": BATCH_SIZE}
+            rows = self.connection.execute(
+                "SELECT name, created FROM node "
+                "WHERE project = :project AND kind = :kind AND created > :after "
+                "AND created <= :end ORDER BY created LIMIT :limit",
+                {"project": self.project, "end": end, **params},
+            ).fetchall()
+            if not rows:
+                return
+            if kind == "part":
+                exports = [f'{{"id": {json.dumps(name)}}}' for name, _ in rows]
+            else:
+                params["last"] = rows[-1][1]
+                subtrees = self.fetch_subtrees(
+                    "kind = :kind AND created > :after AND created <= :last", params
+                )
+                exports = [subtrees.export(kind, name) for name, _ in rows]
+            for (name, _), export in zip(rows, exports):
+                yield name, export
+            created = rows[-1][1]
+
+    def iter_children(self, assembly_name: str) -> Iterator[tuple[str, str]]:
+        """
+        Lazily lists the children of an assembly followed by the assemblies it
+        shares, each in the order they were attached, a batch at a time
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of assembly
+
+        Yields
+        ------
+        tuple
+            Kind and name of each child
+        """
+
+        for query in (
+            "SELECT kind, name, seq FROM node "
+            "WHERE project = ? AND parent = ? AND seq > ? ORDER BY seq LIMIT ?",
+            "SELECT 'assembly', child, seq FROM shared "
+            "WHERE project = ? AND parent = ? AND seq > ? ORDER BY seq LIMIT ?",
+        ):
+            seq = -1
+            while True:
+                rows = self.connection.execute(
+                    query, (self.project, assembly_name, seq, BATCH_SIZE)
+                ).fetchall()
+                if not rows:
+                    break
+                for kind, name, _ in rows:
+                    yield kind, name
+                seq = rows[-1][2]
+
+    def iter_subtree(
+        self, assembly_name: str, after: tuple | None, leaves: bool
+    ) -> Iterator[tuple[tuple, str]]:
+        """
+        Lazily exports the descendants of an assembly in pre-order, visiting shared
+        assemblies once
+
+        The assembly's children are listed a batch at a time, and the subtree of each
+        child assembly is fetched in one query and exported from, so only one child's
+        subtree is held at a time. Once anything was written through the store since,
+        each node is checked to still be below the assembly, skipping nodes deleted or
+        moved out of it, and assemblies are exported afresh. Resuming passes over the
+        children before the one the named descendant is below, unless anything is
+        shared, then skips every descendant up to the named one.
+
+        Parameters
+        ----------
+        assembly_name : str
+            Name of assembly
+        after : tuple, optional
+            Kind and name of descendant to resume after
+        leaves : bool
+            Whether to only export nodes without children
+
+        Yields
+        ------
+        tuple
+            Kind and name, and JSON representation of each node
+        """
+
+        # Only shared assemblies can be reached twice
+        shared = {
+            name
+            for (name,) in self.connection.execute(
+                "SELECT DISTINCT child FROM shared WHERE project = ?", (self.project,)
+            )
+        }
+        seen = set()
+        skipping = after is not None
+        changes = self.connection.total_changes
+        seek = None
+        if after is not None and not shared:
+            # The named descendant then has one path up, so the children before the
+            # one it is below are passed over without fetching their subtrees
+            seek = tuple(after)
+            parent = self.parent_of(*seek)
+            while parent is not None and parent != assembly_name:
+                seek, parent = ("assembly", parent), self.parent_of("assembly", parent)
+            if parent is None:
+                return
+        for child in self.iter_children(assembly_name):
+            if seek is not None:
+                if child != seek:
+                    continue
+                seek = None
+            subtrees = Subtrees([])
+            if child[0] == "assembly" and child[1] not in seen:
+                subtrees = self.fetch_subtrees(
+                    "kind = 'assembly' AND name = :name", {"name": child[1]}
+                )
+            stack = [child]
+            while stack:
+                key = stack.pop()
+                kind, name = key
+                if kind == "assembly" and name in shared:
+                    if name in seen:
+                        continue
+                    seen.add(name)
+                children = subtrees.children_of(kind, name)
+                stack.extend(reversed(children))
+                changed = self.connection.total_changes != changes
+                if skipping:
+                    skipping = key != tuple(after)
+                elif changed and not self.assembly_contains(assembly_name, kind, name):
+                    # Deleted or moved out since its subtree was fetched
+                    continue
+                elif not children:
+                    yield key, f'{{"id": {json.dumps(name)}}}'
+                elif not leaves:
+                    yield key, (
+                        self.export_assembly(name)
+                        if changed
+                        else subtrees.export(kind, name)
+                    )
+
+    def iter_parts(self, after: str | None = None) -> Iterator[tuple[str, str]]:
+        return self.iter_kind("part", after)
+
+    def iter_assemblies(self, after: str | None = None) -> Iterator[tuple[str, str]]:
+        return self.iter_kind("assembly", after)
+
+    def iter_descendants(
+        self, assembly_name: str, after: tuple | None = None
+    ) -> Iterator[tuple[tuple, str]]:
+        return self.iter_subtree(assembly_name, after, False)
+
+    def iter_leaves(
+        self, assembly_name: str, after: tuple | None = None
+    ) -> Iterator[tuple[tuple, str]]:
+        return self.iter_subtree(assembly_name, after, True)
+
+    def part_where_used(self, part_name: str) -> list:
+        # Indexed lookups up the ancestor path, never reading a subtree
+        return [
+            name
+            for (name,) in self.connection.execute(
+                ANCESTORS_QUERY, {"project": self.project, "name": part_name}
+            )
+        ]
+
+    def export_part_ancestors(self, part_name: str) -> list:
+        names = self.part_where_used(part_name)
+        if not names:
+            return []
+        # Assemblies sharing an ancestor can be in other trees, so every ancestor is a
+        # root, and UNION drops the rows of the ones nested in others
+        subtrees = self.fetch_subtrees(
+            "kind = 'assembly' AND name IN (SELECT value FROM json_each(:names))",
+            {"names": json.dumps(names)},
+        )
+        return [subtrees.export("assembly", name) for name in names]
+
+    def export_first_children(self, assembly_name: str) -> list:
+        subtrees = self.fetch_subtrees(
+            "kind = 'assembly' AND name = :name", {"name": assembly_name}
+        )
+        return [
+            subtrees.export(kind, name)
+            for kind, name in subtrees.children_of("assembly", assembly_name)
+        ]
+
+    def export_descendants(self, assembly_name: str) -> list:
+        subtrees = self.fetch_subtrees(
+            "kind = 'assembly' AND name = :name", {"name": assembly_name}
+        )
+        return [
+            subtrees.export(kind, name)
+            for kind, name in subtrees.descendants("assembly", assembly_name)
+        ]
+
+    def export_leaves(self, assembly_name: str) -> list:
+        subtrees = self.fetch_subtrees(
+            "kind = 'assembly' AND name = :name", {"name": assembly_name}
+        )
+        return [
+            subtrees.export(kind, name)
+            for kind, name in subtrees.descendants("assembly", assembly_name)
+            if not subtrees.children_of(kind, name)
+        ]
+
+    def export_top_assemblies(self) -> list:
+        return self.export_where("assembly", "parent IS NULL", "created")
+
+    def export_subassemblies(self) -> list:
+        return self.export_where("assembly", "parent IS NOT NULL", "created")
+
+    def export_components(self) -> list:
+        return self.export_where("part", "parent IS NOT NULL", "created")
+
+    def export_orphans(self) -> list:
+        return self.export_where("part", "parent IS NULL", "created")
+
+    def has_project(self, project_name: str) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM project WHERE name = ?", (project_name,)
+        ).fetchone()
+        return row is not None
+
+    def holds_project(self, project: str) -> bool:
+        """
+        Checks whether any node is kept under a project name, such as the working
+        project of another store opened on the same database
+
+        Parameters
+        ----------
+        project : str
+            Name the project's rows are kept under
+
+        Returns
+        -------
+        bool
+            True if the project has a node
+        """
+
+        row = self.connection.execute(
+            "SELECT 1 FROM node WHERE project = ? LIMIT 1", (project,)
+        ).fetchone()
+        return row is not None
+
+    def project_names(self) -> list:
+        rows = self.connection.execute("SELECT name FROM project ORDER BY name")
+        return [name for (name,) in rows]
+
+    def save_tables(self, project_name: str, tables: tuple):
+        """
+        Saves the working project under a name by moving its rows of some tables to
+        it, dropping its other rows and any rows of the project it replaces
+
+        Parameters
+        ----------
+        project_name : str
+            Name of project to save
+        tables : tuple
+            Names of tables whose rows are kept
+
+        Returns
+        -------
+        None
+        """
+
+        with self.transaction():
+            for table in ("node", "shared", "overlay", "delta"):
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE project = ?", (project_name,)
+                )
+                if table in tables:
+                    self.connection.execute(
+                        f"UPDATE {table} SET project = ? WHERE project = ?",
+                        (project_name, self.project),
+                    )
+                else:
+                    self.connection.execute(
+                        f"DELETE FROM {table} WHERE project = ?", (self.project,)
+                    )
+            self.connection.execute(
+                "INSERT OR IGNORE INTO project (name) VALUES (?)", (project_name,)
+            )
+
+    def save_project(self, project_name: str):
+        self.save_tables(project_name, ("node", "shared"))
+
+    def load_project(self, project_name: str):
+        if self.project_base(project_name) is not None:
+            return self.load_variant(project_name)
+        with self.transaction():
+            for table in ("node", "shared"):
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE project = ?", (self.project,)
+                )
+            self.connection.execute(
+                "INSERT INTO node "
+                "(project, kind, name, parent, quantity, seq, created, version) "
+                "SELECT ?, kind, name, parent, quantity, seq, created, version "
+                "FROM node WHERE project = ?",
+                (self.project, project_name),
+            )
+            self.connection.execute(
+                "INSERT INTO shared (project, parent, child, quantity, seq) "
+                "SELECT ?, parent, child, quantity, seq FROM shared WHERE project = ?",
+                (self.project, project_name),
+            )
+            self.start_delta(project_name)
+
+    def has_variants(self, project_name: str) -> bool:
+        # Working projects loaded from the project have overlay rows too, but only
+        # saved variants are in the project table
+        row = self.connection.execute(
+            "SELECT 1 FROM overlay o JOIN project p ON p.name = o.project "
+            "WHERE o.base = ?",
+            (project_name,),
+        ).fetchone()
+        return row is not None
+
+    def project_base(self, project_name: str) -> str | None:
+        row = self.connection.execute(
+            "SELECT base FROM overlay WHERE project = ?", (project_name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def working_base(self) -> str | None:
+        return self.project_base(self.project)
+
+    def variant_delta(self, project_name: str) -> list:
+        rows = self.connection.execute(
+            "SELECT record FROM delta WHERE project = ? ORDER BY seq", (project_name,)
+        )
+        return [record for (record,) in rows]
+
+    def start_delta(self, project_name: str | None):
+        with self.transaction():
+            for table in ("overlay", "delta"):
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE project = ?", (self.project,)
+                )
+            if project_name is not None:
+                self.connection.execute(
+                    "INSERT INTO overlay (project, base) VALUES (?, ?)",
+                    (self.project, project_name),
+                )
+
+    def record_delta(self, record: str):
+        with self.transaction():
+            if self.working_base() is not None:
+                self.connection.execute(
+                    "INSERT INTO delta (project, seq, record) VALUES (?, ?, ?)",
+                    (self.project, self.next_seq(), record),
+                )
+
+    def save_variant(self, project_name: str):
+        self.save_tables(project_name, ("overlay", "delta"))
+
+    @contextlib.contextmanager
+    def project_views(self, project_names: list) -> Iterator[list]:
+        if len(self.digests) > DIGEST_CACHE_SIZE:
+            self.digests.clear()
+        if all(self.project_base(name) is None for name in project_names):
+            yield [
+                SqliteView(self.connection, name, self.digests)
+                for name in project_names
+            ]
+            return
+        # Variants are loaded under scratch names by copies of this store, inside a
+        # savepoint that is rolled back, so nothing is written. The versions they
+        # stamp are handed out again after the rollback, so their digests are cached
+        # apart
+        digests = collections.ChainMap({}, self.digests)
+        with self.transaction():
+            self.connection.execute("SAVEPOINT project_views")
+            try:
+                views = []
+                for index, project_name in enumerate(project_names):
+                    if self.project_base(project_name) is not None:
+                        store = copy.copy(self)
+                        store.project = f"/diff/{index}"
+                        store.load_project(project_name)
+                        project_name = store.project
+                    views.append(SqliteView(self.connection, project_name, digests))
+                yield views
+            finally:
+                self.connection.execute("ROLLBACK TO project_views")
+                self.connection.execute("RELEASE project_views")
@@ -4,12 +4,19 @@ This file contains the configurations and some baseline test fixtures for testin
 
 import pytest
 from fastapi.testclient import TestClient
+import app as bom_app
 from app import app as fastapi_app
+from storage import create_store
 
 
-@pytest.fixture(scope="session")
-def test_client():
-    # Fixture for creating the test client
+# Options for each storage backend the tests run against
+STORE_OPTIONS = {"memory": {}, "compact": {}, "sqlite": {"path": ":memory:"}}
+
+
+@pytest.fixture(scope="session", params=list(STORE_OPTIONS))
+def test_client(request):
+    # Fixture for creating the test client, once per storage backend
+    bom_app.gStore = create_store(request.param, **STORE_OPTIONS[request.param])
     testing_client = TestClient(fastapi_app)
     yield testing_client
 
@@ -2,7 +2,17 @@
 This file contains tests for the methods in the app.py file
 """
 
+import asyncio
 import json
+import threading
+import time
+import httpx
+from anytree.exporter import JsonExporter
+from anytree.importer import JsonImporter
+from fastapi.testclient import TestClient
+import app as bom_app
+from storage import create_store, sqlite_store
+from utilities.metrics import MeteredStore, Metrics
 
 
 def test_hello_world(test_client):
@@ -29,6 +39,18 @@ def test_health(test_client):
     assert response.json() == {"status": "Running"}
 
 
+def test_journal(test_client):
+    """
+    GIVEN a FastAPI application started without BOM_JOURNAL_DIR
+    WHEN the '/journal' endpoint is requested (GET)
+    THEN check that the journal is reported as not enabled
+    """
+
+    response = test_client.get("/journal")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Journal not enabled"}
+
+
 def test_post_part(test_client):
     """
     GIVEN a FastAPI application
@@ -99,6 +121,50 @@ def test_get_part_by_name(test_client, create_part):
     assert response.status_code == 201
 
 
+def test_post_part_batch(test_client, create_part):
+    """
+    GIVEN a FastAPI application
+    WHEN the '/part/batch' endpoint is requested (POST)
+    THEN check that the response code is valid, valid parts are created, and invalid
+    names are reported per item
+    """
+
+    # Providing no part names
+    response = test_client.post("/part/batch", json={"part_names": []})
+    assert response.status_code == 403
+
+    # Providing invalid data
+    response = test_client.post("/part/batch", json={"part_name": "test_part"})
+    assert response.status_code == 422
+
+    # Providing new, existing, repeated and empty part names
+    response = test_client.post(
+        "/part/batch",
+        json={
+            "part_names": ["test_part2", "test_part", "test_part2", "", "test_part3"]
+        },
+    )
+    assert response.status_code == 201
+    response_json = response.json()
+    assert response_json["status"] == "Success"
+    assert response_json["data"]["created"] == 2
+    errors = response_json["data"]["errors"]
+    assert [item["index"] for item in errors] == [1, 2, 3]
+    assert errors[0]["detail"] == "Part exists"
+    assert errors[1]["detail"] == "Part exists"
+    assert errors[2]["detail"] == "Empty string for part name"
+
+    # Checking created parts are listed as orphans
+    response = test_client.get("/orphan")
+    data_json = json.loads(response.json()["data"])
+    orphans = {json.loads(item)["id"] for item in data_json}
+    assert orphans == {"test_part", "test_part2", "test_part3"}
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
 def test_delete_part(test_client, create_part):
     """
     GIVEN a FastAPI application
@@ -169,6 +235,14 @@ def test_post_assembly(test_client, create_part):
     assert data_json["id"] == "test_assembly"
     assert data_json["children"][0]["id"] == "test_part"
 
+    # Providing an assembly name that already exists
+    test_client.post("/part", json={"part_name": "test_part2"})
+    response = test_client.post(
+        "/assembly",
+        json={"assembly_name": "test_assembly", "part_names": ["test_part2"]},
+    )
+    assert response.status_code == 403
+
     # Clearing assembly project before other tests
     response = test_client.post("/project/test_project")
     assert response.status_code == 201
@@ -220,6 +294,67 @@ def test_get_assembly_by_name(test_client, create_assembly):
     assert response.status_code == 201
 
 
+def test_import_assembly(test_client, create_part):
+    """
+    GIVEN a FastAPI application
+    WHEN the '/assembly/import' endpoint is requested (POST)
+    THEN check that the response code is valid, the whole tree is built, and rejected
+    imports change nothing
+    """
+
+    tree = {
+        "id": "test_assembly2",
+        "children": [
+            {"id": "test_assembly", "children": [{"id": "test_part"}]},
+            {"id": "test_part2"},
+        ],
+    }
+
+    # Providing a tree without children
+    response = test_client.post("/assembly/import", json={"assembly": {"id": "x"}})
+    assert response.status_code == 403
+
+    # Providing a tree with a repeated name
+    response = test_client.post(
+        "/assembly/import",
+        json={
+            "assembly": {
+                "id": "test_assembly3",
+                "children": [{"id": "test_part3"}, {"id": "test_part3"}],
+            }
+        },
+    )
+    assert response.status_code == 403
+    assert test_client.get("/part/test_part3").json()["data"] is None
+
+    # Providing a valid tree reusing an existing orphan part
+    response = test_client.post("/assembly/import", json={"assembly": tree})
+    assert response.status_code == 201
+    response_json = response.json()
+    assert response_json["status"] == "Success"
+    assert response_json["data"] == {
+        "assembly_name": "test_assembly2",
+        "assemblies": 2,
+        "parts": 2,
+        "created_parts": 1,
+    }
+
+    # Checking the imported tree matches the input
+    response = test_client.get("/assembly/test_assembly2")
+    assert json.loads(response.json()["data"]) == tree
+    response = test_client.get("/top_assembly")
+    data_json = json.loads(response.json()["data"])
+    assert [json.loads(item)["id"] for item in data_json] == ["test_assembly2"]
+
+    # Importing the same tree again is rejected
+    response = test_client.post("/assembly/import", json={"assembly": tree})
+    assert response.status_code == 403
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
 def test_detach_part_assembly(test_client, create_assembly):
     """
     GIVEN a FastAPI application
@@ -465,6 +600,306 @@ def test_get_assembly_leaves(test_client, create_multi_level_assembly):
     assert response.status_code == 201
 
 
+def test_get_assembly_contains(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN the '/assembly/{assembly_name}/contains/{name}' endpoint is requested (GET)
+    THEN check that the response code is valid, and ancestry stays correct as parts
+    are detached and attached
+    """
+
+    # Checking parts and assemblies at every depth
+    for assembly_name, name, expected in [
+        ("test_assembly2", "test_part", True),
+        ("test_assembly2", "test_assembly", True),
+        ("test_assembly", "test_part", True),
+        ("test_assembly", "test_part2", False),
+        ("test_assembly", "test_assembly2", False),
+        ("test_assembly2", "test_assembly2", False),
+    ]:
+        response = test_client.get(f"/assembly/{assembly_name}/contains/{name}")
+        assert response.status_code == 200
+        assert response.json() == {"status": "Success", "data": expected}
+
+    # Moving a part out of the subassembly and into the top-level assembly
+    response = test_client.put("/assembly/test_assembly/child/test_part")
+    assert response.status_code == 200
+    response = test_client.get("/assembly/test_assembly2/contains/test_part")
+    assert response.json()["data"] is False
+    response = test_client.post("/assembly/test_assembly2/child/test_part")
+    assert response.status_code == 200
+    response = test_client.get("/assembly/test_assembly2/contains/test_part")
+    assert response.json()["data"] is True
+    response = test_client.get("/assembly/test_assembly/contains/test_part")
+    assert response.json()["data"] is False
+
+    # Unknown assembly or part
+    response = test_client.get("/assembly/unknown/contains/test_part")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Assembly name not created"}
+    response = test_client.get("/assembly/test_assembly2/contains/unknown")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Part not created"}
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_get_assembly_explode(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN the '/assembly/{assembly_name}/explode' endpoint is requested (GET)
+    THEN check that part totals multiply quantities down every level, and are
+    recomputed as quantities change
+    """
+
+    response = test_client.get("/assembly/test_assembly2/explode")
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "Success",
+        "data": {"test_part": 1, "test_part2": 1},
+    }
+
+    # Reattaching a part deep in the tree with a new quantity
+    response = test_client.put("/assembly/test_assembly/child/test_part")
+    assert response.status_code == 200
+    response = test_client.get("/assembly/test_assembly2/explode")
+    assert response.json()["data"] == {"test_part2": 1}
+    response = test_client.post("/assembly/test_assembly/child/test_part?quantity=3")
+    assert response.status_code == 200
+    response = test_client.get("/assembly/test_assembly2/explode")
+    assert response.json()["data"] == {"test_part": 3, "test_part2": 1}
+
+    # Quantities of subassemblies multiply the totals of everything inside them
+    response = test_client.post("/part", json={"part_name": "test_part3"})
+    assert response.status_code == 201
+    response = test_client.post(
+        "/assembly",
+        json={
+            "assembly_name": "test_assembly3",
+            "part_names": ["test_part3"],
+            "subassembly_names": ["test_assembly2"],
+            "quantities": {"test_part3": 2, "test_assembly2": 5},
+        },
+    )
+    assert response.status_code == 201
+    response = test_client.get("/assembly/test_assembly3/explode")
+    assert response.json()["data"] == {
+        "test_part": 15,
+        "test_part2": 5,
+        "test_part3": 2,
+    }
+    response = test_client.get("/assembly/test_assembly/explode")
+    assert response.json()["data"] == {"test_part": 3}
+
+    # Imported trees carry quantities on their nodes
+    response = test_client.post(
+        "/assembly/import",
+        json={
+            "assembly": {
+                "id": "test_car",
+                "children": [
+                    {
+                        "id": "test_axle",
+                        "quantity": 2,
+                        "children": [
+                            {"id": "test_wheel", "quantity": 2},
+                            {"id": "test_bolt", "quantity": 4},
+                        ],
+                    },
+                    {"id": "test_seat", "quantity": 5},
+                ],
+            }
+        },
+    )
+    assert response.status_code == 201
+    response = test_client.get("/assembly/test_car/explode")
+    assert response.json()["data"] == {
+        "test_wheel": 4,
+        "test_bolt": 8,
+        "test_seat": 5,
+    }
+
+    # Invalid quantities
+    response = test_client.post("/part", json={"part_name": "test_part4"})
+    assert response.status_code == 201
+    for quantities in [{"test_part4": 0}, {"test_part4": True}, {"unknown": 2}]:
+        response = test_client.post(
+            "/assembly",
+            json={
+                "assembly_name": "test_assembly4",
+                "part_names": ["test_part4"],
+                "quantities": quantities,
+            },
+        )
+        assert response.status_code == 403
+        assert response.json() == {"detail": "Invalid quantity"}
+    response = test_client.post("/assembly/test_car/child/test_part4?quantity=0")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Invalid quantity"}
+    response = test_client.post(
+        "/assembly/import",
+        json={
+            "assembly": {
+                "id": "test_assembly4",
+                "children": [{"id": "test_part4", "quantity": -1}],
+            }
+        },
+    )
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Invalid quantity"}
+
+    # Unknown assembly
+    response = test_client.get("/assembly/unknown/explode")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Assembly name not created"}
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_shared_subassemblies(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN an assembly is shared with other assemblies (POST) and unshared (PUT)
+    THEN check that traversals follow shared assemblies, visiting each once, that
+    changes inside a shared assembly show up everywhere it is used, and that loops are
+    rejected
+    """
+
+    def ids(endpoint):
+        response = test_client.get(f"/v2{endpoint}")
+        assert response.status_code == 200
+        return [item["id"] for item in response.json()["data"]]
+
+    # Sharing test_assembly, which stays in test_assembly2
+    response = test_client.post("/part", json={"part_name": "test_part3"})
+    assert response.status_code == 201
+    response = test_client.post(
+        "/assembly",
+        json={
+            "assembly_name": "test_assembly3",
+            "part_names": ["test_part3"],
+            "shared_subassembly_names": ["test_assembly"],
+            "quantities": {"test_assembly": 2},
+        },
+    )
+    assert response.status_code == 201
+    assert json.loads(response.json()["data"]) == {
+        "children": [
+            {"id": "test_part3"},
+            {"children": [{"id": "test_part"}], "id": "test_assembly"},
+        ],
+        "id": "test_assembly3",
+    }
+    assert ids("/assembly/test_assembly2/first") == ["test_part2", "test_assembly"]
+    assert ids("/assembly/test_assembly3/first") == ["test_part3", "test_assembly"]
+    assert ids("/assembly/test_assembly3/children") == [
+        "test_part3",
+        "test_assembly",
+        "test_part",
+    ]
+    assert ids("/assembly/test_assembly3/leaves") == ["test_part3", "test_part"]
+    assert ids("/part/test_part/parents") == [
+        "test_assembly2",
+        "test_assembly3",
+        "test_assembly",
+    ]
+    assert ids("/top_assembly") == ["test_assembly2", "test_assembly3"]
+    response = test_client.get("/assembly/test_assembly3/contains/test_part")
+    assert response.json()["data"] is True
+    response = test_client.get("/assembly/test_assembly3/explode")
+    assert response.json()["data"] == {"test_part3": 1, "test_part": 2}
+
+    # Changes inside the shared assembly show up in every assembly using it
+    response = test_client.post("/part", json={"part_name": "test_part4"})
+    assert response.status_code == 201
+    response = test_client.post("/assembly/test_assembly/child/test_part4?quantity=3")
+    assert response.status_code == 200
+    assert ids("/assembly/test_assembly3/leaves") == [
+        "test_part3",
+        "test_part",
+        "test_part4",
+    ]
+    response = test_client.get("/assembly/test_assembly3/explode")
+    assert response.json()["data"] == {"test_part3": 1, "test_part": 2, "test_part4": 6}
+    response = test_client.get("/assembly/test_assembly2/explode")
+    assert response.json()["data"] == {"test_part2": 1, "test_part": 1, "test_part4": 3}
+
+    # Assemblies reached twice are visited once
+    response = test_client.post("/assembly/test_assembly2/shared/test_assembly3")
+    assert response.status_code == 200
+    assert ids("/assembly/test_assembly2/children") == [
+        "test_part2",
+        "test_assembly",
+        "test_part",
+        "test_part4",
+        "test_assembly3",
+        "test_part3",
+    ]
+    response = test_client.get("/assembly/test_assembly2/explode")
+    assert response.json()["data"] == {
+        "test_part2": 1,
+        "test_part": 3,
+        "test_part4": 9,
+        "test_part3": 1,
+    }
+
+    # Loops, children and unknown assemblies are rejected
+    for assembly_name, subassembly_name, detail in [
+        (
+            "test_assembly",
+            "test_assembly3",
+            "Subassembly name provided contains assembly",
+        ),
+        (
+            "test_assembly",
+            "test_assembly",
+            "Subassembly name provided contains assembly",
+        ),
+        (
+            "test_assembly3",
+            "test_assembly2",
+            "Subassembly name provided contains assembly",
+        ),
+        ("test_assembly2", "test_assembly", "Subassembly name provided in assembly"),
+        ("test_assembly3", "test_assembly", "Subassembly name provided in assembly"),
+        ("test_assembly3", "unknown", "Subassembly name doesn't exist"),
+        ("unknown", "test_assembly", "Assembly name doesn't exist"),
+    ]:
+        response = test_client.post(
+            f"/assembly/{assembly_name}/shared/{subassembly_name}"
+        )
+        assert response.status_code == 403
+        assert response.json() == {"detail": detail}
+
+    # Unsharing
+    response = test_client.put("/assembly/test_assembly2/shared/test_assembly3")
+    assert response.status_code == 200
+    assert ids("/assembly/test_assembly2/first") == ["test_part2", "test_assembly"]
+    response = test_client.put("/assembly/test_assembly2/shared/test_assembly3")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Subassembly name provided not shared"}
+
+    # Shared assemblies are saved with projects
+    response = test_client.post("/project/test_shared_project")
+    assert response.status_code == 201
+    response = test_client.get("/project/test_shared_project")
+    assert response.status_code == 200
+    assert ids("/assembly/test_assembly3/children") == [
+        "test_part3",
+        "test_assembly",
+        "test_part",
+        "test_part4",
+    ]
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
 def test_get_part_ancestors(test_client, create_multi_level_assembly):
     """
     GIVEN a FastAPI application
@@ -494,6 +929,473 @@ def test_get_part_ancestors(test_client, create_multi_level_assembly):
     assert response.status_code == 201
 
 
+def test_assembly_etag(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN '/assembly/{assembly_name}' and its subtree reads are requested (GET) with
+    If-None-Match
+    THEN check that an unchanged assembly returns 304, and that changes below an
+    assembly, including inside an assembly it shares, change its ETag
+    """
+
+    endpoints = [
+        "/assembly/test_assembly2",
+        "/assembly/test_assembly2/first",
+        "/assembly/test_assembly2/children",
+        "/assembly/test_assembly2/leaves",
+        "/assembly/test_assembly2/explode",
+        "/v2/assembly/test_assembly2",
+        "/v2/assembly/test_assembly2/children",
+    ]
+    etag = test_client.get("/assembly/test_assembly2").headers["ETag"]
+    for endpoint in endpoints:
+        response = test_client.get(endpoint)
+        assert response.status_code == 200
+        assert response.headers["ETag"] == etag
+        response = test_client.get(endpoint, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+    response = test_client.get(
+        "/assembly/test_assembly2", headers={"If-None-Match": f'"other", W/{etag}'}
+    )
+    assert response.status_code == 304
+
+    # Pages are representations of their own, and streams aren't versioned
+    page = "/assembly/test_assembly2/children?limit=1"
+    response = test_client.get(page, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    page_etag = response.headers["ETag"]
+    assert page_etag != etag
+    cursor = response.json()["next"]
+    response = test_client.get(page, headers={"If-None-Match": page_etag})
+    assert response.status_code == 304
+    response = test_client.get(
+        "/assembly/test_assembly2/children",
+        params={"limit": 1, "after": cursor},
+        headers={"If-None-Match": page_etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] not in (etag, page_etag)
+    response = test_client.get(
+        "/assembly/test_assembly2/children?stream=true",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+    # Changes below an assembly change the ETag of every assembly above it
+    subassembly_etag = test_client.get("/assembly/test_assembly").headers["ETag"]
+    response = test_client.post("/part", json={"part_name": "test_part3"})
+    assert response.status_code == 201
+    response = test_client.post(
+        "/assembly",
+        json={"assembly_name": "test_assembly3", "part_names": ["test_part3"]},
+    )
+    assert response.status_code == 201
+    response = test_client.get("/assembly/test_assembly2")
+    assert response.headers["ETag"] == etag
+    response = test_client.post("/part", json={"part_name": "test_part4"})
+    assert response.status_code == 201
+    response = test_client.post("/assembly/test_assembly/child/test_part4")
+    assert response.status_code == 200
+    response = test_client.get(
+        "/assembly/test_assembly2", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "test_part4" in response.json()["data"]
+    response = test_client.get(
+        "/assembly/test_assembly", headers={"If-None-Match": subassembly_etag}
+    )
+    assert response.status_code == 200
+
+    # Changes inside a shared assembly change the ETag of every assembly sharing it
+    response = test_client.post("/assembly/test_assembly3/shared/test_assembly")
+    assert response.status_code == 200
+    etag = test_client.get("/assembly/test_assembly3").headers["ETag"]
+    response = test_client.put("/assembly/test_assembly/child/test_part4")
+    assert response.status_code == 200
+    response = test_client.get(
+        "/assembly/test_assembly3", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+
+    # Saved projects keep the ETags of their assemblies
+    etag = response.headers["ETag"]
+    response = test_client.post("/project/test_etag_project")
+    assert response.status_code == 201
+    response = test_client.get("/project/test_etag_project")
+    assert response.status_code == 200
+    response = test_client.get(
+        "/assembly/test_assembly3", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_get_part_where_used(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN the '/part/{part_name}/where_used' and '/part/where_used' endpoints are
+    requested (GET/POST)
+    THEN check that the names of the ancestors are returned, and follow ancestors
+    being reparented
+    """
+
+    response = test_client.get("/part/test_part/where_used")
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "Success",
+        "data": ["test_assembly2", "test_assembly"],
+    }
+
+    # Moving an ancestor under a new top-level assembly
+    response = test_client.post("/part", json={"part_name": "test_part3"})
+    assert response.status_code == 201
+    response = test_client.post(
+        "/assembly",
+        json={
+            "assembly_name": "test_assembly3",
+            "part_names": ["test_part3"],
+            "subassembly_names": ["test_assembly2"],
+        },
+    )
+    assert response.status_code == 201
+    response = test_client.get("/part/test_part/where_used")
+    assert response.json()["data"] == [
+        "test_assembly3",
+        "test_assembly2",
+        "test_assembly",
+    ]
+
+    # Getting many parts at once, reporting parts not created
+    response = test_client.post("/part", json={"part_name": "test_part4"})
+    assert response.status_code == 201
+    response = test_client.post(
+        "/part/where_used",
+        json={"part_names": ["test_part2", "test_part4", "unknown", "test_part2"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["data"] == {
+        "parents": {
+            "test_part2": ["test_assembly3", "test_assembly2"],
+            "test_part4": [],
+        },
+        "errors": [{"index": 2, "part_name": "unknown", "detail": "Part not created"}],
+    }
+
+    # Checking invalid requests
+    response = test_client.get("/part/unknown/where_used")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Part not created"}
+    response = test_client.post("/part/where_used", json={"part_names": []})
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Invalid input"}
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_offloaded_reads(test_client, create_multi_level_assembly, monkeypatch):
+    """
+    GIVEN a FastAPI application with a slow assembly export
+    WHEN health, a part and a new part are requested during the export
+    THEN check that health is returned before the export, the part once the reader
+    thread is free, and the new part only after both reads
+    """
+
+    export_assembly = bom_app.gStore.export_assembly
+
+    def slow_export_assembly(assembly_name):
+        time.sleep(0.5)
+        return export_assembly(assembly_name)
+
+    monkeypatch.setattr(bom_app.gStore, "export_assembly", slow_export_assembly)
+    finished = []
+
+    async def request(client, method, path, **kwargs):
+        response = await client.request(method, path, **kwargs)
+        finished.append((method, path, response.status_code))
+
+    async def run():
+        transport = httpx.ASGITransport(app=bom_app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            export = asyncio.create_task(
+                request(client, "GET", "/assembly/test_assembly2")
+            )
+            await asyncio.sleep(0.1)
+            await asyncio.gather(
+                request(client, "GET", "/health"),
+                request(client, "GET", "/part/test_part"),
+                request(client, "POST", "/part", json={"part_name": "test_part3"}),
+            )
+            await export
+
+    asyncio.run(run())
+    assert finished == [
+        ("GET", "/health", 200),
+        ("GET", "/assembly/test_assembly2", 200),
+        ("GET", "/part/test_part", 200),
+        ("POST", "/part", 201),
+    ]
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_offloaded_write_exports(test_client, create_assembly, monkeypatch):
+    """
+    GIVEN a FastAPI application with a slow assembly export
+    WHEN health and a new part are requested while a write exports its assembly
+    THEN check that the export runs after the write commits, health is returned
+    before it, and the new part only after the write
+    """
+
+    export_assembly = bom_app.gStore.export_assembly
+    transactions = []
+
+    def slow_export_assembly(assembly_name):
+        connection = getattr(bom_app.gStore, "connection", None)
+        transactions.append(connection is not None and connection.in_transaction)
+        time.sleep(0.5)
+        return export_assembly(assembly_name)
+
+    monkeypatch.setattr(bom_app.gStore, "export_assembly", slow_export_assembly)
+    test_client.post("/part", json={"part_name": "test_part2"})
+    finished = []
+
+    async def request(client, method, path, **kwargs):
+        response = await client.request(method, path, **kwargs)
+        finished.append((method, path, response.status_code))
+
+    async def run():
+        transport = httpx.ASGITransport(app=bom_app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            write = asyncio.create_task(
+                request(client, "POST", "/assembly/test_assembly/child/test_part2")
+            )
+            await asyncio.sleep(0.1)
+            await asyncio.gather(
+                request(client, "GET", "/health"),
+                request(client, "POST", "/part", json={"part_name": "test_part3"}),
+            )
+            await write
+
+    asyncio.run(run())
+    assert finished == [
+        ("GET", "/health", 200),
+        ("POST", "/assembly/test_assembly/child/test_part2", 200),
+        ("POST", "/part", 201),
+    ]
+    assert transactions == [False]
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_offloaded_writes(test_client, monkeypatch):
+    """
+    GIVEN a FastAPI application with a slow import
+    WHEN health and a part are requested during the import
+    THEN check that the import runs in the store thread, health is returned before
+    it, and the part only after it
+    """
+
+    import_assembly = bom_app.gStore.import_assembly
+    threads = []
+
+    def slow_import_assembly(assembly):
+        threads.append(threading.current_thread().name)
+        time.sleep(0.5)
+        return import_assembly(assembly)
+
+    monkeypatch.setattr(bom_app.gStore, "import_assembly", slow_import_assembly)
+    test_client.post("/part", json={"part_name": "test_part"})
+    finished = []
+
+    async def request(client, method, path, **kwargs):
+        response = await client.request(method, path, **kwargs)
+        finished.append((method, path, response.status_code))
+
+    async def run():
+        transport = httpx.ASGITransport(app=bom_app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            write = asyncio.create_task(
+                request(
+                    client,
+                    "POST",
+                    "/assembly/import",
+                    json={
+                        "assembly": {
+                            "id": "test_assembly",
+                            "children": [{"id": "test_part"}],
+                        }
+                    },
+                )
+            )
+            await asyncio.sleep(0.1)
+            await asyncio.gather(
+                request(client, "GET", "/health"),
+                request(client, "GET", "/part/test_part"),
+            )
+            await write
+
+    asyncio.run(run())
+    assert finished == [
+        ("GET", "/health", 200),
+        ("POST", "/assembly/import", 201),
+        ("GET", "/part/test_part", 200),
+    ]
+    assert [name.startswith("store") for name in threads] == [True]
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_project_scoped_routes(test_client, monkeypatch):
+    """
+    GIVEN a FastAPI application
+    WHEN parts and assemblies are created under '/project/{project_name}' routes
+    THEN check that each live project has its own parts and assemblies, apart from
+    the working project
+    """
+
+    monkeypatch.setattr(bom_app, "gProjects", {})
+    for project_name in ["team_a", "team_b"]:
+        response = test_client.post(
+            f"/project/{project_name}/part", json={"part_name": "test_part"}
+        )
+        assert response.status_code == 201
+    response = test_client.post(
+        "/project/team_a/assembly",
+        json={"assembly_name": "test_assembly", "part_names": ["test_part"]},
+    )
+    assert response.status_code == 201
+    response = test_client.get("/project/team_a/v2/assembly/test_assembly")
+    assert response.status_code == 200
+    assert response.json()["data"] == {
+        "children": [{"id": "test_part"}],
+        "id": "test_assembly",
+    }
+    response = test_client.get("/project/team_b/orphan")
+    assert response.json()["data"] == json.dumps(['{"id": "test_part"}'])
+    response = test_client.get("/project/team_b/assembly/test_assembly")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Assembly not created"}
+
+    # Checking the working project is untouched
+    response = test_client.get("/part")
+    assert response.json()["data"] == "[]"
+    response = test_client.get("/assembly/test_assembly")
+    assert response.status_code == 403
+
+    # Checking a request started from a context scoped to a live project, as uvicorn
+    # starts the next request on a connection after a large body, is unscoped
+    async def leaked_request():
+        bom_app.gProjectName.set("team_a")
+        transport = httpx.ASGITransport(app=bom_app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.get("/assembly/test_assembly")
+
+    assert asyncio.run(leaked_request()).status_code == 403
+
+    # Checking projects nothing was written to
+    response = test_client.get("/project/team_c/part")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Project name does not exist"}
+    assert "team_c" not in bom_app.gProjects
+
+    # Checking a failed write doesn't leave the project behind
+    response = test_client.post(
+        "/project/team_c/assembly",
+        json={"assembly_name": "test_assembly", "part_names": ["test_part"]},
+    )
+    assert response.status_code == 403
+    assert "team_c" not in bom_app.gProjects
+    response = test_client.get("/project/team_c/part")
+    assert response.status_code == 404
+
+    # Checking live and saved projects can't share a name
+    response = test_client.post("/project/team_a")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Project name is live"}
+    response = test_client.post("/project/team_saved")
+    assert response.status_code == 201
+    response = test_client.post(
+        "/project/team_saved/part", json={"part_name": "test_part"}
+    )
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Project name is saved"}
+    assert "team_saved" not in bom_app.gProjects
+
+
+def test_sqlite_file_projects(tmp_path, monkeypatch):
+    """
+    GIVEN a FastAPI application serving a SQLite database file
+    WHEN projects are saved and loaded, and live projects probed, as the working
+    project's transaction is held
+    THEN check that no request waits on the database lock, and probes of live projects
+    nothing was written to open no connection
+    """
+
+    monkeypatch.setattr(sqlite_store, "BUSY_TIMEOUT", 1)
+    monkeypatch.setattr(
+        bom_app,
+        "gStore",
+        create_store("sqlite", path=str(tmp_path / "bom.sqlite3")),
+    )
+    monkeypatch.setattr(bom_app, "gProjects", {})
+    client = TestClient(bom_app.app)
+    client.post("/part", json={"part_name": "test_part"})
+    client.post(
+        "/assembly",
+        json={"assembly_name": "test_assembly", "part_names": ["test_part"]},
+    )
+    response = client.post("/project/base")
+    assert response.status_code == 201
+    response = client.get("/project/base")
+    assert response.status_code == 200
+    response = client.get("/assembly/test_assembly")
+    assert response.status_code == 200
+
+    # Checking a live project written to by another worker is found on the working
+    # project's connection
+    response = client.post("/project/team_a/part", json={"part_name": "test_part"})
+    assert response.status_code == 201
+    bom_app.gProjects.clear()
+    response = client.post("/project/team_a")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Project name is live"}
+    assert "team_a" not in bom_app.gProjects
+
+    # Checking probes of projects nothing was written to open no store
+    opened = []
+    monkeypatch.setattr(
+        bom_app, "create_store", lambda *args, **kwargs: opened.append(args)
+    )
+    response = client.get("/project/team_b/part")
+    assert response.status_code == 404
+    response = client.post("/project/team_b")
+    assert response.status_code == 201
+    assert not opened
+
+
 def test_post_project(test_client, create_multi_level_assembly):
     """
     GIVEN a FastAPI application
@@ -563,3 +1465,570 @@ def test_get_project(test_client, create_multi_level_assembly):
     # Clearing assembly project before other tests
     response = test_client.post("/project/test_project")
     assert response.status_code == 201
+
+
+def test_paginated_listings(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN the list endpoints are requested (GET) with limit, after and stream
+    THEN check that paging through the cursors or streaming NDJSON returns the same
+    items as the unpaginated listing
+    """
+
+    part_names = [f"test_paged_part_{i}" for i in range(7)]
+    response = test_client.post("/part/batch", json={"part_names": part_names})
+    assert response.status_code == 201
+    # A part and an assembly sharing a name, which subtree cursors tell apart
+    response = test_client.post("/part", json={"part_name": "test_twin"})
+    assert response.status_code == 201
+    response = test_client.post(
+        "/assembly",
+        json={"assembly_name": "test_twin", "part_names": ["test_twin"]},
+    )
+    assert response.status_code == 201
+    response = test_client.post(
+        "/assembly",
+        json={
+            "assembly_name": "test_assembly3",
+            "part_names": part_names[:4],
+            "subassembly_names": ["test_assembly2", "test_twin"],
+        },
+    )
+    assert response.status_code == 201
+
+    for path in [
+        "/part",
+        "/assembly",
+        "/assembly/test_assembly3/children",
+        "/assembly/test_assembly3/leaves",
+    ]:
+        expected = json.loads(test_client.get(path).json()["data"])
+        assert len(expected) > 1
+
+        # Paging through with every page size
+        for limit in range(1, len(expected) + 1):
+            items = []
+            params = {"limit": limit}
+            while True:
+                response = test_client.get(path, params=params)
+                assert response.status_code == 200
+                response_json = response.json()
+                page = json.loads(response_json["data"])
+                assert len(page) <= limit
+                items.extend(page)
+                if response_json["next"] is None:
+                    break
+                params["after"] = response_json["next"]
+            assert items == expected
+
+        # Streaming everything as NDJSON, then resuming after the first item
+        response = test_client.get(path, params={"stream": True})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.text.splitlines() == expected
+        after = test_client.get(path, params={"limit": 1}).json()["next"]
+        response = test_client.get(path, params={"stream": True, "after": after})
+        assert response.text.splitlines() == expected[1:]
+        response = test_client.get(path, params={"stream": True, "limit": 1})
+        assert response.text.splitlines() == expected[:1]
+
+        # Invalid limit and cursor
+        response = test_client.get(path, params={"limit": 0})
+        assert response.status_code == 403
+        assert response.json() == {"detail": "Invalid limit"}
+        response = test_client.get(path, params={"after": "unknown"})
+        assert response.status_code == 403
+        assert response.json() == {"detail": "Invalid cursor"}
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_stream_mutations(test_client, monkeypatch):
+    """
+    GIVEN a FastAPI application streaming listings two items per chunk
+    WHEN items are deleted, reparented or created between chunks
+    THEN check that the stream still returns every item, and none created since it
+    started or deleted before it reached them
+    """
+
+    part_names = [f"test_part_{i}" for i in range(8)]
+    test_client.post("/part/batch", json={"part_names": part_names})
+    test_client.post(
+        "/assembly", json={"assembly_name": "test_assembly", "part_names": part_names}
+    )
+    test_client.post("/part", json={"part_name": "test_spare"})
+    monkeypatch.setattr(bom_app, "STREAM_CHUNK_SIZE", 2)
+    offload = bom_app.offload
+
+    def offload_then(mutation):
+        # Applying a mutation after the first chunk is read
+        calls = []
+
+        async def mutating_offload(function, *args):
+            result = await offload(function, *args)
+            if function.__name__ == "read_chunk" and not calls:
+                calls.append(function)
+                mutation()
+            return result
+
+        monkeypatch.setattr(bom_app, "offload", mutating_offload)
+
+    expected = [json.dumps({"id": name}) for name in part_names]
+    offload_then(lambda: bom_app.gStore.detach_part("test_part_1"))
+    response = test_client.get("/assembly/test_assembly/leaves", params={"stream": 1})
+    assert response.text.splitlines() == expected
+    offload_then(lambda: bom_app.gStore.delete_part("test_part_1"))
+    response = test_client.get("/part", params={"stream": True})
+    assert response.text.splitlines() == expected + ['{"id": "test_spare"}']
+
+    # Checking parts created since the stream started are left out
+    offload_then(lambda: bom_app.gStore.create_parts(["test_late"]))
+    response = test_client.get("/part", params={"stream": True})
+    assert response.text.splitlines() == [
+        json.dumps({"id": name})
+        for name in part_names + ["test_spare"]
+        if name != "test_part_1"
+    ]
+
+    # Checking descendants deleted in a later chunk are left out
+    offload_then(lambda: bom_app.gStore.delete_part("test_part_5"))
+    response = test_client.get(
+        "/assembly/test_assembly/children", params={"stream": True}
+    )
+    assert response.text.splitlines() == [
+        json.dumps({"id": name})
+        for name in part_names
+        if name not in ("test_part_1", "test_part_5")
+    ]
+
+    # Clearing assembly project before other tests
+    monkeypatch.setattr(bom_app, "offload", offload)
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_v2_native_json(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN the '/v2' read endpoints are requested (GET)
+    THEN check that they return the same items as the original endpoints, as nested
+    JSON decoded once
+    """
+
+    for path in [
+        "/part",
+        "/assembly",
+        "/part/test_part/parents",
+        "/assembly/test_assembly2/first",
+        "/assembly/test_assembly2/children",
+        "/assembly/test_assembly2/leaves",
+        "/top_assembly",
+        "/subassembly",
+        "/component",
+        "/orphan",
+    ]:
+        response = test_client.get(f"/v2{path}")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        response_json = response.json()
+        assert response_json["status"] == "Success"
+        expected = json.loads(test_client.get(path).json()["data"])
+        assert response_json["data"] == [json.loads(item) for item in expected]
+
+    for path in ["/part/test_part", "/assembly/test_assembly2"]:
+        response = test_client.get(f"/v2{path}")
+        assert response.status_code == 200
+        expected = json.loads(test_client.get(path).json()["data"])
+        assert response.json() == {"status": "Success", "data": expected}
+    response = test_client.get("/v2/part/unknown")
+    assert response.json() == {"status": "Success", "data": None}
+
+    # Paging with and without the fast encoder
+    fast_encoder = bom_app.orjson
+    for encoder in [fast_encoder, None]:
+        bom_app.orjson = encoder
+        response = test_client.get("/v2/part", params={"limit": 1})
+        assert response.json() == {
+            "status": "Success",
+            "data": [{"id": "test_part"}],
+            "next": "test_part",
+        }
+        response = test_client.get(
+            "/v2/part", params={"limit": 1, "after": "test_part"}
+        )
+        assert response.json() == {
+            "status": "Success",
+            "data": [{"id": "test_part2"}],
+            "next": None,
+        }
+    bom_app.orjson = fast_encoder
+
+    # Errors match the original endpoints
+    response = test_client.get("/v2/assembly/unknown")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Assembly not created"}
+    response = test_client.get("/v2/assembly/unknown/children")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Assembly name not created"}
+    response = test_client.get("/v2/part/unknown/parents")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Part not created"}
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_classification_indexes(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN parts are attached, detached and deleted, and projects are saved and loaded
+    THEN check that the orphan, component, top-level and subassembly listings follow
+    every parent change
+    """
+
+    def listed_ids(endpoint):
+        response = test_client.get(endpoint)
+        assert response.status_code == 200
+        return [json.loads(item)["id"] for item in json.loads(response.json()["data"])]
+
+    assert listed_ids("/top_assembly") == ["test_assembly2"]
+    assert listed_ids("/subassembly") == ["test_assembly"]
+    assert set(listed_ids("/component")) == {"test_part", "test_part2"}
+    assert listed_ids("/orphan") == []
+
+    # Detaching a part makes it an orphan
+    response = test_client.put("/assembly/test_assembly/child/test_part")
+    assert response.status_code == 200
+    assert listed_ids("/orphan") == ["test_part"]
+    assert listed_ids("/component") == ["test_part2"]
+
+    # Re-attaching a part makes it a component again
+    response = test_client.post("/assembly/test_assembly/child/test_part")
+    assert response.status_code == 200
+    assert listed_ids("/orphan") == []
+    # Listings keep creation order however items move between indexes
+    assert listed_ids("/component") == ["test_part", "test_part2"]
+
+    # A rejected assembly leaves the indexes untouched
+    test_client.post("/part", json={"part_name": "test_part3"})
+    response = test_client.post(
+        "/assembly",
+        json={
+            "assembly_name": "test_assembly3",
+            "part_names": ["test_part3"],
+            "subassembly_names": ["test_assembly"],
+        },
+    )
+    assert response.status_code == 403
+    assert listed_ids("/orphan") == ["test_part3"]
+
+    # Deleted parts are dropped from the indexes
+    response = test_client.delete("/part/test_part3")
+    assert response.status_code == 200
+    assert listed_ids("/orphan") == []
+    for name in ("test_part4", "test_part5", "test_part6"):
+        test_client.post("/part", json={"part_name": name})
+    response = test_client.post("/assembly/test_assembly/child/test_part4")
+    assert response.status_code == 200
+    response = test_client.put("/assembly/test_assembly/child/test_part4")
+    assert response.status_code == 200
+    assert listed_ids("/orphan") == ["test_part4", "test_part5", "test_part6"]
+
+    # Indexes are saved and loaded along with the project
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+    assert listed_ids("/top_assembly") == []
+    response = test_client.get("/project/test_project")
+    assert response.status_code == 200
+    assert listed_ids("/top_assembly") == ["test_assembly2"]
+    assert listed_ids("/component") == ["test_part", "test_part2"]
+    assert listed_ids("/orphan") == ["test_part4", "test_part5", "test_part6"]
+
+    # Loaded parts are attached to the loaded assemblies
+    response = test_client.put("/assembly/test_assembly/child/test_part")
+    assert response.status_code == 200
+    response = test_client.get("/assembly/test_assembly2/leaves")
+    leaves = {json.loads(item)["id"] for item in json.loads(response.json()["data"])}
+    assert leaves == {"test_assembly", "test_part2"}
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_assembly_export_cache(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN an assembly is requested (GET) before and after its subtree changes
+    THEN check that the export matches anytree's JsonExporter and reflects every change
+    """
+
+    def export_matches_anytree(data):
+        exported = JsonExporter(sort_keys=True).export(JsonImporter().import_(data))
+        return exported == data
+
+    # Getting the assembly twice serves the same export
+    first = test_client.get("/assembly/test_assembly2").json()["data"]
+    assert test_client.get("/assembly/test_assembly2").json()["data"] == first
+    assert export_matches_anytree(first)
+
+    # Attaching a part to a subassembly shows up in the top-level export
+    test_client.post("/part", json={"part_name": "test_part3"})
+    response = test_client.post("/assembly/test_assembly/child/test_part3")
+    assert response.status_code == 200
+    data = test_client.get("/assembly/test_assembly2").json()["data"]
+    assert export_matches_anytree(data)
+    assert "test_part3" in data
+
+    # Detaching and deleting parts shows up in the top-level export
+    response = test_client.put("/assembly/test_assembly/child/test_part3")
+    assert response.status_code == 200
+    assert test_client.get("/assembly/test_assembly2").json()["data"] == first
+    response = test_client.delete("/part/test_part2")
+    assert response.status_code == 200
+    data = test_client.get("/assembly/test_assembly2").json()["data"]
+    assert export_matches_anytree(data)
+    assert "test_part2" not in data
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_project_snapshots(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN a saved project is loaded, mutated and saved as a variant
+    THEN check that the saved project is left unchanged
+    """
+
+    # Saving the base project
+    response = test_client.post("/project/test_base")
+    assert response.status_code == 201
+    response = test_client.get("/project/test_base")
+    assert response.status_code == 200
+    base = test_client.get("/assembly/test_assembly2").json()["data"]
+
+    # Building a variant on top of the loaded base project
+    test_client.post("/part", json={"part_name": "test_part3"})
+    response = test_client.post("/assembly/test_assembly/child/test_part3")
+    assert response.status_code == 200
+    response = test_client.put("/assembly/test_assembly2/child/test_part2")
+    assert response.status_code == 200
+    response = test_client.delete("/part/test_part")
+    assert response.status_code == 200
+    variant = test_client.get("/assembly/test_assembly2").json()["data"]
+    response = test_client.post("/project/test_variant")
+    assert response.status_code == 201
+
+    # Loading the base project again shows none of the variant's changes
+    response = test_client.get("/project/test_base")
+    assert response.status_code == 200
+    assert test_client.get("/assembly/test_assembly2").json()["data"] == base
+    assert test_client.get("/part/test_part3").json()["data"] is None
+    response = test_client.get("/orphan")
+    assert json.loads(response.json()["data"]) == []
+
+    # Loading the variant shows all of its changes
+    response = test_client.get("/project/test_variant")
+    assert response.status_code == 200
+    assert test_client.get("/assembly/test_assembly2").json()["data"] == variant
+    response = test_client.get("/orphan")
+    data_json = json.loads(response.json()["data"])
+    assert [json.loads(item)["id"] for item in data_json] == ["test_part2"]
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_variant_projects(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN saved projects are loaded, mutated and saved as variants of them
+    THEN check that only the changes are saved, and loading a variant replays them on
+    its chain of bases
+    """
+
+    # Saving a variant needs a copied project, which the variant can't replace
+    response = test_client.post("/project/test_variant_1?variant=true")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "No project copied"}
+    response = test_client.post("/project/test_variant_base")
+    assert response.status_code == 201
+    response = test_client.get("/project/test_variant_base")
+    assert response.status_code == 200
+    response = test_client.post("/project/test_variant_base?variant=true")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Variant can't replace its base"}
+
+    # Building and saving a variant of the base project
+    test_client.post("/part", json={"part_name": "test_part3"})
+    test_client.post("/assembly/test_assembly/child/test_part3")
+    test_client.put("/assembly/test_assembly2/child/test_part2")
+    response = test_client.post("/project/test_variant_1?variant=true")
+    assert response.status_code == 201
+    assert response.json() == {"status": "Success", "message": "Variant saved"}
+    assert len(bom_app.gStore.variant_delta("test_variant_1")) == 3
+    response = test_client.get("/part")
+    assert response.json()["data"] == "[]"
+
+    # Building a variant of the variant
+    response = test_client.get("/project/test_variant_1")
+    assert response.status_code == 200
+    response = test_client.delete("/part/test_part")
+    assert response.status_code == 200
+    variant = test_client.get("/v2/assembly/test_assembly2").json()["data"]
+    response = test_client.post("/project/test_variant_2?variant=true")
+    assert response.status_code == 201
+    assert bom_app.gStore.project_base("test_variant_2") == "test_variant_1"
+
+    # Loading each project of the chain shows the changes made up to it
+    response = test_client.get("/project/test_variant_2")
+    assert response.status_code == 200
+    assert test_client.get("/v2/assembly/test_assembly2").json()["data"] == variant
+    response = test_client.get("/orphan")
+    data_json = json.loads(response.json()["data"])
+    assert [json.loads(item)["id"] for item in data_json] == ["test_part2"]
+    response = test_client.get("/project/test_variant_1")
+    assert test_client.get("/part/test_part").json()["data"] is not None
+    response = test_client.get("/project/test_variant_base")
+    assert test_client.get("/part/test_part3").json()["data"] is None
+
+    # Projects with variants can't be replaced
+    for project_name in ["test_variant_base", "test_variant_1"]:
+        response = test_client.post(f"/project/{project_name}")
+        assert response.status_code == 403
+        assert response.json() == {"detail": "Project has variants"}
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_project_diff(test_client, create_multi_level_assembly):
+    """
+    GIVEN a FastAPI application
+    WHEN the '/project/{project_name}/diff/{other_name}' endpoint is requested (GET)
+    THEN check that the nodes added, removed and moved between the projects are
+    returned
+    """
+
+    # Saving a base project and a variant of it
+    response = test_client.post("/project/test_diff_base")
+    assert response.status_code == 201
+    test_client.get("/project/test_diff_base")
+    test_client.post("/part", json={"part_name": "test_part3"})
+    test_client.post("/assembly/test_assembly/child/test_part3?quantity=2")
+    test_client.put("/assembly/test_assembly2/child/test_part2")
+    test_client.delete("/part/test_part")
+    response = test_client.post("/project/test_diff_variant?variant=true")
+    assert response.status_code == 201
+
+    response = test_client.get("/project/test_diff_base/diff/test_diff_variant")
+    assert response.status_code == 200
+    assert response.json()["data"] == {
+        "added": [
+            {
+                "kind": "part",
+                "id": "test_part3",
+                "parent": "test_assembly",
+                "quantity": 2,
+            }
+        ],
+        "removed": [
+            {
+                "kind": "part",
+                "id": "test_part",
+                "parent": "test_assembly",
+                "quantity": 1,
+            }
+        ],
+        "changed": [
+            {
+                "kind": "part",
+                "id": "test_part2",
+                "parent": ["test_assembly2", None],
+                "quantity": [1, 1],
+            }
+        ],
+        "shared": [],
+        "unshared": [],
+    }
+
+    # Comparing a project with itself finds no changes
+    response = test_client.get("/project/test_diff_base/diff/test_diff_base")
+    assert response.status_code == 200
+    assert all(entries == [] for entries in response.json()["data"].values())
+
+    response = test_client.get("/project/test_diff_base/diff/test_diff_missing")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Project name does not exist"}
+
+
+def test_metrics(test_client, create_multi_level_assembly, monkeypatch):
+    """
+    GIVEN a FastAPI application
+    WHEN the '/metrics' endpoint is requested (GET) after reads, project copies and
+    writes to a live project
+    THEN check that request latencies are counted by route, exports and copies are
+    timed, and the working and live projects are measured
+    """
+
+    monkeypatch.setattr(bom_app, "gMetrics", Metrics())
+    monkeypatch.setattr(bom_app, "gProjects", {})
+    for _ in range(2):
+        test_client.get("/assembly/test_assembly2")
+    test_client.post("/project/test_metrics")
+    test_client.get("/project/test_metrics")
+    test_client.post("/project/team_a/part", json={"part_name": "test_part"})
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert "# TYPE bom_request_duration_seconds histogram" in lines
+    assert (
+        'bom_request_duration_seconds_count{method="GET",'
+        'route="/assembly/{assembly_name}"} 2'
+    ) in lines
+    assert (
+        'bom_request_duration_seconds_bucket{method="GET",'
+        'route="/assembly/{assembly_name}",le="+Inf"} 2'
+    ) in lines
+    assert (
+        'bom_request_duration_seconds_count{method="POST",'
+        'route="/project/{project_name}/part"} 1'
+    ) in lines
+    assert 'bom_requests_in_flight{method="GET",route="/metrics"} 1' in lines
+    assert 'bom_export_duration_seconds_count{method="export_assembly"} 2' in lines
+    size = len(bom_app.gStore.export_assembly("test_assembly2"))
+    assert f'bom_export_bytes_total{{method="export_assembly"}} {2 * size}' in lines
+    for method in ["save_project", "load_project"]:
+        assert (
+            f'bom_project_copy_duration_seconds_count{{method="{method}"}} 1' in lines
+        )
+    assert 'bom_parts{project=""} 2' in lines
+    assert 'bom_assemblies{project=""} 2' in lines
+    assert 'bom_tree_depth{project=""} 2' in lines
+    assert 'bom_parts{project="team_a"} 1' in lines
+    assert 'bom_tree_depth{project="team_a"} 0' in lines
+    assert "bom_live_projects 1" in lines
+    saved = bom_app.gStore.project_names()
+    assert "test_metrics" in saved
+    assert f"bom_saved_projects {len(saved)}" in lines
+
+    # Checking exports returning an iterator are passed through unconsumed
+    class IteratingStore:
+        def export_items(self):
+            yield '{"id": "test_part"}'
+
+    items = MeteredStore(IteratingStore(), Metrics()).export_items()
+    assert list(items) == ['{"id": "test_part"}']
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
@@ -0,0 +1,141 @@
+"""
+This file contains tests for the saved project archive in the storage/archive.py file
+"""
+
+import gc
+import pytest
+from storage import create_store
+from storage.archive import Archive
+
+
+def build_project(store, part_name):
+    # Two subassemblies under a top-level assembly, one of them holding a given part
+    store.create_parts(["test_part_1", "test_part_2", part_name])
+    store.create_assembly("test_assembly_1", ["test_part_1"], [], {"test_part_1": 2})
+    store.create_assembly("test_assembly_2", ["test_part_2", part_name], [])
+    store.create_assembly("test_assembly_3", [], ["test_assembly_1", "test_assembly_2"])
+
+
+@pytest.mark.parametrize("backend", ["memory", "compact"])
+def test_archive_interning(backend):
+    """
+    GIVEN an in-memory store
+    WHEN projects with identical subassemblies are built apart and saved
+    THEN check that identical subtrees are archived once, and freed with their projects
+    """
+
+    store = create_store(backend)
+    build_project(store, "test_part_3")
+    store.save_project("test_project_1")
+    build_project(store, "test_part_3")
+    store.save_project("test_project_2")
+    build_project(store, "test_part_4")
+    store.save_project("test_project_3")
+
+    first, second, third = (
+        store.projects[f"test_project_{number}"].roots[0] for number in (1, 2, 3)
+    )
+    assert first is second
+    assert first is not third
+    assert first.children[0] is third.children[0]
+    assert first.children[1] is not third.children[1]
+    # Three distinct subtrees in the first two projects, and two more in the third
+    assert len(store.archive.subtrees) == 5
+
+    del first, second, third
+    store.load_project("test_project_3")
+    store.save_variant("test_project_3")
+    gc.collect()
+    assert len(store.archive.subtrees) == 3
+
+
+@pytest.mark.parametrize("backend", ["memory", "compact"])
+def test_archive_cold_load(backend):
+    """
+    GIVEN an in-memory store keeping no saved project built
+    WHEN projects are saved and loaded back from the archive
+    THEN check that every project loads as saved, and keeps its listing orders
+    """
+
+    store = create_store(backend)
+    store.archive = Archive(hot_projects=0)
+    build_project(store, "test_part_3")
+    store.create_parts(["test_part_5", "test_part_4"])
+    store.share_assembly("test_assembly_1", "test_assembly_2", 2)
+    store.detach_part("test_part_1")
+    expected = [
+        store.export_parts(),
+        store.export_assemblies(),
+        store.export_top_assemblies(),
+        store.export_subassemblies(),
+        store.export_components(),
+        store.export_orphans(),
+        store.explode_assembly("test_assembly_1"),
+    ]
+    store.save_project("test_project")
+    assert not store.archive.hot
+
+    store.load_project("test_project")
+    assert [
+        store.export_parts(),
+        store.export_assemblies(),
+        store.export_top_assemblies(),
+        store.export_subassemblies(),
+        store.export_components(),
+        store.export_orphans(),
+        store.explode_assembly("test_assembly_1"),
+    ] == expected
+    assert store.explode_assembly("test_assembly_1") == {
+        "test_part_2": 2,
+        "test_part_3": 2,
+    }
+    store.attach_part("test_assembly_2", "test_part_1")
+    store.save_project("test_project_2")
+    assert store.diff_projects("test_project", "test_project_2")["changed"] == [
+        {
+            "kind": "part",
+            "id": "test_part_1",
+            "parent": [None, "test_assembly_2"],
+            "quantity": [1, 1],
+        }
+    ]
+
+
+def test_copy_on_write_path():
+    """
+    GIVEN an in-memory store with a saved project loaded
+    WHEN a part is attached to a subassembly of the project
+    THEN check that only the path from it to the root is copied, the snapshot is left
+    as saved, and lookups through the shared nodes see the copies
+    """
+
+    store = create_store("memory")
+    build_project(store, "test_part_3")
+    expected = store.export_assembly("test_assembly_3")
+    store.save_project("test_project")
+    store.load_project("test_project")
+    saved = {**store.parts, **store.assemblies}
+
+    store.create_parts(["test_part_4"])
+    store.attach_part("test_assembly_1", "test_part_4")
+    current = {**store.parts, **store.assemblies}
+    assert [name for name in saved if current[name] is not saved[name]] == [
+        "test_assembly_1",
+        "test_assembly_3",
+    ]
+    assert store.assembly_contains("test_assembly_3", "part", "test_part_3")
+    assert store.part_where_used("test_part_3") == [
+        "test_assembly_3",
+        "test_assembly_2",
+    ]
+    assert store.tree_depth() == 2
+    assert store.export_part_ancestors("test_part_2") == [
+        store.export_assembly("test_assembly_3"),
+        store.export_assembly("test_assembly_2"),
+    ]
+    assert '"test_part_4"' in store.export_assembly("test_assembly_3")
+
+    store.detach_part("test_part_3")
+    assert store.export_orphans() == ['{"id": "test_part_3"}']
+    store.load_project("test_project")
+    assert store.export_assembly("test_assembly_3") == expected
@@ -0,0 +1,64 @@
+"""
+This file contains tests for the nested interval labels in the
+storage/compact_store.py file
+"""
+
+from storage import create_store
+from storage.compact_store import CompactTree
+
+
+def test_stale_labels(monkeypatch):
+    """
+    GIVEN a compact store with a labeled tree of one large and one small subassembly
+    WHEN a part is attached deep in the tree, then its subassemblies are listed
+    THEN check that ancestry and the small listing are answered without relabeling,
+    and that only listing a large share of the tree relabels it
+    """
+
+    store = create_store("compact")
+    store.import_assembly(
+        {
+            "id": "test_top",
+            "children": [
+                {
+                    "id": "test_large",
+                    "children": [
+                        {"id": f"test_assembly_{i}", "children": [{"id": f"p{i}"}]}
+                        for i in range(20)
+                    ],
+                },
+                {"id": "test_small", "children": [{"id": "s1"}, {"id": "s2"}]},
+            ],
+        }
+    )
+    store.create_parts(["test_part"])
+    tree = store.tree
+    top = tree.assembly_ids["test_top"]
+    assert len(store.export_descendants("test_top")) == 44
+    assert tree.label_orders[top] and not tree.stale_roots
+
+    labeled = []
+    label = CompactTree.label
+
+    def counted_label(self, node):
+        labeled.append(node)
+        return label(self, node)
+
+    monkeypatch.setattr(CompactTree, "label", counted_label)
+    store.attach_part("test_assembly_7", "test_part")
+    assert tree.stale_roots == {top}
+    assert store.assembly_contains("test_top", "part", "test_part")
+    assert store.assembly_contains("test_large", "part", "test_part")
+    assert not store.assembly_contains("test_small", "part", "test_part")
+    assert store.export_descendants("test_small") == ['{"id": "s1"}', '{"id": "s2"}']
+    assert [key for key, _ in store.iter_descendants("test_small", ("part", "s1"))] == [
+        ("part", "s2")
+    ]
+    assert labeled == []
+
+    descendants = store.export_descendants("test_large")
+    assert descendants[14:16] == [
+        '{"children": [{"id": "p7"}, {"id": "test_part"}], "id": "test_assembly_7"}',
+        '{"id": "p7"}',
+    ]
+    assert labeled == [top] and not tree.stale_roots
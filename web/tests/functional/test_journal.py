@@ -0,0 +1,144 @@
+"""
+This file contains tests for the crash recovery journal in the storage/journal.py file
+"""
+
+import asyncio
+import app as bom_app
+from storage import create_store
+from storage.journal import Journal, JournaledStore
+
+
+def export_all(store):
+    # Every listing the API serves from a store, to compare two stores by
+    return [
+        store.export_parts(),
+        store.export_assemblies(),
+        store.export_top_assemblies(),
+        store.export_subassemblies(),
+        store.export_components(),
+        store.export_orphans(),
+    ]
+
+
+def compact(store, journal, monkeypatch):
+    # Compacting a journal as the API periodically does, with its store as the
+    # working project's
+    monkeypatch.setattr(bom_app, "gStore", store)
+    monkeypatch.setattr(bom_app, "gJournal", journal)
+    monkeypatch.setattr(bom_app, "gProjects", {})
+    asyncio.run(bom_app.compact_journals())
+
+
+def test_journal_recovery(tmp_path, monkeypatch):
+    """
+    GIVEN a memory store journaled to a directory
+    WHEN it is mutated, compacted, mutated again and recovered into a new store
+    THEN check that the recovered store matches the original, including saved projects
+    """
+
+    journal = Journal(str(tmp_path))
+    store = JournaledStore(create_store("memory"), journal)
+    store.create_parts(["test_part_1", "test_part_2", "test_part_3"])
+    store.create_assembly(
+        "test_assembly_1", ["test_part_1", "test_part_2"], [], {"test_part_2": 2}
+    )
+    store.save_project("test_project")
+    store.load_project("test_project")
+    compact(store, journal, monkeypatch)
+    assert journal.pending == 0
+    store.create_parts(["test_part_4"])
+    store.detach_part("test_part_1")
+    store.import_assembly(
+        {"id": "test_assembly_2", "children": [{"id": "test_part_4"}, {"id": "x"}]}
+    )
+    store.create_assembly(
+        "test_assembly_3", ["test_part_1"], ["test_assembly_1"], {"test_assembly_1": 3}
+    )
+    store.delete_part("test_part_2")
+    store.share_assembly("test_assembly_2", "test_assembly_1", 2)
+    journal.close()
+
+    recovered = create_store("memory")
+    recovery = Journal(str(tmp_path)).recover(recovered)
+    assert recovery["snapshot"] == 1
+    assert recovery["records"] == 6
+    assert export_all(recovered) == export_all(store)
+    assert recovered.export_assembly("test_assembly_3") == store.export_assembly(
+        "test_assembly_3"
+    )
+    assert recovered.explode_assembly("test_assembly_3") == {"test_part_1": 1}
+    assert recovered.explode_assembly("test_assembly_2") == store.explode_assembly(
+        "test_assembly_2"
+    )
+    recovered.load_project("test_project")
+    store.store.load_project("test_project")
+    assert export_all(recovered) == export_all(store)
+    assert recovered.explode_assembly("test_assembly_1") == {
+        "test_part_1": 1,
+        "test_part_2": 2,
+    }
+
+
+def test_journal_torn_record(tmp_path):
+    """
+    GIVEN a journal whose last record was cut off by a crash
+    WHEN it is recovered and appended to
+    THEN check that the torn record is dropped and later records are replayed
+    """
+
+    journal = Journal(str(tmp_path))
+    store = JournaledStore(create_store("memory"), journal)
+    store.create_parts(["test_part_1"])
+    journal.file.write('["create_parts",["test_')
+    journal.close()
+
+    journal = Journal(str(tmp_path))
+    store = create_store("memory")
+    assert journal.recover(store)["records"] == 1
+    JournaledStore(store, journal).create_parts(["test_part_2"])
+    journal.close()
+
+    recovered = create_store("memory")
+    assert Journal(str(tmp_path)).recover(recovered)["records"] == 2
+    assert recovered.export_parts() == [
+        '{"id": "test_part_1"}',
+        '{"id": "test_part_2"}',
+    ]
+
+
+def test_journal_variants(tmp_path, monkeypatch):
+    """
+    GIVEN a memory store journaled to a directory, with a variant of a saved project
+    WHEN it is compacted while a variant is loaded and recovered into a compact store
+    THEN check that the variants and the working project's delta are recovered
+    """
+
+    journal = Journal(str(tmp_path))
+    store = JournaledStore(create_store("memory"), journal)
+    store.create_parts(["test_part_1", "test_part_2"])
+    store.create_assembly("test_assembly_1", ["test_part_1"], [])
+    store.save_project("test_project")
+    store.load_project("test_project")
+    store.attach_part("test_assembly_1", "test_part_2", 2)
+    store.save_variant("test_variant")
+    store.load_project("test_variant")
+    store.create_parts(["test_part_3"])
+    compact(store, journal, monkeypatch)
+    store.detach_part("test_part_1")
+    journal.close()
+
+    recovered = create_store("compact")
+    Journal(str(tmp_path)).recover(recovered)
+    assert recovered.working_base() == "test_variant"
+    assert export_all(recovered) == export_all(store)
+    recovered.save_variant("test_variant_2")
+    assert recovered.variant_delta("test_variant_2") == [
+        '["create_parts", [["test_part_3"]]]',
+        '["detach_part", ["test_part_1"]]',
+    ]
+    recovered.load_project("test_variant_2")
+    store.store.load_project("test_variant")
+    store.store.create_parts(["test_part_3"])
+    store.store.detach_part("test_part_1")
+    assert export_all(recovered) == export_all(store)
+    assert recovered.explode_assembly("test_assembly_1") == {"test_part_2": 2}
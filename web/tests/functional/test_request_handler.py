@@ -0,0 +1,156 @@
+"""
+This file contains tests for the API client in the utilities/request_handler.py file
+"""
+
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+from app import app as fastapi_app
+from utilities import request_handler
+
+
+def test_sync_requests(test_client, monkeypatch):
+    """
+    GIVEN the sync request functions sharing one pooled client
+    WHEN parts are added, fetched and rejected
+    THEN check that responses are returned, and errors raised with the API's detail
+    """
+
+    monkeypatch.setattr(request_handler, "gClient", test_client)
+    response = request_handler.add_parts(["test_part_1", "test_part_2"])
+    assert response.json()["data"] == {"created": 2, "errors": []}
+    response = request_handler.get_part("test_part_1")
+    assert response.status_code == 200
+    with pytest.raises(HTTPException) as error:
+        request_handler.add_part("test_part_1")
+    assert error.value.status_code == 403
+    assert error.value.detail == "Part exists"
+
+    # Clearing assembly project before other tests
+    request_handler.save_assembly_project("test_project")
+
+
+def test_conditional_get(test_client, create_assembly, monkeypatch):
+    """
+    GIVEN the sync request functions caching GET responses
+    WHEN an assembly is read again, before and after it changes
+    THEN check that the cached response is reused until the assembly changes
+    """
+
+    monkeypatch.setattr(request_handler, "gClient", test_client)
+    monkeypatch.setattr(request_handler, "gCache", request_handler.ResponseCache())
+    response = request_handler.get_assembly("test_assembly")
+    assert request_handler.get_assembly("test_assembly") is response
+    request_handler.add_part("test_part_1")
+    request_handler.attach_part_assembly("test_part_1", "test_assembly")
+    changed = request_handler.get_assembly("test_assembly")
+    assert changed is not response
+    assert "test_part_1" in changed.json()["data"]
+    assert request_handler.get_assembly("test_assembly") is changed
+
+    # Clearing assembly project before other tests
+    request_handler.save_assembly_project("test_project")
+
+
+def test_async_fan_out(test_client):
+    """
+    GIVEN an async client with a bounded number of requests in flight
+    WHEN many parts are added in batches and many assemblies fetched at once
+    THEN check that every response comes back in order, and the first error is raised
+    """
+
+    async def run():
+        async with request_handler.AsyncClient(
+            base_url="http://testserver",
+            concurrency=4,
+            transport=httpx.ASGITransport(app=fastapi_app),
+        ) as client:
+            part_names = [f"test_part_{index}" for index in range(2500)]
+            responses = await client.add_parts(part_names)
+            assert [response.json()["data"]["created"] for response in responses] == [
+                1000,
+                1000,
+                500,
+            ]
+            await client.fan_out(
+                (
+                    "POST",
+                    "/assembly",
+                    {
+                        "assembly_name": f"test_assembly_{index}",
+                        "part_names": [f"test_part_{index}"],
+                    },
+                )
+                for index in range(20)
+            )
+            responses = await client.get_assemblies(
+                [f"test_assembly_{index}" for index in reversed(range(20))]
+            )
+            assert [response.json()["data"] for response in responses] == [
+                f'{{"children": [{{"id": "test_part_{index}"}}], '
+                f'"id": "test_assembly_{index}"}}'
+                for index in reversed(range(20))
+            ]
+            with pytest.raises(HTTPException) as error:
+                await client.get_assemblies(["test_assembly_0", "unknown"])
+            assert error.value.status_code == 403
+
+    asyncio.run(run())
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
+
+
+def test_async_conditional_fan_out(test_client):
+    """
+    GIVEN an async client caching GET responses
+    WHEN more assemblies than the cache holds are fetched at once, twice
+    THEN check that every response has its assembly, including those whose cached
+    response was evicted while their conditional GET was in flight
+    """
+
+    count = request_handler.CACHE_SIZE + 14
+
+    class SlowRevalidation(httpx.AsyncBaseTransport):
+        # Transport answering conditional GETs last, as a slow network can
+        def __init__(self):
+            self.transport = httpx.ASGITransport(app=fastapi_app)
+
+        async def handle_async_request(self, request):
+            response = await self.transport.handle_async_request(request)
+            if response.status_code == 304:
+                await asyncio.sleep(0.01)
+            return response
+
+    async def run():
+        async with request_handler.AsyncClient(
+            base_url="http://testserver", transport=SlowRevalidation()
+        ) as client:
+            await client.add_parts([f"test_part_{index}" for index in range(count)])
+            await client.fan_out(
+                (
+                    "POST",
+                    "/assembly",
+                    {
+                        "assembly_name": f"test_assembly_{index}",
+                        "part_names": [f"test_part_{index}"],
+                    },
+                )
+                for index in range(count)
+            )
+            assembly_names = [f"test_assembly_{index}" for index in range(count)]
+            for _ in range(2):
+                responses = await client.get_assemblies(assembly_names)
+                assert [response.json()["data"] for response in responses] == [
+                    f'{{"children": [{{"id": "test_part_{index}"}}], '
+                    f'"id": "test_assembly_{index}"}}'
+                    for index in range(count)
+                ]
+
+    asyncio.run(run())
+
+    # Clearing assembly project before other tests
+    response = test_client.post("/project/test_project")
+    assert response.status_code == 201
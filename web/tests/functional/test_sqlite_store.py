@@ -0,0 +1,156 @@
+"""
+This file contains tests for sharing a database between processes in the
+storage/sqlite_store.py file
+"""
+
+import sqlite3
+import pytest
+from storage import create_store, sqlite_store
+
+
+def test_shared_database(tmp_path):
+    """
+    GIVEN two SQLite stores opened on the same database file, as by two API workers
+    WHEN both create parts, build an assembly and attach to it
+    THEN check that each store sees the other's writes in the order they were made
+    """
+
+    path = str(tmp_path / "bom.sqlite3")
+    first = create_store("sqlite", path=path)
+    second = create_store("sqlite", path=path)
+    first.create_parts(["test_part_1"])
+    second.create_parts(["test_part_2"])
+    first.create_parts(["test_part_3"])
+    assert second.export_parts() == [
+        '{"id": "test_part_1"}',
+        '{"id": "test_part_2"}',
+        '{"id": "test_part_3"}',
+    ]
+    second.create_assembly("test_assembly", ["test_part_3", "test_part_1"], [])
+    version = first.assembly_version("test_assembly")
+    first.attach_part("test_assembly", "test_part_2")
+    assert second.assembly_version("test_assembly") != version
+    assert second.export_assembly("test_assembly") == (
+        '{"children": [{"id": "test_part_3"}, {"id": "test_part_1"}, '
+        '{"id": "test_part_2"}], "id": "test_assembly"}'
+    )
+
+    # A recreated database hands out the same versions again, under a new epoch
+    version = second.assembly_version("test_assembly")
+    recreated = str(tmp_path / "recreated.sqlite3")
+    store = create_store("sqlite", path=recreated)
+    store.create_parts(["test_part_1", "test_part_2", "test_part_3"])
+    store.create_assembly("test_assembly", ["test_part_3", "test_part_1"], [])
+    store.attach_part("test_assembly", "test_part_2")
+    assert (
+        store.assembly_version("test_assembly").split("-")[1] == version.split("-")[1]
+    )
+    assert store.assembly_version("test_assembly") != version
+
+
+def test_transaction(tmp_path):
+    """
+    GIVEN two SQLite stores opened on the same database file
+    WHEN one writes in a transaction that fails, and then holds one open
+    THEN check that the failed writes are rolled back and other writers are locked out
+    """
+
+    path = str(tmp_path / "bom.sqlite3")
+    first = create_store("sqlite", path=path)
+    second = create_store("sqlite", path=path)
+    with pytest.raises(ValueError):
+        with first.transaction():
+            first.create_parts(["test_part_1"])
+            raise ValueError
+    assert not second.has_part("test_part_1")
+
+    with first.transaction():
+        first.create_parts(["test_part_2"])
+        assert not second.has_part("test_part_2")
+        writer = sqlite3.connect(path, timeout=0)
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            writer.execute("BEGIN IMMEDIATE")
+        writer.close()
+    assert second.has_part("test_part_2")
+
+
+def test_explode_assembly(tmp_path):
+    """
+    GIVEN two SQLite stores opened on the same database file
+    WHEN an assembly is exploded, changed by the other store and exploded again
+    THEN check that children are found through the parent index, and cached rollups
+    are reused until the assembly changes
+    """
+
+    path = str(tmp_path / "bom.sqlite3")
+    first = create_store("sqlite", path=path)
+    second = create_store("sqlite", path=path)
+    plan = [
+        row[3]
+        for row in first.connection.execute(
+            "EXPLAIN QUERY PLAN " + sqlite_store.EXPLODE_QUERY,
+            {"project": "", "name": "test_assembly"},
+        )
+    ]
+    assert "SEARCH n USING INDEX node_parent (project=? AND parent=?)" in plan
+    assert "SEARCH n USING PRIMARY KEY (project=?)" not in plan
+
+    first.create_parts(["test_part_1", "test_part_2"])
+    first.create_assembly("test_assembly_1", ["test_part_1"], [], {"test_part_1": 2})
+    first.create_assembly("test_assembly_2", [], ["test_assembly_1"])
+    assert first.explode_assembly("test_assembly_2") == {"test_part_1": 2}
+    assert len(first.rollups) == 1
+    assert first.explode_assembly("test_assembly_2") == {"test_part_1": 2}
+    assert len(first.rollups) == 1
+    second.attach_part("test_assembly_1", "test_part_2", 3)
+    assert first.explode_assembly("test_assembly_2") == {
+        "test_part_1": 2,
+        "test_part_2": 3,
+    }
+    assert len(first.rollups) == 2
+
+
+def test_iter_descendants(tmp_path):
+    """
+    GIVEN a SQLite store with an assembly of three two-level subassemblies
+    WHEN its descendants are iterated, from the start and resuming after one
+    THEN check that each child's subtree is fetched once and exported from, and that
+    resuming only fetches the subtree the named descendant is below
+    """
+
+    store = create_store("sqlite", path=str(tmp_path / "bom.sqlite3"))
+    store.import_assembly(
+        {
+            "id": "test_assembly",
+            "children": [
+                {
+                    "id": f"test_assembly_{i}",
+                    "children": [
+                        {
+                            "id": f"test_assembly_{i}_{j}",
+                            "children": [{"id": f"p{i}{j}"}],
+                        }
+                        for j in range(2)
+                    ],
+                }
+                for i in range(3)
+            ],
+        }
+    )
+    queries = []
+    store.connection.set_trace_callback(queries.append)
+
+    def subtree_fetches():
+        fetches = sum("WITH RECURSIVE subtree" in query for query in queries)
+        queries.clear()
+        return fetches
+
+    descendants = list(store.iter_descendants("test_assembly"))
+    assert subtree_fetches() == 3
+    assert [item for _, item in descendants] == store.export_descendants(
+        "test_assembly"
+    )
+    queries.clear()
+    resumed = list(store.iter_descendants("test_assembly", ("part", "p20")))
+    assert subtree_fetches() == 1
+    assert resumed == descendants[-2:]
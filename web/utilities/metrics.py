@@ -0,0 +1,312 @@
+"""
+This file contains the metrics the Bill of Materials API collects about itself, served
+at /metrics in the Prometheus text format
+"""
+
+import bisect
+import contextlib
+import functools
+import threading
+import time
+from collections.abc import Iterable
+
+
+# Upper bounds in seconds of the buckets of every duration histogram
+DURATION_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# Type and help text of every metric, in the order they are rendered
+METRICS = {
+    "bom_request_duration_seconds": (
+        "histogram",
+        "Time taken to serve requests, by method and route",
+    ),
+    "bom_requests_in_flight": (
+        "gauge",
+        "Requests being served, by method and route",
+    ),
+    "bom_export_duration_seconds": (
+        "histogram",
+        "Time taken by stores to serialize exports to JSON, by store method",
+    ),
+    "bom_export_bytes_total": (
+        "counter",
+        "Size of the JSON stores exported, by store method, in characters, which "
+        "is bytes for ASCII names",
+    ),
+    "bom_project_copy_duration_seconds": (
+        "histogram",
+        "Time taken to copy projects into and out of the working project, by store "
+        "method",
+    ),
+    "bom_parts": ("gauge", "Parts in a project"),
+    "bom_assemblies": ("gauge", "Assemblies in a project"),
+    "bom_tree_depth": ("gauge", "Assembly levels of the deepest tree in a project"),
+    "bom_live_projects": ("gauge", "Live projects opened"),
+    "bom_saved_projects": ("gauge", "Projects and variants saved"),
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def format_labels(*labels: tuple) -> str:
+    """
+    Function to render label pairs in the Prometheus text format
+
+    Label sets are rendered once and then used as keys, so recording a value never
+    formats its labels again.
+
+    Parameters
+    ----------
+    *labels : tuple
+        Name and value of every label
+
+    Returns
+    -------
+    str
+        Labels between braces, or an empty string without any label
+    """
+
+    if not labels:
+        return ""
+    pairs = (
+        name
+        + '="'
+        + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        + '"'
+        for name, value in labels
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+class Histogram:
+    """
+    Counts of observed values by bucket, with their sum
+    """
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        # Number of values observed in each bucket of DURATION_BUCKETS, and above them
+        self.counts = [0] * (len(DURATION_BUCKETS) + 1)
+        # Sum of the values observed
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """
+        Records a value
+
+        Parameters
+        ----------
+        value : float
+            Value to record
+
+        Returns
+        -------
+        None
+        """
+
+        self.counts[bisect.bisect_left(DURATION_BUCKETS, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> list:
+        """
+        Renders the histogram as cumulative buckets, sum and count
+
+        Parameters
+        ----------
+        name : str
+            Name of metric
+        labels : str
+            Labels from format_labels
+
+        Returns
+        -------
+        list
+            Sample lines
+        """
+
+        # Bucket labels are appended to the histogram's own
+        prefix = labels[:-1] + "," if labels else "{"
+        lines, total = [], 0
+        for bound, count in zip((*DURATION_BUCKETS, "+Inf"), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{prefix}le="{bound}"}} {total}')
+        lines.append(f"{name}_sum{labels} {self.sum}")
+        lines.append(f"{name}_count{labels} {total}")
+        return lines
+
+
+class Metrics:
+    """
+    Registry of the histograms and counters the API records as it serves requests
+
+    Recording a value is a dictionary lookup and a few additions under a lock, taken
+    since the store thread records exports while the event loop records requests.
+    Gauges of the stores are computed when the metrics are rendered instead.
+    """
+
+    def __init__(self):
+        # Histograms by metric name and labels
+        self.histograms = {}
+        # Values of counters and of gauges recorded by the API, by metric name and
+        # labels
+        self.values = {}
+        # Guards the histograms and values
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, labels: str, value: float):
+        """
+        Records a value in a histogram
+
+        Parameters
+        ----------
+        name : str
+            Name of histogram
+        labels : str
+            Labels from format_labels
+        value : float
+            Value to record
+
+        Returns
+        -------
+        None
+        """
+
+        with self.lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[name, labels] = Histogram()
+            histogram.observe(value)
+
+    def add(self, name: str, labels: str, amount: float):
+        """
+        Adds to a counter, or to a gauge the API keeps itself
+
+        Parameters
+        ----------
+        name : str
+            Name of counter or gauge
+        labels : str
+            Labels from format_labels
+        amount : float
+            Amount to add, negative to lower a gauge
+
+        Returns
+        -------
+        None
+        """
+
+        with self.lock:
+            self.values[name, labels] = self.values.get((name, labels), 0) + amount
+
+    @contextlib.contextmanager
+    def timed(self, name: str, labels: str):
+        """
+        Records the time taken by a block in a histogram, even if it raises
+
+        Parameters
+        ----------
+        name : str
+            Name of histogram
+        labels : str
+            Labels from format_labels
+
+        Yields
+        ------
+        None
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, labels, time.perf_counter() - start)
+
+    def render(self, gauges: Iterable = ()) -> str:
+        """
+        Renders every metric in the Prometheus text format
+
+        Parameters
+        ----------
+        gauges : iterable, optional
+            Name, labels from format_labels and value of every gauge computed for the
+            scrape
+
+        Returns
+        -------
+        str
+            Metrics in the Prometheus text format
+        """
+
+        samples = {name: [] for name in METRICS}
+        with self.lock:
+            for (name, labels), histogram in self.histograms.items():
+                samples[name] += histogram.render(name, labels)
+            for (name, labels), value in self.values.items():
+                samples[name].append(f"{name}{labels} {value}")
+        for name, labels, value in gauges:
+            samples[name].append(f"{name}{labels} {value}")
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            lines += samples[name]
+        return "\n".join(lines) + "\n"
+
+
+class MeteredStore:
+    """
+    Store wrapper recording the time taken by exports and project copies, and the size
+    of every export
+
+    Other attributes are passed straight through. Exports returning an iterator are
+    left out, as timing them would time whatever consumes them.
+    """
+
+    # Store methods copying a project into or out of the working project
+    COPIES = {"save_project", "load_project", "save_variant"}
+
+    def __init__(self, store, metrics: Metrics):
+        # Store to record
+        self.store = store
+        # Registry to record in
+        self.metrics = metrics
+
+    def __getattr__(self, attribute: str):
+        value = getattr(self.store, attribute)
+        if attribute in self.COPIES:
+
+            def copied(*args):
+                labels = format_labels(("method", attribute))
+                with self.metrics.timed("bom_project_copy_duration_seconds", labels):
+                    return value(*args)
+
+            return copied
+        if not attribute.startswith("export_"):
+            return value
+
+        def exported(*args):
+            start = time.perf_counter()
+            result = value(*args)
+            elapsed = time.perf_counter() - start
+            if not isinstance(result, (str, list)):
+                return result
+            labels = format_labels(("method", attribute))
+            size = len(result) if isinstance(result, str) else sum(map(len, result))
+            self.metrics.observe("bom_export_duration_seconds", labels, elapsed)
+            self.metrics.add("bom_export_bytes_total", labels, size)
+            return result
+
+        return exported
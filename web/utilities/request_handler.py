@@ -2,17 +2,32 @@
 Handler to handle HTTP requests for interacting with the Bill of Materials API
 """
 
+import asyncio
 import logging
-import requests
+import os
+from collections import OrderedDict
+from collections.abc import Iterable
+import httpx
 from fastapi import HTTPException
 from anytree import RenderTree
-from anytree.importer import JsonImporter
+from anytree.importer import DictImporter, JsonImporter
 
 
 # Base URL for APIs
-BASE_URL = "http://localhost:8000"
+BASE_URL = os.environ.get("BOM_API_URL", "http://localhost:8000")
 # Request timeout
-TIMEOUT = 10
+TIMEOUT = float(os.environ.get("BOM_API_TIMEOUT", "10"))
+# Requests in flight at once during a fan-out, and connections kept alive for them
+CONCURRENCY = 16
+# Parts created per request when adding parts through /part/batch
+BATCH_SIZE = 1000
+# Number of GET responses kept to revalidate with their ETag
+CACHE_SIZE = 256
+# Status codes of a successful response to each HTTP method
+SUCCESS_CODES = {"GET": (200,), "POST": (200, 201), "PUT": (200,), "DELETE": (200,)}
+
+# Pooled client shared by the sync request functions, created on first use
+gClient = None
 
 
 # Logging to file
@@ -24,14 +39,351 @@ logging.basicConfig(
 )
 
 
-def get_request(endpoint: str):
+def check_response(res: httpx.Response) -> httpx.Response:
     """
-    Function to make a GET request to provided endpoint
+    Function to raise the error detail of an unsuccessful response
+
+    Parameters
+    ----------
+    res : Response
+        HTTP response object
+
+    Returns
+    -------
+    Response
+        The same response, if successful
+    """
+
+    if res.status_code not in SUCCESS_CODES[res.request.method]:
+        raise HTTPException(status_code=res.status_code, detail=res.json()["detail"])
+    return res
+
+
+class ResponseCache:
+    """
+    Least recently used cache of GET responses by endpoint, revalidated with their
+    ETag, so a repeat read of an unchanged assembly costs a 304 with no body
+    """
+
+    def __init__(self, size: int = CACHE_SIZE):
+        # Maximum number of responses kept
+        self.size = size
+        # Responses with an ETag by endpoint, least recently used first
+        self.responses = OrderedDict()
+
+    def get(self, endpoint: str) -> httpx.Response | None:
+        """
+        Gets the cached response of an endpoint, to hold until its conditional GET is
+        resolved, since other responses can evict it meanwhile
+
+        Parameters
+        ----------
+        endpoint : str
+            Endpoint for GET request
+
+        Returns
+        -------
+        Response, optional
+            Cached response, or None when nothing is cached
+        """
+
+        return self.responses.get(endpoint)
+
+    def headers(self, cached: httpx.Response | None) -> dict:
+        """
+        Gets the headers making a GET conditional on the cached response changing
+
+        Parameters
+        ----------
+        cached : Response, optional
+            Cached response of the endpoint
+
+        Returns
+        -------
+        dict
+            If-None-Match header, or no headers when nothing is cached
+        """
+
+        return {"If-None-Match": cached.headers["ETag"]} if cached else {}
+
+    def store(self, endpoint: str, res: httpx.Response):
+        """
+        Caches a response as the most recently used, evicting the least recently used
+        one when the cache is full
+
+        Parameters
+        ----------
+        endpoint : str
+            Endpoint for GET request
+        res : Response
+            HTTP response object to cache
+
+        Returns
+        -------
+        None
+        """
+
+        self.responses[endpoint] = res
+        self.responses.move_to_end(endpoint)
+        if len(self.responses) > self.size:
+            self.responses.popitem(last=False)
+
+    def resolve(
+        self, endpoint: str, res: httpx.Response, cached: httpx.Response | None
+    ) -> httpx.Response:
+        """
+        Gets the response to a conditional GET, caching it or reusing the cached one
+
+        Parameters
+        ----------
+        endpoint : str
+            Endpoint for GET request
+        res : Response
+            HTTP response object received
+        cached : Response, optional
+            Cached response the GET was made conditional on
+
+        Returns
+        -------
+        Response
+            The cached response on a 304, or the response received
+        """
+
+        if res.status_code == 304 and cached is not None:
+            # Cached again if it was evicted while the GET was in flight
+            self.store(endpoint, cached)
+            return cached
+        if res.status_code == 200 and "ETag" in res.headers:
+            self.store(endpoint, res)
+        else:
+            self.responses.pop(endpoint, None)
+        return res
+
+    def clear(self):
+        """
+        Drops every cached response
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self.responses.clear()
+
+
+# GET responses of the sync request functions
+gCache = ResponseCache()
+
+
+class AsyncClient:
+    """
+    Async client for the Bill of Materials API, keeping connections alive between
+    requests
+
+    Used as an async context manager, so its pooled connections are closed on exit:
+
+        async with AsyncClient() as client:
+            responses = await client.get_assemblies(assembly_names)
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        timeout: float | None = None,
+        concurrency: int = CONCURRENCY,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        # Requests in flight at once during a fan-out
+        self.concurrency = concurrency
+        # GET responses to revalidate
+        self.cache = ResponseCache()
+        self.client = httpx.AsyncClient(
+            base_url=base_url or BASE_URL,
+            timeout=TIMEOUT if timeout is None else timeout,
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes every pooled connection
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        await self.client.aclose()
+
+    async def request(self, method: str, endpoint: str, data: dict | None = None):
+        """
+        Sends a request to provided endpoint
+
+        Parameters
+        ----------
+        method : str
+            HTTP method
+        endpoint : str
+            Endpoint for request
+        data : dict, optional
+            Data to send as JSON
+
+        Returns
+        -------
+        Response
+            HTTP response object
+        """
+
+        try:
+            if method != "GET":
+                return check_response(
+                    await self.client.request(method, endpoint, json=data)
+                )
+            cached = self.cache.get(endpoint)
+            res = await self.client.get(endpoint, headers=self.cache.headers(cached))
+            return check_response(self.cache.resolve(endpoint, res, cached))
+        except Exception as ex:
+            logging.exception(ex)
+            raise ex
+
+    async def fan_out(self, requests: Iterable[tuple]) -> list:
+        """
+        Sends many requests concurrently, with at most concurrency of them in flight
+
+        A fixed set of workers takes requests in turn, so a fan-out of any size only
+        ever holds concurrency pending requests. The first failure cancels the rest
+        and is raised.
+
+        Parameters
+        ----------
+        requests : iterable
+            (method, endpoint) or (method, endpoint, data) of every request
+
+        Returns
+        -------
+        list
+            HTTP response objects, in the order of the requests
+        """
+
+        pending = list(enumerate(requests))
+        responses = [None] * len(pending)
+        queue = iter(pending)
+
+        async def worker():
+            for index, request in queue:
+                responses[index] = await self.request(*request)
+
+        workers = [
+            asyncio.ensure_future(worker())
+            for _ in range(min(self.concurrency, len(pending)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        return responses
+
+    async def add_parts(self, part_names: list) -> list:
+        """
+        Creates many parts, posting them to /part/batch in concurrent batches
+
+        Parameters
+        ----------
+        part_names : list
+            Names of parts to create
+
+        Returns
+        -------
+        list
+            HTTP response object of every batch, each listing its rejected parts
+        """
+
+        return await self.fan_out(
+            (
+                "POST",
+                "/part/batch",
+                {"part_names": part_names[start : start + BATCH_SIZE]},
+            )
+            for start in range(0, len(part_names), BATCH_SIZE)
+        )
+
+    async def get_assemblies(self, assembly_names: list) -> list:
+        """
+        Gets many assemblies concurrently
+
+        Parameters
+        ----------
+        assembly_names : list
+            Names of assemblies to get
+
+        Returns
+        -------
+        list
+            HTTP response object of every assembly, in the order of the names
+        """
+
+        return await self.fan_out(
+            ("GET", f"/assembly/{name}") for name in assembly_names
+        )
+
+
+def configure(base_url: str | None = None, timeout: float | None = None):
+    """
+    Function to point the sync request functions at another API, closing the pooled
+    connections to the current one
 
     Parameters
     ----------
+    base_url : str, optional
+        Base URL for APIs
+    timeout : float, optional
+        Request timeout
+
+    Returns
+    -------
+    None
+    """
+
+    global BASE_URL, TIMEOUT, gClient
+    if gClient is not None:
+        gClient.close()
+        gClient = None
+    gCache.clear()
+    BASE_URL = base_url or BASE_URL
+    TIMEOUT = TIMEOUT if timeout is None else timeout
+
+
+def send_request(method: str, endpoint: str, data: dict | None = None):
+    """
+    Function to send a request to provided endpoint through the shared pooled client,
+    revalidating cached GET responses
+
+    Parameters
+    ----------
+    method : str
+        HTTP method
     endpoint : str
-        Endpoint for GET request
+        Endpoint for request
+    data : dict, optional
+        Data to send as JSON
 
     Returns
     -------
@@ -39,18 +391,38 @@ def get_request(endpoint: str):
         HTTP response object
     """
 
+    global gClient
     try:
-        res = requests.get(f"{BASE_URL}{endpoint}", timeout=TIMEOUT)
-        if res.status_code != 200:
-            raise HTTPException(
-                status_code=res.status_code, detail=res.json()["detail"]
-            )
-        return res
+        if gClient is None:
+            gClient = httpx.Client(base_url=BASE_URL, timeout=TIMEOUT)
+        if method != "GET":
+            return check_response(gClient.request(method, endpoint, json=data))
+        cached = gCache.get(endpoint)
+        res = gClient.get(endpoint, headers=gCache.headers(cached))
+        return check_response(gCache.resolve(endpoint, res, cached))
     except Exception as ex:
         logging.exception(ex)
         raise ex
 
 
+def get_request(endpoint: str):
+    """
+    Function to make a GET request to provided endpoint
+
+    Parameters
+    ----------
+    endpoint : str
+        Endpoint for GET request
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return send_request("GET", endpoint)
+
+
 def post_request(endpoint: str, data: dict | None = None):
     """
     Function to make a POST request to provided endpoint
@@ -68,16 +440,7 @@ def post_request(endpoint: str, data: dict | None = None):
         HTTP response object
     """
 
-    try:
-        res = requests.post(f"{BASE_URL}{endpoint}", json=data, timeout=TIMEOUT)
-        if res.status_code not in [200, 201]:
-            raise HTTPException(
-                status_code=res.status_code, detail=res.json()["detail"]
-            )
-        return res
-    except Exception as ex:
-        logging.exception(ex)
-        raise ex
+    return send_request("POST", endpoint, data)
 
 
 def put_request(endpoint: str, data: dict | None = None):
@@ -97,16 +460,7 @@ def put_request(endpoint: str, data: dict | None = None):
         HTTP response object
     """
 
-    try:
-        res = requests.put(f"{BASE_URL}{endpoint}", json=data, timeout=TIMEOUT)
-        if res.status_code != 200:
-            raise HTTPException(
-                status_code=res.status_code, detail=res.json()["detail"]
-            )
-        return res
-    except Exception as ex:
-        logging.exception(ex)
-        raise ex
+    return send_request("PUT", endpoint, data)
 
 
 def delete_request(endpoint: str):
@@ -124,16 +478,7 @@ def delete_request(endpoint: str):
         HTTP response object
     """
 
-    try:
-        res = requests.delete(f"{BASE_URL}{endpoint}", timeout=TIMEOUT)
-        if res.status_code != 200:
-            raise HTTPException(
-                status_code=res.status_code, detail=res.json()["detail"]
-            )
-        return res
-    except Exception as ex:
-        logging.exception(ex)
-        raise ex
+    return send_request("DELETE", endpoint)
 
 
 def get_all_parts():
@@ -191,6 +536,25 @@ def add_part(part_name: str):
     return post_request("/part", {"part_name": part_name})
 
 
+def add_parts(part_names: list):
+    """
+    Function to make a POST request to the /part/batch endpoint to create
+    many parts in a single request
+
+    Parameters
+    ----------
+    part_names : list
+        Names of parts to create
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return post_request("/part/batch", {"part_names": part_names})
+
+
 def delete_part(part_name: str):
     """
     Function to make a DELETE request to the /part/{part_name} endpoint
@@ -229,6 +593,44 @@ def get_part_ancestors(part_name: str):
     return get_request(f"/part/{part_name}/parents")
 
 
+def get_part_where_used(part_name: str):
+    """
+    Function to make a GET request to the /part/{part_name}/where_used endpoint
+    to get the names of a part's ancestors
+
+    Parameters
+    ----------
+    part_name : str
+        Name of part to get ancestors
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return get_request(f"/part/{part_name}/where_used")
+
+
+def get_parts_where_used(part_names: list):
+    """
+    Function to make a POST request to the /part/where_used endpoint to get the names
+    of the ancestors of many parts at once
+
+    Parameters
+    ----------
+    part_names : list
+        Names of parts to get ancestors
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return post_request("/part/where_used", {"part_names": part_names})
+
+
 def get_all_assemblies():
     """
     Function to make a GET request to the /assembly endpoint to
@@ -266,8 +668,31 @@ def get_assembly(assembly_name: str):
     return get_request(f"/assembly/{assembly_name}")
 
 
+def get_assembly_tree(assembly_name: str):
+    """
+    Function to make a GET request to the /v2/assembly/{assembly_name} endpoint to
+    get a specific assembly as nested JSON, decoded in one pass
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly to get
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return get_request(f"/v2/assembly/{assembly_name}")
+
+
 def add_assembly(
-    assembly_name: str, part_names: list, subassembly_names: list | None = None
+    assembly_name: str,
+    part_names: list,
+    subassembly_names: list | None = None,
+    quantities: dict | None = None,
+    shared_subassembly_names: list | None = None,
 ):
     """
     Function to make a POST request to the /assembly endpoint to create an assembly
@@ -280,6 +705,10 @@ def add_assembly(
         List of parts to assemble
     subassembly_names: list, optional
         List of assembly_names to assemble
+    quantities: dict, optional
+        Number of each part or subassembly needed by name, 1 when missing
+    shared_subassembly_names: list, optional
+        List of assembly_names to use without moving them from their parents
 
     Returns
     -------
@@ -291,11 +720,32 @@ def add_assembly(
         "assembly_name": assembly_name,
         "part_names": part_names,
         "subassembly_names": subassembly_names,
+        "quantities": quantities,
+        "shared_subassembly_names": shared_subassembly_names,
     }
     return post_request("/assembly", post_json)
 
 
-def attach_part_assembly(part_name: str, assembly_name: str):
+def import_assembly(assembly: dict):
+    """
+    Function to make a POST request to the /assembly/import endpoint to create
+    a whole nested assembly tree in a single request
+
+    Parameters
+    ----------
+    assembly : dict
+        Nested assembly tree in the shape JsonExporter emits
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return post_request("/assembly/import", {"assembly": assembly})
+
+
+def attach_part_assembly(part_name: str, assembly_name: str, quantity: int = 1):
     """
     Function to make a POST request to the /assembly/{assembly_name}/child/{part_name}
     endpoint to attach a part to an assembly
@@ -306,6 +756,8 @@ def attach_part_assembly(part_name: str, assembly_name: str):
         Name of part to attach
     assembly_name: str
         Name of assembly to attach to
+    quantity: int, optional
+        Number of the part the assembly needs
 
     Returns
     -------
@@ -313,7 +765,9 @@ def attach_part_assembly(part_name: str, assembly_name: str):
         HTTP response object
     """
 
-    return post_request(f"/assembly/{assembly_name}/child/{part_name}")
+    return post_request(
+        f"/assembly/{assembly_name}/child/{part_name}?quantity={quantity}"
+    )
 
 
 def detach_part_assembly(part_name: str, assembly_name: str):
@@ -337,6 +791,54 @@ def detach_part_assembly(part_name: str, assembly_name: str):
     return put_request(f"/assembly/{assembly_name}/child/{part_name}")
 
 
+def share_subassembly(subassembly_name: str, assembly_name: str, quantity: int = 1):
+    """
+    Function to make a POST request to the
+    /assembly/{assembly_name}/shared/{subassembly_name} endpoint to use an assembly in
+    another one without moving it from its parent
+
+    Parameters
+    ----------
+    subassembly_name : str
+        Name of assembly to share
+    assembly_name: str
+        Name of assembly to share with
+    quantity: int, optional
+        Number of the subassembly the assembly needs
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return post_request(
+        f"/assembly/{assembly_name}/shared/{subassembly_name}?quantity={quantity}"
+    )
+
+
+def unshare_subassembly(subassembly_name: str, assembly_name: str):
+    """
+    Function to make a PUT request to the
+    /assembly/{assembly_name}/shared/{subassembly_name} endpoint to stop sharing an
+    assembly with another one
+
+    Parameters
+    ----------
+    subassembly_name : str
+        Name of shared assembly
+    assembly_name: str
+        Name of assembly it is shared with
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return put_request(f"/assembly/{assembly_name}/shared/{subassembly_name}")
+
+
 def get_assembly_first_children(assembly_name: str):
     """
     Function to make a GET request to the /assembly/{assembly_name}/first endpoint to
@@ -394,6 +896,25 @@ def get_assembly_leaves(assembly_name: str):
     return get_request(f"/assembly/{assembly_name}/leaves")
 
 
+def get_assembly_explode(assembly_name: str):
+    """
+    Function to make a GET request to the /assembly/{assembly_name}/explode endpoint
+    to get the total quantity of every part needed to build an assembly
+
+    Parameters
+    ----------
+    assembly_name : str
+        Name of assembly to explode
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return get_request(f"/assembly/{assembly_name}/explode")
+
+
 def get_top_assembly():
     """
     Function to make a GET request to the /top_assembly endpoint to
@@ -485,6 +1006,25 @@ def save_assembly_project(project_name: str):
     return post_request(f"/project/{project_name}")
 
 
+def save_variant_project(project_name: str):
+    """
+    Function to make a POST request to the /project/{project_name} endpoint to
+    save an assembly project as its differences from the project it was copied from
+
+    Parameters
+    ----------
+    project_name : str
+        Name of project to save
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return post_request(f"/project/{project_name}?variant=true")
+
+
 def copy_assembly_project(project_name: str):
     """
     Function to make a GET request to the /project/{project_name} endpoint to
@@ -504,14 +1044,35 @@ def copy_assembly_project(project_name: str):
     return get_request(f"/project/{project_name}")
 
 
-def render_assembly(assembly: str):
+def get_project_diff(project_name: str, other_name: str):
+    """
+    Function to make a GET request to the /project/{project_name}/diff/{other_name}
+    endpoint to get what changed between two saved assembly projects
+
+    Parameters
+    ----------
+    project_name : str
+        Name of project to compare from
+    other_name : str
+        Name of project to compare to
+
+    Returns
+    -------
+    Response
+        HTTP response object
+    """
+
+    return get_request(f"/project/{project_name}/diff/{other_name}")
+
+
+def render_assembly(assembly: str | dict):
     """
     Function to render an assembly to display it in a readable manner
 
     Parameters
     ----------
-    assembly : str
-        The assembly json
+    assembly : str or dict
+        The assembly json, or the decoded assembly from a /v2 endpoint
 
     Returns
     -------
@@ -519,8 +1080,10 @@ def render_assembly(assembly: str):
     """
 
     try:
-        json_importer = JsonImporter()
-        root = json_importer.import_(assembly)
+        if isinstance(assembly, dict):
+            root = DictImporter().import_(assembly)
+        else:
+            root = JsonImporter().import_(assembly)
         print(RenderTree(root), "\n")
     except Exception as ex:
         logging.exception(ex)